@@ -1,45 +1,84 @@
-from fastapi import Depends, HTTPException, Header
+from fastapi import Depends, HTTPException, Header, Request
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.database import get_db
-from app.core.security import verify_token
-from typing import Optional
+from app.core.security import decode_token
+from dataclasses import dataclass, field
+from typing import List, Optional
 
-async def get_current_user_id(
+@dataclass
+class Principal:
+    """Authenticated caller resolved from an access token"""
+    user_id: str
+    roles: Optional[List[str]] = None  # None for tokens issued before role claims
+    claims: dict = field(default_factory=dict)
+
+    @property
+    def is_admin(self) -> bool:
+        return "admin" in (self.roles or [])
+
+def resolve_principal(token: Optional[str]) -> Optional[Principal]:
+    """Build a principal from a bearer token, or None if it is invalid"""
+    if not token:
+        return None
+    payload = decode_token(token)
+    if not payload or not payload.get("sub"):
+        return None
+    return Principal(user_id=payload["sub"], roles=payload.get("roles"), claims=payload)
+
+async def get_optional_principal(
+    request: Request,
     authorization: Optional[str] = Header(None)
-) -> str:
-    """Get current user ID from token"""
+) -> Optional[Principal]:
+    """Resolve the caller once per request
+
+    FastAPI caches dependency results per request, so every dependency
+    below shares this principal; it is also kept on ``request.state``.
+    """
+    principal = None
+    if authorization:
+        principal = resolve_principal(authorization.replace("Bearer ", ""))
+    request.state.principal = principal
+    return principal
+
+async def get_principal(
+    principal: Optional[Principal] = Depends(get_optional_principal),
+    authorization: Optional[str] = Header(None)
+) -> Principal:
+    """Require an authenticated caller"""
     if not authorization:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    # Extract token from "Bearer <token>"
-    token = authorization.replace("Bearer ", "")
-    user_id = verify_token(token)
-    
-    if not user_id:
+    if not principal:
         raise HTTPException(status_code=401, detail="Invalid token")
-    
-    return user_id
+    return principal
+
+async def get_current_user_id(
+    principal: Principal = Depends(get_principal)
+) -> str:
+    """Get current user ID from token"""
+    return principal.user_id
 
 async def get_optional_user_id(
-    authorization: Optional[str] = Header(None)
+    principal: Optional[Principal] = Depends(get_optional_principal)
 ) -> Optional[str]:
     """Get optional current user ID from token"""
-    if not authorization:
-        return None
-    
-    token = authorization.replace("Bearer ", "")
-    return verify_token(token)
+    return principal.user_id if principal else None
 
 async def verify_admin(
-    user_id: str = Depends(get_current_user_id),
+    principal: Principal = Depends(get_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ) -> str:
-    """Verify user is admin"""
+    """Verify user is admin from the token's role claim"""
+    if principal.roles is not None:
+        if not principal.is_admin:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        return principal.user_id
+
+    # Tokens issued before role claims still need a lookup
     from bson import ObjectId
-    
-    user = await db["users"].find_one({"_id": ObjectId(user_id)})
-    
+
+    user = await db["users"].find_one({"_id": ObjectId(principal.user_id)}, {"is_admin": 1})
+
     if not user or not user.get("is_admin"):
         raise HTTPException(status_code=403, detail="Not authorized")
-    
-    return user_id
+
+    return principal.user_id
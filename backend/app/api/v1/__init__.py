@@ -15,7 +15,9 @@ from app.api.v1 import (
     tutorials,
     quests_system,  # ✅ Add this import
     firebase_auth,  # ✅ Add Firebase auth import
-    code_review     # ✅ Add code review import
+    code_review,    # ✅ Add code review import
+    jobs,
+    review_sessions
 )
 
 router = APIRouter(prefix="/api/v1")
@@ -37,5 +39,7 @@ router.include_router(tutorials.router)
 router.include_router(quests_system.router)  # ✅ Add this line
 router.include_router(firebase_auth.router, prefix="/auth", tags=["firebase-auth"])  # ✅ Add Firebase auth
 router.include_router(code_review.router)  # ✅ Add code review router
+router.include_router(jobs.router)
+router.include_router(review_sessions.router)
 
 __all__ = ["router"]
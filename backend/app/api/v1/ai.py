@@ -7,6 +7,7 @@ from fastapi import APIRouter, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.database import get_db
 from app.services.ai_service import AIService
+from app.services.tiered_review import tiered_reviewer
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -325,7 +326,9 @@ async def ai_health():
             "status": "healthy",
             "service": "AI Assistant (Google Gemini)",
             "model": ai_service.model_name,
-            "version": "1.0.0"
+            "version": "1.0.0",
+            "review_tiers": tiered_reviewer.stats(),
+            "coalescing": ai_service.coalescing_stats()
         }
     except Exception as e:
         return {
@@ -352,8 +355,9 @@ async def review_code(request: CodeReviewRequest, db: AsyncIOMotorDatabase = Dep
                 "suggestions": ["Write some code first!", "Make sure your code isn't empty"]
             }
         
-        # Get AI review
-        review_result = await ai_service.review_code(
+        # Local analyzers first; Gemini only when they are not enough
+        review_result = await tiered_reviewer.review(
+            ai_service,
             request.code,
             request.language,
             request.quest_context
@@ -370,6 +374,7 @@ async def review_code(request: CodeReviewRequest, db: AsyncIOMotorDatabase = Dep
                     "score": review_result.get("score", 0),
                     "feedback": review_result["feedback"],
                     "suggestions": review_result["suggestions"],
+                    "tier": review_result["tier"],
                     "timestamp": datetime.utcnow()
                 })
                 print(f"✅ Code review saved to database")
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.database import get_db
 from app.utils.level_system import get_level_from_xp, get_xp_progress
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
+from typing import Optional
 from bson import ObjectId
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
@@ -10,13 +11,13 @@ router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 @router.get("/me")
 async def get_user_analytics(
+    db: AsyncIOMotorDatabase = Depends(get_db),
     user_id: str = "demo_user"
 ):
-    """Get user analytics dashboard data (in-memory version)"""
+    """Get user analytics dashboard data"""
     try:
-        # Use analytics service without database for now
         from app.services.analytics_service import AnalyticsService
-        analytics_service = AnalyticsService()
+        analytics_service = AnalyticsService(db)
         
         analytics_data = await analytics_service.get_user_analytics(user_id)
         print(f"📊 Analytics for {user_id}: {analytics_data['total_xp']} XP, Level {analytics_data['level']}")
@@ -31,33 +32,39 @@ async def get_user_analytics(
 @router.get("/me/progress")
 async def get_progress_data(
     db: AsyncIOMotorDatabase = Depends(get_db),
-    user_id: str = "demo_user"
+    user_id: str = "demo_user",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    bucket: str = Query("day", pattern="^(day|week|month)$")
 ):
-    """Get user progress over last 30 days"""
+    """Get user progress over a date range (last 30 days by default)"""
+    from app.services.analytics_service import AnalyticsService, check_progress_range
+    
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
     try:
-        user = await db["users"].find_one({"username": user_id})
+        check_progress_range(start, end, bucket)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        analytics_service = AnalyticsService(db)
+        
+        user = await db["users"].find_one(
+            {"$or": [{"_id": user_id}, {"username": user_id}]},
+            {"total_xp": 1}
+        )
         
         if not user:
             return []
         
-        progress_data = []
-        
-        # Generate last 30 days of data
-        for i in range(30):
-            date = datetime.utcnow() - timedelta(days=30 - i)
-            
-            # Mock progress data (in real app, this would come from history)
-            total_xp_on_date = user.get("total_xp", 0) - (30 - i) * 100
-            total_xp_on_date = max(0, total_xp_on_date)
-            
-            progress_data.append({
-                "date": date.strftime("%Y-%m-%d"),
-                "xp": total_xp_on_date,
-                "quests": max(0, (total_xp_on_date // 100)),
-                "level": get_level_from_xp(total_xp_on_date)
-            })
-        
-        return progress_data
+        return await analytics_service.get_progress_series(
+            str(user["_id"]),
+            start,
+            end,
+            bucket,
+            total_xp=user.get("total_xp", 0)
+        )
     except Exception as e:
         return {"error": str(e)}
 
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import ast
+import asyncio
 import re
 import json
+from app.core.config import settings
+from app.services.repository_review import ArchiveError, extract_archive, repository_reviewer
 
 router = APIRouter(prefix="/ai", tags=["ai-code-review"])
 
@@ -18,6 +23,20 @@ class Suggestion(BaseModel):
     suggestion: Optional[str] = None
     corrected_code: Optional[str] = None  # Add corrected code field
 
+class FunctionMetrics(BaseModel):
+    name: str
+    line: int
+    complexity: int  # cyclomatic complexity
+    nesting_depth: int
+    has_docstring: bool
+
+class ReviewFile(BaseModel):
+    path: str
+    code: str
+
+class RepositoryReviewRequest(BaseModel):
+    files: List[ReviewFile]
+
 class CodeAnalysis(BaseModel):
     readability: int
     maintainability: int
@@ -29,6 +48,8 @@ class CodeReviewResponse(BaseModel):
     analysis: CodeAnalysis
     suggestions: List[Suggestion]
     corrected_code: Optional[str] = None  # Add overall corrected code
+    functions: Optional[List[FunctionMetrics]] = None  # Python only
+    docstring_coverage: Optional[float] = None  # Python only
 
 @router.post("/review-code", response_model=CodeReviewResponse)
 async def review_code(request: CodeReviewRequest):
@@ -55,6 +76,58 @@ async def review_code(request: CodeReviewRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Code analysis failed: {str(e)}")
 
+def stream_repository_review(files) -> StreamingResponse:
+    """Stream one JSON line per reviewed file, then the aggregate report"""
+    async def events():
+        async for event in repository_reviewer.review(files):
+            yield json.dumps(event, default=str) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@router.post("/review-files")
+async def review_files(request: RepositoryReviewRequest):
+    """
+    Review a list of files in parallel.
+    Streams newline-delimited JSON: a "file" event as each file finishes,
+    then a "summary" event with the aggregate report.
+    """
+    if not request.files:
+        raise HTTPException(status_code=400, detail="No files to review")
+    if len(request.files) > settings.REVIEW_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.REVIEW_MAX_FILES} files can be reviewed at once")
+    
+    return stream_repository_review([(f.path, f.code) for f in request.files])
+
+@router.post("/review-archive")
+async def review_archive(archive: UploadFile = File(...)):
+    """
+    Review every source file in a zip or tar archive.
+    Streams results the same way as /ai/review-files.
+    """
+    max_bytes = settings.REVIEW_MAX_ARCHIVE_MB * 1024 * 1024
+    data = await archive.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Archive is larger than {settings.REVIEW_MAX_ARCHIVE_MB} MB")
+    
+    try:
+        # Decompression is CPU-bound; keep it off the event loop
+        files = await asyncio.to_thread(
+            extract_archive,
+            data,
+            archive.filename or "archive",
+            max_files=settings.REVIEW_MAX_FILES,
+            max_file_bytes=settings.REVIEW_MAX_FILE_BYTES,
+            max_total_bytes=settings.REVIEW_MEMORY_BUDGET_MB * 1024 * 1024,
+            max_declared_bytes=settings.REVIEW_MAX_ARCHIVE_EXPANDED_MB * 1024 * 1024
+        )
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not files:
+        raise HTTPException(status_code=400, detail="Archive contains no reviewable source files")
+    
+    return stream_repository_review(files)
+
 def analyze_code_quality(code: str, language: str) -> CodeReviewResponse:
     """
     Comprehensive code analysis using pattern matching and heuristics.
@@ -63,12 +136,14 @@ def analyze_code_quality(code: str, language: str) -> CodeReviewResponse:
     
     lines = code.split('\n')
     suggestions = []
+    python_analyzer = None
     
     # Language-specific analysis
     if language == 'javascript':
         suggestions.extend(analyze_javascript(code, lines))
     elif language == 'python':
-        suggestions.extend(analyze_python(code, lines))
+        python_analyzer = PythonAnalyzer().analyze(code, lines)
+        suggestions.extend(python_analyzer.suggestions)
     elif language == 'java':
         suggestions.extend(analyze_java(code, lines))
     elif language == 'cpp':
@@ -78,7 +153,10 @@ def analyze_code_quality(code: str, language: str) -> CodeReviewResponse:
     suggestions.extend(analyze_general_patterns(code, lines))
     
     # Generate corrected code based on suggestions
-    corrected_code = generate_corrected_code(code, suggestions, language)
+    corrected_code = generate_corrected_code(
+        code, suggestions, language,
+        docstring_slots=python_analyzer.docstring_slots if python_analyzer else None
+    )
     
     # Calculate metrics
     analysis = calculate_metrics(code, lines, suggestions)
@@ -86,12 +164,16 @@ def analyze_code_quality(code: str, language: str) -> CodeReviewResponse:
     # Calculate overall score
     score = calculate_overall_score(analysis, len(suggestions))
     
-    return CodeReviewResponse(
+    response = CodeReviewResponse(
         score=score,
         analysis=analysis,
         suggestions=suggestions,
         corrected_code=corrected_code
     )
+    if python_analyzer and python_analyzer.functions is not None:
+        response.functions = python_analyzer.functions
+        response.docstring_coverage = python_analyzer.docstring_coverage
+    return response
 
 def analyze_javascript(code: str, lines: List[str]) -> List[Suggestion]:
     """Analyze JavaScript-specific patterns"""
@@ -162,6 +244,183 @@ def analyze_javascript(code: str, lines: List[str]) -> List[Suggestion]:
 
 def analyze_python(code: str, lines: List[str]) -> List[Suggestion]:
     """Analyze Python-specific patterns"""
+    return PythonAnalyzer().analyze(code, lines).suggestions
+
+class PythonAnalyzer(ast.NodeVisitor):
+    """
+    Single-pass AST analysis of Python code.
+    Emits the same suggestions as the old line checks (without misfiring on
+    strings and comments) and measures each function as it goes.
+    """
+    
+    COMPLEXITY_THRESHOLD = 10
+    NESTING_THRESHOLD = 4
+    
+    # Nodes that open a nested block, and nodes that add a decision path
+    NESTING_NODES = {ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.With, ast.AsyncWith, ast.Match}
+    BRANCH_NODES = {ast.If, ast.IfExp, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler, ast.Assert, ast.match_case}
+    
+    def __init__(self):
+        self.suggestions: List[Suggestion] = []
+        self.functions: Optional[List[FunctionMetrics]] = []
+        self.docstring_slots = []  # (line, name) where a missing docstring goes
+        self._function = None
+        self._depth = 0
+    
+    @property
+    def docstring_coverage(self) -> Optional[float]:
+        if not self.functions:
+            return None
+        documented = sum(1 for f in self.functions if f.has_docstring)
+        return round(documented / len(self.functions), 2)
+    
+    def analyze(self, code: str, lines: List[str]) -> "PythonAnalyzer":
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            self.functions = None
+            self.suggestions.append(Suggestion(
+                type="bug",
+                severity="high",
+                line=e.lineno,
+                message=f"Syntax error: {e.msg}",
+                suggestion="Fix the syntax error so the code can run"
+            ))
+            self.suggestions.extend(analyze_python_lines(code, lines))
+            return self
+        
+        self.visit(tree)
+        self.suggestions.extend(self.function_suggestions(self.functions))
+        self.suggestions.extend(self.docstring_suggestions(self.functions))
+        return self
+    
+    @classmethod
+    def function_suggestions(cls, functions: List[FunctionMetrics]) -> List[Suggestion]:
+        """Flag functions that are too complex or too deeply nested"""
+        suggestions = []
+        for f in functions:
+            if f.complexity > cls.COMPLEXITY_THRESHOLD:
+                suggestions.append(Suggestion(
+                    type="best-practice",
+                    severity="medium",
+                    line=f.line,
+                    message=f"Function '{f.name}' is too complex (cyclomatic complexity {f.complexity})",
+                    suggestion="Split it into smaller functions with fewer branches"
+                ))
+            if f.nesting_depth > cls.NESTING_THRESHOLD:
+                suggestions.append(Suggestion(
+                    type="best-practice",
+                    severity="medium",
+                    line=f.line,
+                    message=f"Function '{f.name}' is nested {f.nesting_depth} levels deep",
+                    suggestion="Use early returns or extract nested blocks into helper functions"
+                ))
+        return suggestions
+    
+    @staticmethod
+    def docstring_suggestions(functions: List[FunctionMetrics]) -> List[Suggestion]:
+        undocumented = [f for f in functions if not f.has_docstring]
+        if not undocumented:
+            return []
+        return [Suggestion(
+            type="best-practice",
+            severity="low",
+            line=undocumented[0].line,
+            message="Add docstrings to functions",
+            suggestion="Document your functions with descriptive docstrings"
+        )]
+    
+    def visit(self, node):
+        node_type = type(node)
+        if self._function is not None:
+            if node_type in self.BRANCH_NODES:
+                self._function["complexity"] += 1
+            elif node_type is ast.BoolOp:
+                self._function["complexity"] += len(node.values) - 1
+            elif node_type is ast.comprehension:
+                self._function["complexity"] += 1 + len(node.ifs)
+        
+        if node_type in self.NESTING_NODES:
+            self._depth += 1
+            if self._function is not None:
+                self._function["nesting_depth"] = max(self._function["nesting_depth"], self._depth)
+            super().visit(node)
+            self._depth -= 1
+        else:
+            super().visit(node)
+    
+    def visit_If(self, node):
+        self.visit(node.test)
+        for child in node.body:
+            self.visit(child)
+        
+        orelse = node.orelse
+        if len(orelse) == 1 and isinstance(orelse[0], ast.If) and orelse[0].col_offset == node.col_offset:
+            # An elif continues the chain at the same depth
+            self._depth -= 1
+            self.visit(orelse[0])
+            self._depth += 1
+        else:
+            for child in orelse:
+                self.visit(child)
+    
+    def _visit_function(self, node):
+        outer = (self._function, self._depth)
+        self._function = {"complexity": 1, "nesting_depth": 0}
+        self._depth = 0
+        self.generic_visit(node)
+        
+        has_docstring = ast.get_docstring(node, clean=False) is not None
+        self.functions.append(FunctionMetrics(
+            name=node.name,
+            line=node.lineno,
+            complexity=self._function["complexity"],
+            nesting_depth=self._function["nesting_depth"],
+            has_docstring=has_docstring
+        ))
+        body = node.body[0]
+        # A decorated first statement starts at its first decorator
+        body_line = min([body.lineno] + [d.lineno for d in getattr(body, "decorator_list", [])])
+        if not has_docstring and body_line > node.lineno:
+            self.docstring_slots.append((body_line, node.name))
+        self._function, self._depth = outer
+    
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+    
+    def visit_ExceptHandler(self, node):
+        if node.type is None:
+            self.suggestions.append(Suggestion(
+                type="best-practice",
+                severity="medium",
+                line=node.lineno,
+                message="Avoid bare except clauses",
+                suggestion="Catch specific exceptions instead of using bare 'except:'"
+            ))
+        self.generic_visit(node)
+    
+    def visit_Global(self, node):
+        self.suggestions.append(Suggestion(
+            type="best-practice",
+            severity="medium",
+            line=node.lineno,
+            message="Minimize use of global variables",
+            suggestion="Consider passing variables as parameters or using classes"
+        ))
+    
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name) and node.func.id == 'print':
+            self.suggestions.append(Suggestion(
+                type="best-practice",
+                severity="low",
+                line=node.lineno,
+                message="Consider using logging instead of print",
+                suggestion="Use the logging module for better control over output"
+            ))
+        self.generic_visit(node)
+
+def analyze_python_lines(code: str, lines: List[str]) -> List[Suggestion]:
+    """Line-based Python checks, used when the code does not parse"""
     suggestions = []
     
     for i, line in enumerate(lines, 1):
@@ -386,7 +645,12 @@ def calculate_overall_score(analysis: CodeAnalysis, suggestion_count: int) -> in
     
     return final_score
 
-def generate_corrected_code(code: str, suggestions: List[Suggestion], language: str) -> str:
+def generate_corrected_code(
+    code: str,
+    suggestions: List[Suggestion],
+    language: str,
+    docstring_slots: Optional[list] = None
+) -> str:
     """
     Generate corrected code based on the suggestions provided.
     This function applies common fixes and improvements.
@@ -397,7 +661,10 @@ def generate_corrected_code(code: str, suggestions: List[Suggestion], language:
         if language == 'javascript':
             corrected_lines = fix_javascript_issues(corrected_lines, suggestions)
         elif language == 'python':
-            corrected_lines = fix_python_issues(corrected_lines, suggestions)
+            if docstring_slots is not None:
+                corrected_lines = add_python_docstrings(corrected_lines, docstring_slots)
+            else:
+                corrected_lines = fix_python_issues(corrected_lines, suggestions)
         elif language == 'java':
             corrected_lines = fix_java_issues(corrected_lines, suggestions)
         elif language == 'cpp':
@@ -454,6 +721,23 @@ def fix_python_issues(lines: List[str], suggestions: List[Suggestion]) -> List[s
     
     return corrected_lines
 
+def add_python_docstrings(lines: List[str], docstring_slots: list) -> List[str]:
+    """Insert placeholder docstrings where the AST found them missing
+    
+    Each docstring copies the leading whitespace of the body line it goes
+    above, so tab-indented code stays consistent.
+    """
+    slots = dict(docstring_slots)
+    corrected_lines = []
+    
+    for i, line in enumerate(lines, 1):
+        if i in slots:
+            indent = line[:len(line) - len(line.lstrip())]
+            corrected_lines.append(indent + f'"""{slots[i]} function."""')
+        corrected_lines.append(line)
+    
+    return corrected_lines
+
 def fix_java_issues(lines: List[str], suggestions: List[Suggestion]) -> List[str]:
     """Fix Java-specific issues"""
     corrected_lines = lines.copy()
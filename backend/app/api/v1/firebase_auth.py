@@ -57,28 +57,11 @@ async def firebase_login(
                 detail="Invalid or expired Firebase token"
             )
         
-        # Get or create user in our database
-        user = await user_service.get_user_by_firebase_uid(db, firebase_user['uid'])
-        
-        if not user:
-            # Create new user if doesn't exist
-            user_data = {
-                'firebase_uid': firebase_user['uid'],
-                'email': firebase_user.get('email'),
-                'username': firebase_user.get('email', '').split('@')[0],
-                'display_name': firebase_user.get('name', firebase_user.get('email', '')),
-                'avatar_url': firebase_user.get('picture'),
-                'level': 1,
-                'xp': 0,
-                'badges': [],
-                'completed_quests': []
-            }
-            
-            user = await user_service.create_firebase_user(db, user_data)
+        # Get or create the user and record the login in one round trip
+        user, created = await user_service.upsert_firebase_user(db, firebase_user)
+        if created:
             message = "Account created and logged in successfully"
         else:
-            # Update last login
-            await user_service.update_last_login(db, user.id)
             message = "Logged in successfully"
         
         # Convert user to dict for response
@@ -124,30 +107,20 @@ async def firebase_register(
                 detail="Invalid or expired Firebase token"
             )
         
-        # Check if user already exists
-        existing_user = await user_service.get_user_by_firebase_uid(db, firebase_user['uid'])
+        # Create the user unless this Firebase account is already registered
+        user, created = await user_service.upsert_firebase_user(
+            db,
+            firebase_user,
+            username=request.username,
+            display_name=request.display_name
+        )
         
-        if existing_user:
+        if not created:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="User already exists"
             )
         
-        # Create new user
-        user_data = {
-            'firebase_uid': firebase_user['uid'],
-            'email': firebase_user.get('email'),
-            'username': request.username or firebase_user.get('email', '').split('@')[0],
-            'display_name': request.display_name or firebase_user.get('name', firebase_user.get('email', '')),
-            'avatar_url': firebase_user.get('picture'),
-            'level': 1,
-            'xp': 0,
-            'badges': [],
-            'completed_quests': []
-        }
-        
-        user = await user_service.create_firebase_user(db, user_data)
-        
         # Convert user to dict for response
         user_dict = user.model_dump()
         user_dict['id'] = str(user.id)
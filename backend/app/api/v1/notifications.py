@@ -1,67 +1,64 @@
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.core.config import settings
 from app.core.database import get_db
-from app.core.security import verify_token
+from app.api.deps import Principal, get_current_user_id, get_optional_principal, resolve_principal
+from app.services.notification_hub import notification_hub
+from app.services.notification_service import NotificationService
+from app.utils.json_encoder import MongoJSONEncoder
 from typing import Optional
-from bson import ObjectId
-from datetime import datetime
+import asyncio
+import json
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
+notification_service = NotificationService()
 
 @router.get("")
 async def get_notifications(
-    authorization: Optional[str] = Header(None),
+    response: Response,
+    user_id: str = Depends(get_current_user_id),
     db: AsyncIOMotorDatabase = Depends(get_db),
     unread_only: bool = False,
-    limit: int = 50
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = None
 ):
-    """Get user notifications"""
-    if not authorization:
-        return {"error": "Not authenticated"}
-    
-    token = authorization.replace("Bearer ", "")
-    user_id = verify_token(token)
-    
-    if not user_id:
-        return {"error": "Invalid token"}
+    """Get user notifications, newest first
     
+    Returns a list of at most 100 notifications. When more
+    exist, pass the ``X-Next-Cursor`` response header back as ``cursor``
+    for the next page.
+    """
     try:
-        query = {"user_id": user_id}
-        if unread_only:
-            query["is_read"] = False
-        
-        notifications = await db["notifications"].find(query).sort(
-            "created_at", -1
-        ).limit(limit).to_list(limit)
-        
-        return [{"id": str(n["_id"]), **{k: v for k, v in n.items() if k != "_id"}} for n in notifications]
+        page = await notification_service.get_notifications(
+            db, user_id, unread_only=unread_only, limit=limit, cursor=cursor
+        )
+        if page["next_cursor"]:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
+        return page["notifications"]
+    except Exception as e:
+        return {"error": str(e)}
+
+@router.get("/unread-count")
+async def get_unread_count(
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get the unread notification count for the badge"""
+    try:
+        return {"unread": await notification_service.get_unread_count(db, user_id)}
     except Exception as e:
         return {"error": str(e)}
 
 @router.put("/{notification_id}/read")
 async def mark_as_read(
     notification_id: str,
-    authorization: Optional[str] = Header(None),
+    user_id: str = Depends(get_current_user_id),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Mark notification as read"""
-    if not authorization:
-        return {"error": "Not authenticated"}
-    
-    token = authorization.replace("Bearer ", "")
-    user_id = verify_token(token)
-    
-    if not user_id:
-        return {"error": "Invalid token"}
-    
     try:
-        await db["notifications"].update_one(
-            {
-                "_id": ObjectId(notification_id),
-                "user_id": user_id
-            },
-            {"$set": {"is_read": True}}
-        )
+        await notification_service.mark_as_read(db, user_id, notification_id)
         
         return {"status": "marked_as_read"}
     except Exception as e:
@@ -69,25 +66,71 @@ async def mark_as_read(
 
 @router.post("/mark-all-read")
 async def mark_all_as_read(
-    authorization: Optional[str] = Header(None),
+    user_id: str = Depends(get_current_user_id),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Mark all notifications as read"""
-    if not authorization:
-        return {"error": "Not authenticated"}
-    
-    token = authorization.replace("Bearer ", "")
-    user_id = verify_token(token)
-    
-    if not user_id:
-        return {"error": "Invalid token"}
-    
     try:
-        await db["notifications"].update_many(
-            {"user_id": user_id},
-            {"$set": {"is_read": True}}
-        )
+        marked = await notification_service.mark_all_as_read(db, user_id)
         
-        return {"status": "all_marked_as_read"}
+        return {"status": "all_marked_as_read", "marked": marked}
     except Exception as e:
         return {"error": str(e)}
+
+def _format_sse(event: dict) -> str:
+    """Serialize an event as a Server-Sent Events frame"""
+    payload = json.dumps(event, cls=MongoJSONEncoder)
+    return f"id: {event['id']}\nevent: {event['kind']}\ndata: {payload}\n\n"
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    principal: Optional[Principal] = Depends(get_optional_principal),
+    last_event_id: Optional[str] = Header(None),
+    token: Optional[str] = None,
+    cursor: Optional[str] = None
+):
+    """Push new notifications, XP awards and badge unlocks over SSE
+    
+    ``EventSource`` cannot send headers, so the token may also be passed
+    as a query parameter. Reconnecting clients resume after the
+    ``Last-Event-ID`` header (or ``cursor`` query parameter).
+    """
+    principal = principal or resolve_principal(token)
+    if not principal:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    user_id = principal.user_id
+    
+    resume_from = last_event_id or cursor
+    
+    async def event_stream():
+        # Subscribe before replaying so nothing published in between is lost
+        queue = notification_hub.subscribe(user_id)
+        replayed = set()
+        try:
+            for event in await notification_hub.replay(user_id, resume_from):
+                replayed.add(event["id"])
+                yield _format_sse(event)
+            
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(),
+                        timeout=settings.NOTIFICATION_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                
+                if event["id"] in replayed:
+                    replayed.discard(event["id"])
+                    continue  # already sent during replay
+                yield _format_sse(event)
+        finally:
+            notification_hub.unsubscribe(user_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
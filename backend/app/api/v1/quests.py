@@ -38,11 +38,12 @@ async def get_quests_slash():
 
 @router.post("/complete")
 async def complete_quest(
-    request: CompleteQuestRequest
+    request: CompleteQuestRequest,
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Complete a quest and update user analytics (in-memory version)"""
+    """Complete a quest and update user analytics"""
     try:
-        quest_service = QuestService()
+        quest_service = QuestService(db)
         result = await quest_service.complete_quest(request.user_id, request.quest_id)
         print(f"🎯 Quest {request.quest_id} completed by {request.user_id}")
         return {
@@ -55,11 +56,12 @@ async def complete_quest(
 
 @router.post("/start")
 async def start_quest(
-    request: CompleteQuestRequest
+    request: CompleteQuestRequest,
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Start a quest (in-memory version)"""
+    """Start a quest"""
     try:
-        quest_service = QuestService()
+        quest_service = QuestService(db)
         result = await quest_service.start_quest(request.user_id, request.quest_id)
         print(f"▶️ Quest {request.quest_id} started by {request.user_id}")
         return {
@@ -7,12 +7,16 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.database import get_db
 from app.services.quest_system_service import QuestSystemService
 from app.services.gamification_service import GamificationService
-from pydantic import BaseModel
+from app.services.activity_service import ActivityService
+from pydantic import BaseModel, Field
+from typing import List
 from datetime import datetime
+import asyncio
 
 router = APIRouter(prefix="/quests-system", tags=["quest-system"])
 quest_service = QuestSystemService()
 gamification_service = GamificationService()
+activity_service = ActivityService()
 
 class StartQuestRequest(BaseModel):
     """Start a quest"""
@@ -25,6 +29,22 @@ class CompleteTaskRequest(BaseModel):
     task_id: str
     user_id: str = "demo_user"
 
+MAX_BATCH_SIZE = 500
+
+class BulkStartQuestRequest(BaseModel):
+    """Start quests for a cohort of users"""
+    enrollments: List[StartQuestRequest] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class BulkCompleteTaskRequest(BaseModel):
+    """Complete a batch of tasks, e.g. from an offline sync"""
+    completions: List[CompleteTaskRequest] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+async def _evaluate_user_rewards(db, user_id: str) -> dict:
+    """Run badge and streak evaluation once for a user"""
+    new_badges = await gamification_service.check_new_badges(db, user_id)
+    streak_result = await gamification_service.update_streak(db, user_id)
+    return {"new_badges": new_badges, "streak": streak_result}
+
 # ==================== QUEST ENDPOINTS ====================
 
 @router.get("/all")
@@ -107,6 +127,48 @@ async def complete_task(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/start/bulk")
+async def bulk_start_quests(
+    req: BulkStartQuestRequest,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Enroll many users in quests with a single bulk write"""
+    try:
+        result = await quest_service.bulk_start_quests(
+            db,
+            [e.model_dump() for e in req.enrollments]
+        )
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/complete-task/bulk")
+async def bulk_complete_tasks(
+    req: BulkCompleteTaskRequest,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Mark a batch of tasks as completed"""
+    try:
+        result = await quest_service.bulk_complete_tasks(
+            db,
+            [c.model_dump() for c in req.completions]
+        )
+        
+        if result.get("success"):
+            # Badges and streaks are evaluated once per affected user
+            user_ids = list(result["xp_by_user"])
+            rewards = await asyncio.gather(
+                *(_evaluate_user_rewards(db, user_id) for user_id in user_ids)
+            )
+            result["users"] = {
+                user_id: {"xp_awarded": result["xp_by_user"][user_id], **reward}
+                for user_id, reward in zip(user_ids, rewards)
+            }
+        
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/user/{user_id}/progress/{quest_id}")
 async def get_quest_progress(
     user_id: str,
@@ -206,6 +268,30 @@ async def get_user_streak(
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@router.get("/user/{user_id}/activity")
+async def get_user_activity(
+    user_id: str,
+    window_days: int = 30,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get streaks and active days computed from the activity bitmap"""
+    try:
+        return await activity_service.get_activity_summary(db, user_id, window_days)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@router.get("/user/{user_id}/activity/heatmap")
+async def get_user_activity_heatmap(
+    user_id: str,
+    year: int = None,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get a full-year activity heatmap"""
+    try:
+        return await activity_service.get_heatmap(db, user_id, year)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 @router.get("/health")
 async def quest_system_health():
     """Health check for quest system"""
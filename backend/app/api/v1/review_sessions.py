@@ -0,0 +1,63 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import List
+from app.services.review_session import SessionConflict, review_sessions
+
+router = APIRouter(prefix="/ai/review-sessions", tags=["ai-code-review"])
+
+
+class ReviewSessionRequest(BaseModel):
+    code: str
+    language: str = "python"
+
+
+class LineEdit(BaseModel):
+    start_line: int = Field(..., ge=1)
+    end_line: int = Field(..., ge=0)
+    lines: List[str]
+
+
+class ReviewSessionEdits(BaseModel):
+    version: int
+    edits: List[LineEdit]
+
+
+@router.post("")
+async def create_review_session(request: ReviewSessionRequest):
+    """Open an incremental review session and return its initial findings"""
+    try:
+        session = review_sessions.create(request.code, request.language)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return session.snapshot()
+
+
+@router.get("/{session_id}")
+async def get_review_session(session_id: str):
+    """Get all findings for the session's current version"""
+    session = review_sessions.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Review session not found")
+    return session.snapshot()
+
+
+@router.post("/{session_id}/edits")
+async def edit_review_session(session_id: str, request: ReviewSessionEdits):
+    """Apply line-range edits and return the added, removed and moved findings"""
+    session = review_sessions.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Review session not found")
+    try:
+        return review_sessions.update(session, [edit.model_dump() for edit in request.edits], request.version)
+    except SessionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/{session_id}")
+async def close_review_session(session_id: str):
+    """Close a review session"""
+    if not review_sessions.close(session_id):
+        raise HTTPException(status_code=404, detail="Review session not found")
+    return {"success": True}
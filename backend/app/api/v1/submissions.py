@@ -5,6 +5,7 @@ from app.core.security import verify_token
 from typing import Optional
 from pydantic import BaseModel
 from app.services.submission_service import SubmissionService
+from app.services.job_queue import job_queue
 
 class SubmissionCreate(BaseModel):
     task_id: str
@@ -81,9 +82,21 @@ async def evaluate_submission(
         return {"error": "Invalid token"}
     
     try:
-        service = SubmissionService(db)
-        result = await service.evaluate_submission(submission_id)
-        return result
+        # Identical code already evaluated for this task needs no sandbox run
+        cached = await SubmissionService(db).evaluate_submission(submission_id, cached_only=True)
+        if cached is not None:
+            return {**cached, "cached": True}
+        
+        # Evaluate in the background; poll /jobs/{job_id} or watch the
+        # notification stream for job_update events
+        job_id = await job_queue.enqueue(
+            db,
+            "evaluate_submission",
+            {"submission_id": submission_id},
+            user_id=user_id,
+            priority=10
+        )
+        return {"job_id": job_id, "status": "queued"}
     except Exception as e:
         return {"error": str(e)}
 
@@ -5,9 +5,12 @@ Workflow API Endpoints
 from fastapi import APIRouter, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.database import get_db
+from app.api.deps import get_optional_user_id
 from app.services.workflow_service import WorkflowService
+from app.services.job_queue import job_queue
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 
 router = APIRouter(prefix="/workflow", tags=["workflow"])
 workflow_service = WorkflowService()
@@ -44,6 +47,30 @@ async def get_workflow_state(
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@router.get("/{user_id}/current-state")
+async def get_current_workflow_state(
+    user_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get user's current workflow state from the event log head"""
+    try:
+        result = await workflow_service.get_current_state(db, user_id)
+        return result
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@router.get("/{user_id}/history")
+async def get_workflow_history(
+    user_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get time spent in each workflow state"""
+    try:
+        result = await workflow_service.get_state_history(db, user_id)
+        return result
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 @router.post("/init")
 async def initialize_workflow(
     user_id: str = "demo_user",
@@ -117,6 +144,7 @@ async def ask_ai_help(
 @router.post("/submit-for-review")
 async def submit_code_for_review(
     req: SubmitCodeForReviewRequest,
+    caller_id: Optional[str] = Depends(get_optional_user_id),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Submit code for AI review"""
@@ -131,45 +159,34 @@ async def submit_code_for_review(
         )
         
         if result.get("success"):
-            # Get AI feedback
-            from app.services.ai_service import AIService
-            ai_service = AIService()
-            
-            feedback_prompt = f"""
-Review this code and provide constructive feedback:
-
-Code:
-{req.code}
-
-Please provide:
-1. What the code does well
-2. Areas for improvement
-3. Best practices suggestions
-4. Any bugs or issues
-5. Rating (1-5 stars)
-            """
-            
-            ai_response = await ai_service.chat(
-                feedback_prompt,
-                req.user_id,
-                f"Code review for task: {req.task_id}"
+            # Identical code was already reviewed for this task
+            cached = await workflow_service.apply_cached_review(
+                db, result["submission_id"], req.task_id, result["content_hash"]
             )
+            if cached:
+                return {"success": True, **cached, "status": "reviewed", "cached": True}
             
-            # Save feedback to database
-            await db["code_submissions"].update_one(
-                {"_id": result["submission_id"]},
+            # Review asynchronously; poll /jobs/{job_id} or watch the
+            # notification stream for job_update events
+            job_id = await job_queue.enqueue(
+                db,
+                "code_review",
                 {
-                    "$set": {
-                        "ai_feedback": ai_response.get("response"),
-                        "status": "reviewed"
-                    }
-                }
+                    "submission_id": result["submission_id"],
+                    "user_id": req.user_id,
+                    "task_id": req.task_id,
+                    "code": req.code,
+                    "content_hash": result["content_hash"]
+                },
+                # /jobs/{job_id} only shows jobs to the token that owns them
+                user_id=caller_id or req.user_id
             )
             
             return {
                 "success": True,
                 "submission_id": result["submission_id"],
-                "feedback": ai_response.get("response"),
+                "job_id": job_id,
+                "status": "queued",
                 "timestamp": datetime.utcnow().isoformat()
             }
         
@@ -192,6 +209,17 @@ async def get_workflow_analytics(
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@router.get("/funnel")
+async def get_workflow_funnel(
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get funnel analytics across all users"""
+    try:
+        result = await workflow_service.get_funnel(db)
+        return result
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 @router.get("/{user_id}/progress")
 async def get_workflow_progress(
     user_id: str,
@@ -199,14 +227,7 @@ async def get_workflow_progress(
 ):
     """Get overall workflow progress"""
     try:
-        # Get all progress
-        workflow_state = await workflow_service.get_user_workflow_state(db, user_id)
-        analytics = await workflow_service.get_workflow_analytics(db, user_id)
-        
-        return {
-            "success": True,
-            "state": workflow_state.get("state"),
-            "analytics": analytics.get("analytics")
-        }
+        result = await workflow_service.get_workflow_progress(db, user_id)
+        return result
     except Exception as e:
         return {"success": False, "error": str(e)}
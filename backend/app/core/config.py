@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 class Settings(BaseSettings):
     # App settings
@@ -20,6 +20,10 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-super-secret-key-here"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    TOKEN_CACHE_SIZE: int = 10000
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
     
     # GitHub settings
     GITHUB_TOKEN: str = ""
@@ -32,6 +36,16 @@ class Settings(BaseSettings):
     GEMINI_MODEL: str = "gemini-2.5-flash-lite"
     GEMINI_MAX_TOKENS: int = 1000
     GEMINI_TEMPERATURE: float = 0.7
+    GEMINI_MAX_CONCURRENCY: int = 4
+    
+    # Tiered code review: code within these limits is reviewed by the local
+    # analyzers alone unless a quest needs grading
+    AI_REVIEW_LOCAL_MAX_LINES: int = 40
+    AI_REVIEW_LOCAL_MAX_COMPLEXITY: int = 6
+    
+    # Large submissions are reviewed in parts of about this many lines
+    AI_REVIEW_CHUNK_LINES: int = 200
+    AI_REVIEW_MAX_CHUNKS: int = 8
     
     # Firebase Configuration
     FIREBASE_PROJECT_ID: str = "gamified-oss"
@@ -40,6 +54,67 @@ class Settings(BaseSettings):
     FIREBASE_STORAGE_BUCKET: str = "gamified-oss.firebasestorage.app"
     FIREBASE_MESSAGING_SENDER_ID: str = "189137801621"
     FIREBASE_APP_ID: str = "1:189137801621:web:d73bba21c289e8522ca69c"
+    FIREBASE_TOKEN_CACHE_SIZE: int = 10000
+    FIREBASE_TOKEN_CACHE_MAX_AGE_SECONDS: int = 300
+    FIREBASE_CERT_REFRESH_SECONDS: int = 1800
+    
+    # User state cache
+    USER_CACHE_MAX_SIZE: int = 1024
+    USER_CACHE_TTL_SECONDS: int = 60
+    
+    # Push notifications ("local" for a single worker, "mongo" to fan out across workers)
+    NOTIFICATION_BROKER: str = "local"
+    NOTIFICATION_QUEUE_SIZE: int = 100
+    NOTIFICATION_HISTORY_SIZE: int = 1000
+    NOTIFICATION_EVENTS_CAP_BYTES: int = 16 * 1024 * 1024
+    NOTIFICATION_HEARTBEAT_SECONDS: int = 15
+    NOTIFICATION_RETENTION_DAYS: int = 90
+    NOTIFICATION_ARCHIVE_TTL_DAYS: int = 365
+    NOTIFICATION_DIGEST_WINDOW_SECONDS: float = 5.0
+    NOTIFICATION_DIGEST_MAX_PENDING: int = 10000
+    
+    # Background jobs
+    STREAK_SWEEP_ENABLED: bool = True
+    NOTIFICATION_ARCHIVAL_ENABLED: bool = True
+    
+    # Background job queue (submission evaluation, AI code review)
+    JOB_WORKERS: int = 2
+    JOB_LEASE_SECONDS: int = 60
+    JOB_POLL_SECONDS: float = 1.0
+    JOB_RETRY_BASE_SECONDS: float = 5
+    
+    # Cached evaluation/review results for identical code
+    EVALUATION_CACHE_TTL_DAYS: int = 30
+    
+    # Submitted code storage (compressed blobs above this size go to GridFS)
+    CODE_STORAGE_INLINE_MAX_BYTES: int = 64 * 1024
+    CODE_STORAGE_MAX_DELTA_CHAIN: int = 8
+    
+    # Multi-file review (REVIEW_WORKERS=0 uses one process per CPU core)
+    REVIEW_WORKERS: int = 0
+    REVIEW_MEMORY_BUDGET_MB: int = 64
+    REVIEW_MAX_FILES: int = 500
+    REVIEW_MAX_FILE_BYTES: int = 512 * 1024
+    REVIEW_MAX_ARCHIVE_MB: int = 20
+    REVIEW_MAX_ARCHIVE_EXPANDED_MB: int = 128  # declared size of all members, skipped ones included
+    
+    # As-you-type review sessions (kept in memory per process)
+    REVIEW_SESSION_MAX: int = 1000
+    REVIEW_SESSION_TTL_SECONDS: int = 1800
+    REVIEW_SESSION_MAX_LINES: int = 5000
+    
+    # Sandboxed code execution (CODE_RUNNER_WORKERS=0 uses one per CPU core;
+    # runs execute as CODE_RUNNER_UID, which must not be the server's own uid)
+    CODE_RUNNER_WORKERS: int = 0
+    CODE_RUNNER_TIMEOUT_SECONDS: float = 10
+    CODE_RUNNER_CPU_SECONDS: int = 5
+    CODE_RUNNER_MEMORY_MB: int = 256
+    CODE_RUNNER_MAX_FILE_BYTES: int = 1024 * 1024
+    CODE_RUNNER_MAX_PROCESSES: int = 32
+    CODE_RUNNER_UID: Optional[int] = 65534
+    CODE_RUNNER_WARM_POOL: bool = True
+    CODE_RUNNER_WARM_MAX_RUNS: int = 100
+    CODE_RUNNER_WARM_MAX_RSS_MB: int = 128
     
     # CORS settings
     CORS_ORIGINS: List[str] = [
@@ -0,0 +1,50 @@
+"""
+Background job scheduler
+Runs periodic maintenance jobs inside the API process
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List
+
+_tasks: List[asyncio.Task] = []
+
+
+def seconds_until_next_utc_midnight(now: datetime = None) -> float:
+    """Seconds until the next UTC day boundary"""
+    now = now or datetime.utcnow()
+    tomorrow = datetime(now.year, now.month, now.day) + timedelta(days=1)
+    return (tomorrow - now).total_seconds()
+
+
+async def _run_daily(name: str, job: Callable[[], Awaitable], delay_seconds: float, retry_seconds: float):
+    """Run ``job`` shortly after every UTC midnight, retrying failures that day
+
+    A job fails by raising or by returning ``{"success": False, ...}``.
+    """
+    while True:
+        await asyncio.sleep(seconds_until_next_utc_midnight() + delay_seconds)
+        while True:
+            try:
+                result = await job()
+                failed = isinstance(result, dict) and result.get("success") is False
+                print(f"{'❌' if failed else '🕛'} Scheduled job {name} finished: {result}")
+            except Exception as e:
+                failed = True
+                print(f"❌ Scheduled job {name} failed: {e}")
+            if not failed or seconds_until_next_utc_midnight() <= retry_seconds:
+                break
+            await asyncio.sleep(retry_seconds)
+
+
+def schedule_daily(name: str, job: Callable[[], Awaitable], delay_seconds: float = 5, retry_seconds: float = 300):
+    """Schedule a coroutine function to run daily at the UTC day boundary"""
+    _tasks.append(asyncio.create_task(_run_daily(name, job, delay_seconds, retry_seconds), name=name))
+
+
+async def shutdown_scheduler():
+    """Cancel all scheduled jobs"""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
@@ -1,11 +1,20 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
@@ -15,6 +24,49 @@ def get_password_hash(password: str) -> str:
     """Hash password"""
     return pwd_context.hash(password)
 
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the password hashing queue is full"""
+
+class PasswordHasher:
+    """Run bcrypt on a dedicated bounded pool instead of the event loop
+    
+    bcrypt releases the GIL, so a thread pool gives real parallelism.
+    At most ``workers + queue_limit`` operations may be pending; beyond
+    that callers get ``PasswordHasherBusy`` rather than queueing forever.
+    """
+    
+    def __init__(self, workers: int = 4, queue_limit: int = 64, context: CryptContext = pwd_context):
+        self.context = context
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+    
+    async def _run(self, fn, *args):
+        if self._pending >= self.workers + self.queue_limit:
+            raise PasswordHasherBusy("Too many concurrent password operations")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+    
+    async def hash(self, password: str) -> str:
+        """Hash a password with the configured cost"""
+        return await self._run(self.context.hash, password)
+    
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password; also return a new hash if the stored cost is outdated"""
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT
+)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT token"""
     to_encode = data.copy()
@@ -27,13 +79,71 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+class VerifiedTokenCache:
+    """LRU cache of verified tokens keyed by token hash
+    
+    Entries live until the token's ``exp`` or ``max_age_seconds``,
+    whichever comes first, so revoked accounts are re-checked soon.
+    """
+    
+    def __init__(self, max_size: int = 10000, max_age_seconds: float = 300):
+        self.max_size = max_size
+        self.max_age_seconds = max_age_seconds
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.time():
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+        if entry:
+            del self._entries[key]
+        self.misses += 1
+        return None
+    
+    def put(self, token: str, value: Dict[str, Any], exp: float) -> None:
+        key = self._key(token)
+        self._entries[key] = (min(exp, time.time() + self.max_age_seconds), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+# Decoded access-token claims, so each token is verified once until it expires
+token_claims_cache = VerifiedTokenCache(
+    max_size=settings.TOKEN_CACHE_SIZE,
+    max_age_seconds=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
+
 def decode_token(token: str) -> dict:
-    """Decode JWT token"""
+    """Decode JWT token, reusing claims already verified for this token"""
+    payload = token_claims_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         return None
+    if "exp" in payload:
+        token_claims_cache.put(token, payload, payload["exp"])
+    return payload
 
 def verify_token(token: str) -> Optional[str]:
     """Verify token and return user_id"""
@@ -7,6 +7,21 @@ import uvicorn
 from app.api.v1 import ai, auth, users, quests, github_integration, analytics, github, firebase_auth
 from app.core.config import settings
 from app.core.database import get_database, close_database_connection
+from app.core.scheduler import schedule_daily, shutdown_scheduler
+from app.services.gamification_service import GamificationService
+from app.services.user_state_cache import user_state_cache
+from app.services.firebase_service import firebase_admin_service
+from app.services.notification_hub import notification_hub
+from app.services.notification_service import NotificationService
+from app.services.notification_digest import notification_digest
+from app.services.job_queue import job_queue
+from app.services.code_runner import code_runner
+from app.services.result_cache import result_cache
+from app.services.repository_review import repository_reviewer
+from app.services.review_session import review_sessions
+from app.services.tiered_review import tiered_reviewer
+from app.services.submission_service import SubmissionService
+from app.services.workflow_service import WorkflowService
 
 # Create FastAPI app
 app = FastAPI(
@@ -23,6 +38,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include all routers
@@ -47,7 +63,13 @@ async def health_check():
         "status": "healthy",
         "app_name": settings.APP_NAME,
         "version": settings.APP_VERSION,
-        "debug": settings.DEBUG
+        "debug": settings.DEBUG,
+        "user_cache": user_state_cache.stats(),
+        "token_cache": firebase_admin_service.token_cache.stats(),
+        "code_runner": code_runner.stats(),
+        "result_cache": result_cache.stats(),
+        "review_sessions": review_sessions.stats(),
+        "tiered_review": tiered_reviewer.stats()
     }
 
 @app.on_event("startup")
@@ -64,11 +86,60 @@ async def startup_event():
             print("⚠️ Running without database connection")
     except Exception as e:
         print(f"⚠️ Database initialization failed: {e}")
+    
+    # Push channel for notifications
+    try:
+        await notification_hub.start()
+    except Exception as e:
+        print(f"⚠️ Notification hub failed to start: {e}")
+    
+    # Keep Firebase signing certificates warm for token verification
+    await firebase_admin_service.start()
+    
+    # Coalesce bursts of XP and badge events into digest notifications
+    await notification_digest.start(get_database)
+    
+    # Pre-fork warm interpreters so test runs skip Python start-up
+    try:
+        await code_runner.start()
+    except Exception as e:
+        print(f"⚠️ Code runner warm pool failed to start: {e}")
+    
+    # Evaluate submissions and run AI reviews off the request path
+    job_queue.register("evaluate_submission", SubmissionService.evaluate_job)
+    job_queue.register("code_review", WorkflowService().review_code_submission)
+    if settings.JOB_WORKERS > 0:
+        job_queue.start(get_database, settings.JOB_WORKERS)
+    
+    # Reset lapsed streaks after every UTC day boundary
+    if settings.STREAK_SWEEP_ENABLED:
+        async def sweep_streaks():
+            db = await get_database()
+            return await GamificationService().expire_lapsed_streaks(db)
+        
+        schedule_daily("streak_sweep", sweep_streaks)
+    
+    # Move expired notifications to the TTL-indexed archive
+    if settings.NOTIFICATION_ARCHIVAL_ENABLED:
+        async def archive_notifications():
+            db = await get_database()
+            return await NotificationService().archive_old_notifications(
+                db, settings.NOTIFICATION_RETENTION_DAYS
+            )
+        
+        schedule_daily("notification_archive", archive_notifications)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     print("🔄 Shutting down CodeQuest API server...")
+    await shutdown_scheduler()
+    await job_queue.stop()
+    await code_runner.stop()
+    repository_reviewer.shutdown()
+    await notification_digest.stop()
+    await firebase_admin_service.stop()
+    await notification_hub.stop()
     await close_database_connection()
 
 @app.get("/")
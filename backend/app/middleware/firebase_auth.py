@@ -81,31 +81,10 @@ class FirebaseAuthMiddleware:
             HTTPException: If user not found in database
         """
         try:
-            # Find user in our database by Firebase UID
-            user = await user_service.get_user_by_firebase_uid(db, firebase_user['uid'])
-            
-            if not user:
-                # If user doesn't exist in our database, create them
-                user_data = {
-                    'firebase_uid': firebase_user['uid'],
-                    'email': firebase_user.get('email'),
-                    'username': firebase_user.get('email', '').split('@')[0],  # Use email prefix as username
-                    'display_name': firebase_user.get('name', firebase_user.get('email', '')),
-                    'avatar_url': firebase_user.get('picture'),
-                    'level': 1,
-                    'xp': 0,
-                    'badges': [],
-                    'completed_quests': [],
-                    'created_at': None,  # Will be set by user service
-                    'last_login': None
-                }
-                
-                user = await user_service.create_firebase_user(db, user_data)
+            # Get or create the user and record the login in one round trip
+            user, created = await user_service.upsert_firebase_user(db, firebase_user)
+            if created:
                 print(f"✅ Created new user in database: {user.email}")
-            else:
-                # Update last login time
-                await user_service.update_last_login(db, user.id)
-                print(f"✅ User logged in: {user.email}")
             
             return user
             
@@ -0,0 +1,101 @@
+"""
+Activity Service
+Per-user daily activity bitmaps for streaks and heatmaps
+"""
+
+from datetime import datetime, timedelta, date
+from pymongo import ReturnDocument
+from app.utils.activity_bitmap import (
+    day_index,
+    activity_doc_id,
+    mark_day_update,
+    bitmap_from_doc,
+    current_streak,
+    longest_streak,
+    active_days,
+    heatmap,
+)
+
+class ActivityService:
+    """Store daily activity as one bitmap document per user per year"""
+
+    COLLECTION = "user_activity"
+
+    async def record_activity(self, db, user_id: str, when: datetime = None) -> dict:
+        """Set today's bit with a single upserting bitwise update
+
+        Returns the updated bitmap document for the year.
+        """
+        day = (when or datetime.utcnow()).date()
+        update = mark_day_update(day)
+        update["$setOnInsert"] = {"user_id": user_id, "year": day.year}
+
+        return await db[self.COLLECTION].find_one_and_update(
+            {"_id": activity_doc_id(user_id, day.year)},
+            update,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def record_activity_streak(self, db, user_id: str, when: datetime = None) -> int:
+        """Record activity and return the current streak from the bitmap"""
+        today = (when or datetime.utcnow()).date()
+        doc = await self.record_activity(db, user_id, when)
+        bitmaps = {today.year: bitmap_from_doc(doc)}
+        streak = current_streak(bitmaps, today)
+
+        # Only touch last year's document when the run reaches January 1st
+        if streak > day_index(today):
+            bitmaps.update(await self.get_bitmaps(db, user_id, [today.year - 1]))
+            streak = current_streak(bitmaps, today)
+
+        return streak
+
+    async def get_bitmaps(self, db, user_id: str, years: list) -> dict:
+        """Load the bitmaps for the given years in one query"""
+        docs = await db[self.COLLECTION].find(
+            {"_id": {"$in": [activity_doc_id(user_id, year) for year in years]}}
+        ).to_list(len(years))
+        return {doc["year"]: bitmap_from_doc(doc) for doc in docs}
+
+    def summarize(self, bitmaps: dict, today: date, window_days: int = 30) -> dict:
+        """Compute streak and activity stats from loaded bitmaps"""
+        return {
+            "current_streak": current_streak(bitmaps, today),
+            "longest_streak": longest_streak(bitmaps),
+            "active_days": active_days(
+                bitmaps, today - timedelta(days=window_days - 1), today
+            ),
+            "window_days": window_days,
+        }
+
+    async def get_activity_summary(self, db, user_id: str, window_days: int = 30) -> dict:
+        """Current streak, longest streak and active days in a window"""
+        try:
+            today = datetime.utcnow().date()
+            first_year = (today - timedelta(days=window_days - 1)).year
+            # The previous year is needed for streaks that span January 1st
+            years = list(range(min(first_year, today.year - 1), today.year + 1))
+            bitmaps = await self.get_bitmaps(db, user_id, years)
+
+            return {"success": True, "activity": self.summarize(bitmaps, today, window_days)}
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def get_heatmap(self, db, user_id: str, year: int = None) -> dict:
+        """Full-year heatmap data from a single bitmap document"""
+        try:
+            year = year or datetime.utcnow().year
+            doc = await db[self.COLLECTION].find_one({"_id": activity_doc_id(user_id, year)})
+            bitmap = bitmap_from_doc(doc)
+
+            return {
+                "success": True,
+                "year": year,
+                "active_days": bitmap.bit_count(),
+                "heatmap": heatmap(bitmap, year)
+            }
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
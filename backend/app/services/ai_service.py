@@ -3,11 +3,18 @@ AI Chat Service - Powered by Google Gemini
 Handles AI conversations, code explanations, and hints
 """
 
+import asyncio
+import hashlib
+import math
 import os
 import json
+import re
 from datetime import datetime
+from typing import Awaitable, Callable, Dict
 import google.generativeai as genai
 from app.core.config import settings
+from app.utils.code_chunker import split_code
+from app.utils.code_hash import normalize_code
 
 # Configure Gemini API with error handling
 try:
@@ -19,6 +26,58 @@ try:
 except Exception as e:
     print(f"❌ Failed to configure Gemini: {e}")
 
+# Gemini calls in flight at once across all AIService instances
+_gemini_slots = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+
+# "Line 12: ..." at the start of a review suggestion
+LINE_REFERENCE = re.compile(r"\s*line\s+(\d+)", re.IGNORECASE)
+
+
+class SingleFlight:
+    """Share one in-flight call among concurrent callers with the same key
+
+    The shared call runs as its own task, so a caller that is cancelled
+    only stops waiting; the call itself is cancelled once every caller
+    waiting on it has gone. Results are not kept after the call finishes.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, list] = {}  # key -> [task, waiters]
+        self.calls = 0
+        self.coalesced = 0
+    
+    async def do(self, key: str, call: Callable[[], Awaitable]):
+        entry = self._calls.get(key)
+        if entry is None:
+            entry = [asyncio.ensure_future(call()), 0]
+            self._calls[key] = entry
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if task.done() or entry[1] == 0:
+                if not task.done():
+                    task.cancel()
+                if self._calls.get(key) is entry:
+                    del self._calls[key]
+    
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls)
+        }
+
+
+# Identical prompts in flight at the same time share one Gemini call
+_single_flight = SingleFlight()
+
 class AIService:
     """Handle AI chat interactions using Google Gemini"""
     
@@ -28,6 +87,8 @@ class AIService:
         self.max_tokens = settings.GEMINI_MAX_TOKENS
         self.temperature = settings.GEMINI_TEMPERATURE
         self.api_key = settings.GEMINI_API_KEY
+        self.review_chunk_lines = settings.AI_REVIEW_CHUNK_LINES
+        self.review_max_chunks = settings.AI_REVIEW_MAX_CHUNKS
         
         # Validate API key
         if not self.api_key or self.api_key == "your_actual_gemini_api_key_here":
@@ -221,6 +282,9 @@ Teaching Philosophy:
         try:
             prompt = f"""Explain this {language} code in simple terms:
 
+```{language}
+{code}
+```
 
 Please provide:
 1. **What it does**: Brief description of the overall purpose
@@ -230,8 +294,7 @@ Please provide:
 
 Keep it concise and easy to understand for beginners."""
             
-            response = self.model.generate_content(prompt)
-            return response.text
+            return await self._generate_shared(prompt)
         
         except Exception as e:
             print(f"❌ Error explaining code: {str(e)}")
@@ -355,31 +418,33 @@ Make it engaging, clear, and not overwhelming."""
         """Get conversation history"""
         return self.conversation_history
     
-    async def review_code(self, code: str, language: str, quest_context: dict = None) -> dict:
-        """
-        Review code and determine if it's correct based on quest requirements
-        
-        Args:
-            code (str): The code to review
-            language (str): Programming language
-            quest_context (dict): Quest details and requirements
-        
-        Returns:
-            dict: Review result with correctness assessment
-        """
-        if not self.model:
-            return {
-                "success": False,
-                "is_correct": False,
-                "feedback": "AI code review is currently unavailable.",
-                "suggestions": [],
-                "error": "Model not initialized"
-            }
-        
-        try:
-            # Build context-aware review prompt
-            if quest_context:
-                review_prompt = f"""You are a CodeQuest AI Code Reviewer. Your job is to review code submissions for coding quests and determine if they meet the requirements.
+    async def _generate(self, prompt: str, generation_config) -> str:
+        """Call Gemini within the process-wide concurrency budget"""
+        async with _gemini_slots:
+            response = await self.model.generate_content_async(prompt, generation_config=generation_config)
+        return response.text.strip() if response and response.text else ""
+    
+    async def _generate_shared(self, prompt: str, max_output_tokens: int = None, temperature: float = None) -> str:
+        """``_generate`` coalesced with concurrent calls for the same normalized prompt"""
+        key = hashlib.sha256(json.dumps(
+            [self.model_name, max_output_tokens, temperature, normalize_code(prompt)]
+        ).encode()).hexdigest()
+        generation_config = None
+        if max_output_tokens is not None:
+            generation_config = genai.types.GenerationConfig(
+                max_output_tokens=max_output_tokens,
+                temperature=temperature,
+            )
+        return await _single_flight.do(key, lambda: self._generate(prompt, generation_config))
+    
+    def coalescing_stats(self) -> dict:
+        return _single_flight.stats()
+    
+    async def _review_part(self, code: str, language: str, quest_context: dict = None, local_findings: list = None, part: dict = None) -> str:
+        """Ask the model to review ``code`` (the whole submission or one ``part`` of it)"""
+        # Build context-aware review prompt
+        if quest_context:
+            review_prompt = f"""You are a CodeQuest AI Code Reviewer. Your job is to review code submissions for coding quests and determine if they meet the requirements.
 
 Quest Information:
 - Title: {quest_context.get('title', 'Code Challenge')}
@@ -404,8 +469,8 @@ CORRECTNESS: [YES/NO]
 SCORE: [1-10]
 FEEDBACK: [Your detailed feedback]
 SUGGESTIONS: [Bullet points of improvements]"""
-            else:
-                review_prompt = f"""You are a CodeQuest AI Code Reviewer. Review this {language} code and provide constructive feedback.
+        else:
+            review_prompt = f"""You are a CodeQuest AI Code Reviewer. Review this {language} code and provide constructive feedback.
 
 Code to Review:
 ```{language}
@@ -423,78 +488,189 @@ SCORE: [1-10]
 FEEDBACK: [Your detailed feedback]
 SUGGESTIONS: [Bullet points of improvements]"""
 
-            # Generate review
-            response = self.model.generate_content(
-                review_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    max_output_tokens=min(self.max_tokens, 1000),
-                    temperature=0.3,  # Lower temperature for more consistent reviews
-                )
+        if part:
+            review_prompt += f"""
+
+This is part {part['index']} of {part['total']} of a larger submission (lines {part['start']}-{part['end']}); the other parts are reviewed separately.
+Judge only this part: answer CORRECTNESS: NO only for a definite error in it.
+Count line numbers from 1 at the first line of this part and start each suggestion with "Line N:" where it applies to a line."""
+
+        max_output_tokens = min(self.max_tokens, 1000)
+        if local_findings is not None:
+            # The rule engine already covered style and common bugs; ask only for the rest
+            checked = "\n".join(
+                f"- Line {f['line']}: {f['message']}" if f.get("line") else f"- {f['message']}"
+                for f in local_findings[:20]
+            ) or "- No issues found"
+            review_prompt += f"""
+
+Automated checks already reported these issues (do NOT repeat them):
+{checked}
+
+Focus on correctness and logic the checks cannot see. Keep FEEDBACK under 120 words and list at most 4 new SUGGESTIONS."""
+            max_output_tokens = min(self.max_tokens, 600)
+
+        review_text = await self._generate(
+            review_prompt,
+            genai.types.GenerationConfig(
+                max_output_tokens=max_output_tokens,
+                temperature=0.3,  # Lower temperature for more consistent reviews
             )
+        )
+        if not review_text:
+            raise Exception("Empty response from AI reviewer")
+        return review_text
+    
+    def _parse_review(self, review_text: str) -> tuple:
+        """Extract ``(is_correct, score, suggestions)`` from a review"""
+        # Parse the review response
+        is_correct = "YES" in review_text.split("CORRECTNESS:")[1].split("\n")[0].upper() if "CORRECTNESS:" in review_text else False
+        
+        # Extract score
+        score = 5  # default
+        if "SCORE:" in review_text:
+            try:
+                score_text = review_text.split("SCORE:")[1].split("\n")[0].strip()
+                score = int(score_text.split("/")[0].strip())
+            except:
+                score = 5
+        
+        # Extract suggestions and format them properly
+        suggestions = []
+        if "SUGGESTIONS:" in review_text:
+            suggestions_text = review_text.split("SUGGESTIONS:")[1]
+            raw_suggestions = [s.strip() for s in suggestions_text.split("*") if s.strip()]
             
-            if not response or not response.text:
-                raise Exception("Empty response from AI reviewer")
-            
-            review_text = response.text.strip()
-            
-            # Parse the review response
-            is_correct = "YES" in review_text.split("CORRECTNESS:")[1].split("\n")[0].upper() if "CORRECTNESS:" in review_text else False
-            
-            # Extract score
-            score = 5  # default
-            if "SCORE:" in review_text:
-                try:
-                    score_text = review_text.split("SCORE:")[1].split("\n")[0].strip()
-                    score = int(score_text.split("/")[0].strip())
-                except:
-                    score = 5
+            # Convert raw suggestions to structured format
+            for i, suggestion_text in enumerate(raw_suggestions[:6]):  # Limit to 6 suggestions
+                if suggestion_text:
+                    # Try to parse severity and type from content
+                    suggestion_lower = suggestion_text.lower()
+                    
+                    # Determine type based on keywords
+                    if any(word in suggestion_lower for word in ['performance', 'optimize', 'efficient', 'speed']):
+                        suggestion_type = 'performance'
+                    elif any(word in suggestion_lower for word in ['security', 'validate', 'sanitize', 'safe']):
+                        suggestion_type = 'security'
+                    elif any(word in suggestion_lower for word in ['bug', 'error', 'fix', 'incorrect', 'wrong']):
+                        suggestion_type = 'bug'
+                    else:
+                        suggestion_type = 'best-practice'
+                    
+                    # Determine severity
+                    if any(word in suggestion_lower for word in ['critical', 'serious', 'urgent', 'security']):
+                        severity = 'high'
+                    elif any(word in suggestion_lower for word in ['performance', 'optimize', 'improve']):
+                        severity = 'medium'
+                    else:
+                        severity = 'low'
+                    
+                    line = LINE_REFERENCE.match(suggestion_text)
+                    suggestions.append({
+                        "type": suggestion_type,
+                        "severity": severity,
+                        "line": int(line.group(1)) if line else None,
+                        "message": suggestion_text[:100] + "..." if len(suggestion_text) > 100 else suggestion_text,
+                        "suggestion": suggestion_text,
+                        "corrected_code": None
+                    })
+        
+        return is_correct, score, suggestions
+    
+    async def _review_chunks(self, chunks: list, language: str, quest_context: dict = None, local_findings: list = None) -> dict:
+        """Review ``(start_line, code)`` chunks concurrently and merge the results"""
+        async def review_chunk(index, start, chunk):
+            end = start + chunk.count("\n")
+            findings = None
+            if local_findings is not None:
+                # Local findings for this part, renumbered from its first line
+                findings = [
+                    {**f, "line": f["line"] - start + 1}
+                    for f in local_findings if f.get("line") and start <= f["line"] <= end
+                ]
+            part = {"index": index, "total": len(chunks), "start": start, "end": end}
+            return start, end, await self._review_part(chunk, language, quest_context, findings, part)
+        
+        tasks = [
+            asyncio.ensure_future(review_chunk(index, start, chunk))
+            for index, (start, chunk) in enumerate(chunks, 1)
+        ]
+        try:
+            reviews = await asyncio.gather(*tasks)
+        finally:
+            # One part failed (or the request went away): stop the others
+            for task in tasks:
+                task.cancel()
+        
+        is_correct = True
+        weighted_score = 0
+        total_lines = 0
+        feedback = []
+        suggestions = []
+        for start, end, review_text in reviews:
+            part_correct, score, part_suggestions = self._parse_review(review_text)
+            is_correct = is_correct and part_correct
+            weighted_score += score * (end - start + 1)
+            total_lines += end - start + 1
+            for suggestion in part_suggestions:
+                if suggestion["line"] is not None:
+                    suggestion["line"] += start - 1
+            suggestions.extend(part_suggestions)
+            feedback.append(f"Lines {start}-{end}:\n{review_text}")
+        
+        return {
+            "is_correct": is_correct,
+            "score": round(weighted_score / total_lines),
+            "feedback": "\n\n".join(feedback),
+            "suggestions": suggestions
+        }
+    
+    async def review_code(self, code: str, language: str, quest_context: dict = None, local_findings: list = None) -> dict:
+        """
+        Review code and determine if it's correct based on quest requirements
+        
+        Large submissions are split along function and class boundaries and
+        the parts are reviewed concurrently.
+        
+        Args:
+            code (str): The code to review
+            language (str): Programming language
+            quest_context (dict): Quest details and requirements
+            local_findings (list): Suggestions already made by the local analyzers
+        
+        Returns:
+            dict: Review result with correctness assessment
+        """
+        if not self.model:
+            return {
+                "success": False,
+                "is_correct": False,
+                "feedback": "AI code review is currently unavailable.",
+                "suggestions": [],
+                "error": "Model not initialized"
+            }
+        
+        try:
+            line_count = code.count("\n") + 1
+            chunks = split_code(
+                code, language.lower(), max(self.review_chunk_lines, math.ceil(line_count / self.review_max_chunks))
+            )
             
-            # Extract suggestions and format them properly
-            suggestions = []
-            if "SUGGESTIONS:" in review_text:
-                suggestions_text = review_text.split("SUGGESTIONS:")[1]
-                raw_suggestions = [s.strip() for s in suggestions_text.split("*") if s.strip()]
-                
-                # Convert raw suggestions to structured format
-                for i, suggestion_text in enumerate(raw_suggestions[:6]):  # Limit to 6 suggestions
-                    if suggestion_text:
-                        # Try to parse severity and type from content
-                        suggestion_lower = suggestion_text.lower()
-                        
-                        # Determine type based on keywords
-                        if any(word in suggestion_lower for word in ['performance', 'optimize', 'efficient', 'speed']):
-                            suggestion_type = 'performance'
-                        elif any(word in suggestion_lower for word in ['security', 'validate', 'sanitize', 'safe']):
-                            suggestion_type = 'security'
-                        elif any(word in suggestion_lower for word in ['bug', 'error', 'fix', 'incorrect', 'wrong']):
-                            suggestion_type = 'bug'
-                        else:
-                            suggestion_type = 'best-practice'
-                        
-                        # Determine severity
-                        if any(word in suggestion_lower for word in ['critical', 'serious', 'urgent', 'security']):
-                            severity = 'high'
-                        elif any(word in suggestion_lower for word in ['performance', 'optimize', 'improve']):
-                            severity = 'medium'
-                        else:
-                            severity = 'low'
-                        
-                        suggestions.append({
-                            "type": suggestion_type,
-                            "severity": severity,
-                            "line": None,
-                            "message": suggestion_text[:100] + "..." if len(suggestion_text) > 100 else suggestion_text,
-                            "suggestion": suggestion_text,
-                            "corrected_code": None
-                        })
+            if len(chunks) > 1:
+                review = await self._review_chunks(chunks, language, quest_context, local_findings)
+            else:
+                review_text = await self._review_part(code, language, quest_context, local_findings)
+                is_correct, score, suggestions = self._parse_review(review_text)
+                review = {"is_correct": is_correct, "score": score, "feedback": review_text, "suggestions": suggestions}
             
             return {
                 "success": True,
-                "is_correct": is_correct,
-                "score": score,
-                "feedback": review_text,
-                "analysis": review_text,  # Include both for compatibility
-                "suggestions": suggestions,
+                "is_correct": review["is_correct"],
+                "score": review["score"],
+                "feedback": review["feedback"],
+                "analysis": review["feedback"],  # Include both for compatibility
+                "suggestions": review["suggestions"],
+                "chunks": len(chunks),
                 "language": language,
                 "quest_context": quest_context.get('title') if quest_context else None,
                 "timestamp": datetime.utcnow().isoformat()
@@ -542,15 +718,9 @@ Provide a helpful hint that:
 
 Keep the hint encouraging and educational. Use emojis to make it friendly! 🎯"""
 
-            response = self.model.generate_content(
-                hint_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    max_output_tokens=400,
-                    temperature=0.7,
-                )
-            )
-            
-            hint_text = response.text if response and response.text else "Keep experimenting and don't give up! 💪"
+            hint_text = await self._generate_shared(hint_prompt, max_output_tokens=400, temperature=0.7)
+            if not hint_text:
+                hint_text = "Keep experimenting and don't give up! 💪"
             
             return {
                 "success": True,
@@ -1,40 +1,85 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
+from pymongo import UpdateOne
 from app.utils.json_encoder import convert_objectid
+from app.utils.level_system import get_level_from_xp
+from app.services.user_state_cache import user_state_cache
 
-# Import in-memory storage from quest service
-from app.services.quest_service import IN_MEMORY_USERS
+DAILY_STATS_COLLECTION = "user_daily_stats"
+PROGRESS_BUCKETS = ("day", "week", "month")
+# Longest series served per bucket size: about ten years of weeks or months
+MAX_PROGRESS_BUCKETS = {"day": 366, "week": 520, "month": 120}
+
+def daily_rollup_update(user_id: str, xp: int = 0, tasks: int = 0, quests: int = 0, when: datetime = None) -> tuple:
+    """Filter and upsert update that adds an award to a user's daily rollup"""
+    day = (when or datetime.utcnow()).date()
+    return (
+        {"_id": f"{user_id}:{day.isoformat()}"},
+        {
+            "$inc": {
+                "xp_gained": xp,
+                "tasks_completed": tasks,
+                "quests_completed": quests
+            },
+            "$setOnInsert": {
+                "user_id": user_id,
+                "date": datetime.combine(day, datetime.min.time())
+            }
+        }
+    )
+
+def daily_rollup_op(user_id: str, xp: int = 0, tasks: int = 0, quests: int = 0, when: datetime = None) -> UpdateOne:
+    """``bulk_write`` operation for a daily rollup award"""
+    return UpdateOne(*daily_rollup_update(user_id, xp, tasks, quests, when), upsert=True)
+
+def _bucket_start(day: date, bucket: str) -> date:
+    """First day of the bucket containing ``day``"""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def _next_bucket(day: date, bucket: str) -> date:
+    """First day of the bucket after the one starting at ``day``"""
+    if bucket == "week":
+        return day + timedelta(days=7)
+    if bucket == "month":
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+def check_progress_range(start: date, end: date, bucket: str) -> None:
+    """Reject unknown buckets and ranges with more than the allowed buckets"""
+    if bucket not in PROGRESS_BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+    first = _bucket_start(start, bucket)
+    last = min(end, datetime.utcnow().date())
+    if bucket == "week":
+        count = (last - first).days // 7 + 1
+    elif bucket == "month":
+        count = (last.year - first.year) * 12 + last.month - first.month + 1
+    else:
+        count = (last - first).days + 1
+    if count > MAX_PROGRESS_BUCKETS[bucket]:
+        raise ValueError(
+            f"Range covers {count} {bucket}s; at most {MAX_PROGRESS_BUCKETS[bucket]} are allowed"
+        )
 
 class AnalyticsService:
     def __init__(self, db: AsyncIOMotorDatabase = None):
         self.db = db
-        if db:
+        if db is not None:
             self.users_collection = db["users"]
             self.user_quests_collection = db["user_quests"]
             self.submissions_collection = db["submissions"]
+            self.daily_stats_collection = db[DAILY_STATS_COLLECTION]
 
     async def get_user_analytics(self, user_id: str) -> dict:
-        """Get user analytics (in-memory version)"""
+        """Get user analytics"""
         try:
-            # Get user data from in-memory storage
-            user = IN_MEMORY_USERS.get(user_id)
-            
-            if not user:
-                # Create default user if not exists
-                default_user = {
-                    "username": user_id,
-                    "total_xp": 0,
-                    "level": 1,
-                    "quests_completed": 0,
-                    "current_streak": 0,
-                    "longest_streak": 0,
-                    "badges_earned": 0,
-                    "created_at": datetime.utcnow().isoformat(),
-                    "updated_at": datetime.utcnow().isoformat()
-                }
-                IN_MEMORY_USERS[user_id] = default_user
-                user = default_user
+            # Get user state from the write-through cache
+            user = await user_state_cache.get(self.db, user_id)
             
             # Calculate progress to next level
             current_xp = user.get("total_xp", 0)
@@ -69,19 +114,89 @@ class AnalyticsService:
             print(f"❌ Error fetching analytics: {e}")
             raise ValueError(f"Error fetching analytics: {str(e)}")
 
-    async def get_progress_data(self, user_id: str) -> list:
-        """Get progress data over time"""
+    async def record_daily_activity(
+        self,
+        user_id: str,
+        xp: int = 0,
+        tasks: int = 0,
+        quests: int = 0,
+        when: datetime = None
+    ) -> None:
+        """Add an award to the user's daily rollup"""
+        await self.daily_stats_collection.update_one(
+            *daily_rollup_update(user_id, xp, tasks, quests, when),
+            upsert=True
+        )
+
+    async def get_progress_series(
+        self,
+        user_id: str,
+        start: date,
+        end: date,
+        bucket: str = "day",
+        total_xp: int = None
+    ) -> list:
+        """XP, tasks and quests over time from the daily rollups
+
+        Reads the rollups from the first bucket up to today with one range query
+        on the (user_id, date) index. Later rollups are only used to walk
+        back from ``total_xp`` to the cumulative XP at each bucket.
+        """
         try:
-            progress_data = []
-            for i in range(30):
-                date = datetime.utcnow() - timedelta(days=30-i)
-                progress_data.append({
-                    "date": date.strftime("%Y-%m-%d"),
-                    "quests": i // 3,
-                    "tasks": i,
-                    "xp": i * 50
+            check_progress_range(start, end, bucket)
+
+            today = datetime.utcnow().date()
+            first = _bucket_start(start, bucket)
+            rollups = await self.daily_stats_collection.find(
+                {
+                    "user_id": user_id,
+                    "date": {"$gte": datetime.combine(first, datetime.min.time())}
+                },
+                {"_id": 0, "date": 1, "xp_gained": 1, "tasks_completed": 1, "quests_completed": 1}
+            ).sort("date", 1).to_list(None)
+
+            if total_xp is None:
+                total_xp = sum(r.get("xp_gained", 0) for r in rollups)
+
+            # Cumulative XP before ``start`` = current total minus everything gained since
+            xp = total_xp - sum(r.get("xp_gained", 0) for r in rollups)
+
+            buckets = {}
+            for rollup in rollups:
+                day = rollup["date"].date()
+                if day > end:
+                    break
+                totals = buckets.setdefault(_bucket_start(day, bucket), [0, 0, 0])
+                totals[0] += rollup.get("xp_gained", 0)
+                totals[1] += rollup.get("tasks_completed", 0)
+                totals[2] += rollup.get("quests_completed", 0)
+
+            series = []
+            current = first
+            while current <= min(end, today):
+                xp_gained, tasks, quests = buckets.get(current, (0, 0, 0))
+                xp += xp_gained
+                series.append({
+                    "date": current.isoformat(),
+                    "xp": xp,
+                    "xp_gained": xp_gained,
+                    "tasks": tasks,
+                    "quests": quests,
+                    "level": get_level_from_xp(xp)
                 })
-            
-            return progress_data
+                current = _next_bucket(current, bucket)
+
+            return series
         except Exception as e:
             raise ValueError(f"Error fetching progress: {str(e)}")
+
+    async def get_progress_data(self, user_id: str, days: int = 30) -> list:
+        """Get daily progress data over the last ``days`` days"""
+        user = await self.users_collection.find_one({"_id": user_id}, {"total_xp": 1})
+        today = datetime.utcnow().date()
+        return await self.get_progress_series(
+            user_id,
+            today - timedelta(days=days - 1),
+            today,
+            total_xp=user.get("total_xp", 0) if user else None
+        )
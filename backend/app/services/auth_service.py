@@ -1,5 +1,5 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.core.security import password_hasher, create_access_token
 from app.schemas.user import UserCreate, UserLogin
 from datetime import timedelta
 
@@ -19,7 +19,7 @@ class AuthService:
         user = {
             "username": user_data.username,
             "email": user_data.email,
-            "password_hash": get_password_hash(user_data.password),
+            "password_hash": await password_hasher.hash(user_data.password),
             "level": 1,
             "total_xp": 0,
             "current_streak": 0,
@@ -39,13 +39,26 @@ class AuthService:
         if not user:
             raise ValueError("Invalid email or password")
 
-        if not verify_password(login_data.password, user["password_hash"]):
+        valid, new_hash = await password_hasher.verify_and_update(
+            login_data.password, user["password_hash"]
+        )
+        if not valid:
             raise ValueError("Invalid email or password")
 
+        # Transparently upgrade hashes made with an older bcrypt cost
+        if new_hash:
+            await self.users_collection.update_one(
+                {"_id": user["_id"], "password_hash": user["password_hash"]},
+                {"$set": {"password_hash": new_hash}}
+            )
+
         # Create token
         access_token_expires = timedelta(minutes=30)
         access_token = create_access_token(
-            data={"sub": str(user["_id"])},
+            data={
+                "sub": str(user["_id"]),
+                "roles": ["admin"] if user.get("is_admin") else []
+            },
             expires_delta=access_token_expires
         )
 
@@ -0,0 +1,925 @@
+"""
+Code Runner
+Runs submitted Python/JavaScript against task test specs in sandboxed subprocesses
+
+A test spec is the task's ``test_cases`` document. With an ``entrypoint``
+each case calls that function; without one each case runs the program with
+``stdin`` and compares its stdout::
+
+    {"entrypoint": "add", "cases": [{"name": "adds", "args": [1, 2], "expected": 3}]}
+    {"cases": [{"name": "echo", "stdin": "hi", "expected_output": "hi"}]}
+
+Only the case inputs are written into the sandbox. The harness reports
+each case's actual output on a separate pipe, tagged with a per-run
+nonce, and the outputs are compared with the expected values here.
+
+Python runs fork from pre-imported zygote workers (``WarmPool``) instead
+of starting a fresh interpreter each time.
+
+Every run executes as a dedicated unprivileged uid (``CODE_RUNNER_UID``)
+inside its own user, mount and network namespaces. The run's root
+filesystem holds only the system directories needed by the interpreters
+and its own work directory; the application, its configuration and other
+runs' files are not visible.
+"""
+
+import asyncio
+import json
+import os
+import secrets
+import shutil
+import signal
+import tempfile
+import time
+from typing import List, Optional
+from app.core.config import settings
+from app.utils.code_hash import spec_hash
+
+RESULT_MARKER = b"__CODEQUEST_RESULT__"
+DONE_MARKER = b"__CODEQUEST_DONE__"
+STARTED_MARKER = b"__CODEQUEST_STARTED__"
+END_MARKER = b"__CODEQUEST_END__"
+
+# "nobody"; runs never share a uid with the API server
+DEFAULT_RUNNER_UID = 65534
+
+# Interpreters are looked up here, not on the server's PATH (which may
+# point into directories the runner uid cannot read)
+SANDBOX_PATH = "/usr/local/bin:/usr/bin:/bin"
+
+# Longest expected-vs-actual value echoed back for a failed case
+MAX_REPORTED_CHARS = 200
+
+LANGUAGE_FILES = {
+    "python": ("solution.py", "harness.py"),
+    "javascript": ("solution.js", "harness.js"),
+}
+
+PYTHON_HARNESS = r'''
+import contextlib, io, json, os, socket, sys, time, traceback
+
+def _no_network(*args, **kwargs):
+    raise OSError("Network access is disabled")
+
+socket.socket = _no_network
+socket.create_connection = _no_network
+
+def _reporter():
+    # Run identity comes from the zygote, or from the parent on stdin
+    run = globals().pop("_RUN", None) or {"nonce": sys.stdin.readline().strip(), "result_fd": int(sys.argv[1])}
+    prefix = ("__CODEQUEST_RESULT__" + run["nonce"]).encode()
+    fd = run["result_fd"]
+
+    def report(results):
+        data = prefix + json.dumps(results, default=str).encode() + b"\n"
+        while data:
+            data = data[os.write(fd, data):]
+    return report
+
+_report = _reporter()
+
+# Inputs only: expected outputs never enter the sandbox
+with open("spec.json") as f:
+    spec = json.load(f)
+class _LoadError(Exception):
+    pass
+
+def _error(exc):
+    return "".join(traceback.format_exception_only(type(exc), exc)).strip()
+
+code = None
+load_error = None
+try:
+    with open("solution.py") as f:
+        code = compile(f.read(), "solution.py", "exec")
+except SyntaxError as e:
+    load_error = _error(e)
+
+def _normalize(value):
+    return json.loads(json.dumps(value, default=str))
+
+def _run_program(stdin):
+    out = io.StringIO()
+    sys.stdin = io.StringIO(stdin)
+    with contextlib.redirect_stdout(out):
+        exec(code, {"__name__": "__main__"})
+    return out.getvalue()
+
+results = []
+namespace = None
+if spec.get("entrypoint") and not load_error:
+    try:
+        namespace = {"__name__": "solution"}
+        with contextlib.redirect_stdout(io.StringIO()):
+            exec(code, namespace)
+    except BaseException as e:
+        load_error = _error(e)
+
+for case in spec["cases"]:
+    start = time.perf_counter()
+    result = {"name": case["name"]}
+    try:
+        if load_error:
+            raise _LoadError(load_error)
+        if spec.get("entrypoint"):
+            with contextlib.redirect_stdout(io.StringIO()):
+                actual = namespace[spec["entrypoint"]](*case.get("args", []), **case.get("kwargs", {}))
+            result["actual"] = _normalize(actual)
+        else:
+            result["actual"] = _run_program(case.get("stdin", "")).strip()
+        result["status"] = "ok"
+    except _LoadError as e:
+        result["status"] = "error"
+        result["message"] = str(e)
+    except SystemExit:
+        result["status"] = "error"
+        result["message"] = "Program exited early"
+    except BaseException as e:
+        result["status"] = "error"
+        result["message"] = _error(e)
+    result["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    results.append(result)
+
+_report(results)
+'''
+
+JS_HARNESS = r'''
+const fs = require("fs");
+const Module = require("module");
+const blocked = new Set(["net", "http", "https", "http2", "dgram", "tls", "dns", "child_process", "cluster", "worker_threads"]);
+const load = Module._load;
+Module._load = function (request, ...rest) {
+  if (blocked.has(request.replace(/^node:/, ""))) throw new Error(`Module '${request}' is disabled`);
+  return load.call(this, request, ...rest);
+};
+
+// Run identity from the parent; results go to their own fd, not stdout
+const report = ((nonce, fd) => (results) =>
+  fs.writeSync(fd, "__CODEQUEST_RESULT__" + nonce + JSON.stringify(results) + "\n")
+)(fs.readFileSync(0, "utf8").split("\n")[0].trim(), Number(process.argv[2]));
+
+// Inputs only: expected outputs never enter the sandbox
+const spec = JSON.parse(fs.readFileSync("spec.json", "utf8"));
+const source = fs.readFileSync("solution.js", "utf8");
+
+function capture(fn) {
+  const out = [];
+  const log = console.log;
+  console.log = (...args) => out.push(args.map(String).join(" "));
+  try { return { value: fn(), output: out.join("\n") }; } finally { console.log = log; }
+}
+
+let program = null, entry = null, loadError = null;
+try {
+  program = new Function("input", "require", "module", "exports",
+    source + (spec.entrypoint ? `\nreturn typeof ${spec.entrypoint} !== "undefined" ? ${spec.entrypoint} : module.exports.${spec.entrypoint};` : ""));
+  if (spec.entrypoint) {
+    const mod = { exports: {} };
+    entry = capture(() => program("", require, mod, mod.exports)).value;
+    if (typeof entry !== "function") throw new Error(`${spec.entrypoint} is not defined`);
+  }
+} catch (e) { loadError = e; }
+
+const results = spec.cases.map((c) => {
+  const result = { name: c.name };
+  const start = process.hrtime.bigint();
+  try {
+    if (loadError) throw loadError;
+    if (spec.entrypoint) {
+      result.actual = JSON.parse(JSON.stringify(capture(() => entry(...(c.args || []))).value ?? null));
+    } else {
+      const mod = { exports: {} };
+      result.actual = capture(() => program(c.stdin || "", require, mod, mod.exports)).output.trim();
+    }
+    result.status = "ok";
+  } catch (e) {
+    result.status = "error";
+    result.message = String(e);
+  }
+  result.duration_ms = Number(process.hrtime.bigint() - start) / 1e6;
+  return result;
+});
+
+report(results);
+'''
+
+SANDBOX_LAUNCHER = r'''
+import ctypes, json, os, platform, sys
+
+CLONE_NEWNS, CLONE_NEWUSER, CLONE_NEWNET = 0x00020000, 0x10000000, 0x40000000
+MS_RDONLY, MS_NOSUID, MS_NODEV, MS_REMOUNT, MS_BIND, MS_REC, MS_PRIVATE = 1, 2, 4, 32, 4096, 16384, 1 << 18
+# Mount flags a remount inside the namespace must keep (nodev, noexec, atime)
+KEPT_FLAGS = 4 | 8 | 1024 | 2048 | 4096
+MNT_DETACH = 2
+SYS_PIVOT_ROOT = {"x86_64": 155, "aarch64": 41}
+
+# Everything a run can see besides its own files: interpreters and their libraries
+SYSTEM_PATHS = ["/usr", "/bin", "/sbin", "/lib", "/lib32", "/lib64", "/libx32", "/etc/ld.so.cache"]
+DEVICES = ["/dev/null", "/dev/zero", "/dev/random", "/dev/urandom"]
+
+libc = ctypes.CDLL(None, use_errno=True)
+
+def _check(result):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+def _mount(source, target, fstype=None, flags=0, data=None):
+    encode = lambda value: value.encode() if value else None
+    _check(libc.mount(encode(source), encode(target), encode(fstype), flags, encode(data)))
+
+def _write(path, data):
+    with open(path, "w") as f:
+        f.write(data)
+
+def confine(config):
+    """Enter new user, mount and network namespaces and pivot into a root
+    holding only the system paths plus the configured directories"""
+    uid, gid = os.getuid(), os.getgid()
+    _check(libc.unshare(CLONE_NEWUSER | CLONE_NEWNS | CLONE_NEWNET))
+    _write("/proc/self/setgroups", "deny")
+    _write("/proc/self/uid_map", f"0 {uid} 1")
+    _write("/proc/self/gid_map", f"0 {gid} 1")
+
+    root = config["root"]
+    writable = config.get("writable", [])
+    _mount(None, "/", flags=MS_REC | MS_PRIVATE)
+    _mount("tmpfs", root, "tmpfs", MS_NOSUID | MS_NODEV, "size=1m,mode=0755")
+    for path in SYSTEM_PATHS + DEVICES + config.get("readonly", []) + writable:
+        if not os.path.lexists(path):
+            continue
+        target = root + path
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.islink(path):
+            os.symlink(os.readlink(path), target)
+            continue
+        if os.path.isdir(path):
+            os.makedirs(target, exist_ok=True)
+        else:
+            open(target, "w").close()
+        _mount(path, target, flags=MS_BIND | MS_REC)
+        if path not in writable:
+            kept = os.statvfs(path).f_flag & KEPT_FLAGS
+            _mount(None, target, flags=MS_REMOUNT | MS_BIND | MS_RDONLY | MS_NOSUID | kept)
+
+    os.chdir(root)
+    _check(libc.syscall(SYS_PIVOT_ROOT[platform.machine()], b".", b"."))
+    _check(libc.umount2(b".", MNT_DETACH))
+    os.chdir(config["cwd"])
+
+try:
+    config = json.loads(sys.argv[1])
+    confine(config)
+    if not config.get("keep_caps"):
+        # Untrusted code must not hold the capabilities that own these mounts
+        _check(libc.unshare(CLONE_NEWUSER))
+except Exception as e:
+    sys.stderr.write(f"Sandbox setup failed: {e}\n")
+    sys.stderr.flush()
+    os._exit(70)
+os.execvp(sys.argv[2], sys.argv[2:])
+'''
+
+PYTHON_ZYGOTE = r'''
+import contextlib, ctypes, io, json, os, resource, socket, sys, time, traceback
+
+_libc = ctypes.CDLL(None, use_errno=True)
+_prctl = getattr(_libc, "prctl", None)
+ZYGOTE_PID = os.getpid()
+
+# Warm state shared by every forked run: imports above plus the compiled harness
+with open("harness.py") as f:
+    HARNESS = compile(f.read(), "harness.py", "exec")
+RESULT_FD = int(sys.argv[1])
+RUNS_DIR = sys.argv[2]
+
+def _isolate_run():
+    """Hide every other run's directory, then drop the capabilities that
+    could undo it (the zygote's sandbox keeps them for this step)"""
+    for result in (
+        _libc.unshare(0x00020000),  # CLONE_NEWNS
+        _libc.mount(b"tmpfs", RUNS_DIR.encode(), b"tmpfs", 1 | 2 | 4, b"size=4k"),  # ro, nosuid, nodev
+        _libc.unshare(0x10000000),  # CLONE_NEWUSER
+    ):
+        if result != 0:
+            raise OSError(ctypes.get_errno(), "Run isolation failed")
+
+for line in sys.stdin:
+    request = json.loads(line)
+    nonce = request.pop("nonce")
+    run = {"nonce": request.pop("result_nonce"), "result_fd": RESULT_FD}
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        del line, nonce
+        try:
+            os.setpgid(0, 0)
+            if _prctl is not None:
+                # Die with the zygote even if the parent never learned this run's group
+                _prctl(1, 9)  # PR_SET_PDEATHSIG, SIGKILL
+            if os.getppid() != ZYGOTE_PID:
+                os._exit(1)
+            os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+            os.dup2(os.open(os.path.join(request["workdir"], "stderr.txt"), os.O_WRONLY | os.O_CREAT | os.O_TRUNC), 2)
+            os.chdir(request["workdir"])
+            _isolate_run()
+            resource.setrlimit(resource.RLIMIT_CPU, (request["cpu_seconds"], request["cpu_seconds"] + 1))
+            resource.setrlimit(resource.RLIMIT_AS, (request["memory_bytes"], request["memory_bytes"]))
+            resource.setrlimit(resource.RLIMIT_FSIZE, (request["file_bytes"], request["file_bytes"]))
+            exec(HARNESS, {"__name__": "__main__", "_RUN": run})
+            code = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    try:
+        # Also set here so the group exists before the parent can be told about it
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+    # The parent kills this group if the run times out (killing the zygote alone orphans it)
+    sys.stdout.write("\n__CODEQUEST_STARTED__" + nonce + str(pid) + "\n")
+    sys.stdout.flush()
+    # The run's own peak RSS: the zygote's barely moves while runs come and go
+    _, status, usage = os.wait4(pid, 0)
+    try:
+        # Leftover grandchildren must not write into the next run's output
+        os.killpg(pid, 9)
+    except OSError:
+        pass
+    done = {"returncode": os.waitstatus_to_exitcode(status), "rss_kb": usage.ru_maxrss}
+    # Ends this run's results; the run never sees ``nonce``, so it cannot forge this
+    os.write(RESULT_FD, b"__CODEQUEST_END__" + nonce.encode() + b"\n")
+    sys.stdout.write("\n__CODEQUEST_DONE__" + nonce + json.dumps(done) + "\n")
+    sys.stdout.flush()
+'''
+
+# Changes whenever either harness does, so cached results are re-evaluated
+HARNESS_VERSION = spec_hash({"python": PYTHON_HARNESS, "javascript": JS_HARNESS})
+
+SMOKE_SPEC = {"cases": [{"name": "Runs without errors", "stdin": "", "expected_output": ""}]}
+
+
+def case_name(case: dict, index: int) -> str:
+    return case.get("name") or f"Test {index + 1}"
+
+
+def sandbox_spec(spec: dict) -> dict:
+    """The part of a test spec the submitted code may see: inputs only"""
+    return {
+        "entrypoint": spec.get("entrypoint"),
+        "cases": [
+            {"name": case_name(case, i), **{k: case[k] for k in ("args", "kwargs", "stdin") if k in case}}
+            for i, case in enumerate(spec.get("cases", []))
+        ]
+    }
+
+
+def grade_case(spec: dict, case: dict, outcome: dict) -> dict:
+    """Compare one case's reported output with its expected value"""
+    result = {"name": outcome["name"], "duration_ms": outcome.get("duration_ms")}
+    if outcome["status"] == "error":
+        result.update(status="error", message=outcome.get("message"))
+        return result
+
+    actual = outcome.get("actual")
+    if spec.get("entrypoint"):
+        expected = json.loads(json.dumps(case.get("expected"), default=str))
+    else:
+        expected = str(case.get("expected_output", "")).strip()
+    # No spec: passing means the program ran to completion
+    if spec is SMOKE_SPEC or actual == expected:
+        result["status"] = "passed"
+    else:
+        result.update(status="failed", expected=expected, actual=_clip(actual))
+    return result
+
+
+def _clip(value):
+    """Cap a reported value so failed cases cannot carry bulk output back"""
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    if len(text) <= MAX_REPORTED_CHARS:
+        return value
+    return text[:MAX_REPORTED_CHARS] + f"... ({len(text) - MAX_REPORTED_CHARS} more characters)"
+
+
+async def pipe_reader(fd: int, limit: int) -> tuple:
+    """Wrap the read end of a pipe in a StreamReader; returns (reader, transport)"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=limit)
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, "rb", buffering=0)
+    )
+    return reader, transport
+
+
+def find_result(data: bytes, nonce: str) -> Optional[bytes]:
+    """Payload of the last result line carrying this run's nonce"""
+    prefix = RESULT_MARKER + nonce.encode()
+    result = None
+    for line in data.split(b"\n"):
+        if line.startswith(prefix):
+            result = line[len(prefix):]
+    return result
+
+
+def summarize_results(test_cases: list, error: Optional[str] = None) -> dict:
+    """Build the ``test_results`` document stored on submissions"""
+    passed = sum(1 for case in test_cases if case["status"] == "passed")
+    results = {
+        "total_tests": len(test_cases),
+        "passed": passed,
+        "failed": len(test_cases) - passed,
+        "all_passed": bool(test_cases) and passed == len(test_cases) and not error,
+        "test_cases": test_cases,
+    }
+    if error:
+        results["error"] = error
+    return results
+
+
+class WarmWorker:
+    """One pre-forked Python zygote that forks a child per run"""
+
+    def __init__(self, process, results: asyncio.StreamReader, results_transport):
+        self.process = process
+        self.results = results
+        self.results_transport = results_transport
+        self.runs = 0
+        self.rss_kb = 0
+        self.run_pgid: Optional[int] = None
+
+    async def execute(self, request: dict) -> tuple:
+        """Run one request; returns (stdout, returncode, result payload or None)"""
+        # The run never sees ``nonce``, so it cannot forge the end-of-run markers
+        nonce = secrets.token_hex(16)
+        result_nonce = secrets.token_hex(16)
+        marker = DONE_MARKER + nonce.encode()
+        started = STARTED_MARKER + nonce.encode()
+        self.process.stdin.write((json.dumps({**request, "nonce": nonce, "result_nonce": result_nonce}) + "\n").encode())
+        await self.process.stdin.drain()
+        output = b""
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                raise RuntimeError("Warm worker exited")
+            if line.startswith(started):
+                self.run_pgid = int(line[len(started):])
+                continue
+            if line.startswith(marker):
+                done = json.loads(line[len(marker):])
+                self.run_pgid = None
+                self.runs += 1
+                self.rss_kb = done["rss_kb"]
+                return output, done["returncode"], await self._read_result(nonce, result_nonce)
+            output = (output + line)[-1024 * 1024:]
+
+    async def _read_result(self, nonce: str, result_nonce: str) -> Optional[bytes]:
+        """Read the result pipe up to the zygote's end marker for this run"""
+        end = END_MARKER + nonce.encode() + b"\n"
+        result = None
+        while True:
+            try:
+                line = await self.results.readline()
+            except ValueError:
+                continue  # over-long line, already discarded
+            if not line:
+                raise RuntimeError("Warm worker exited")
+            if line == end:
+                return result
+            found = find_result(line.rstrip(b"\n"), result_nonce)
+            if found is not None:
+                result = found
+
+    def kill(self) -> None:
+        """Kill the zygote and the run it forked, which has its own process group"""
+        for pgid in (self.run_pgid, self.process.pid):
+            if pgid is None:
+                continue
+            try:
+                os.killpg(pgid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        self.run_pgid = None
+        self.results_transport.close()
+
+
+class WarmPool:
+    """Pre-forked, pre-imported Python workers
+
+    Saves the interpreter start-up and harness import on every run. A
+    worker is recycled after ``max_runs`` runs, once a run's peak RSS
+    passes ``max_rss_mb``, or whenever a run times out.
+    """
+
+    def __init__(self, runner: "CodeRunner", size: int, max_runs: int = 100, max_rss_mb: int = 128):
+        self.runner = runner
+        self.size = size
+        self.max_runs = max_runs
+        self.max_rss_mb = max_rss_mb
+        self._idle: List[WarmWorker] = []
+        self._retired: List[WarmWorker] = []
+        self._workdir = None
+        self.busy = 0
+        self.spawned = 0
+        self.recycled = 0
+
+    async def _spawn(self) -> WarmWorker:
+        base = self.runner._prepare()
+        if self._workdir is None:
+            # Owned by the server and read-only to the zygotes
+            self._workdir = os.path.join(base, "zygote")
+            os.makedirs(os.path.join(self._workdir, "root"), mode=0o755)
+            os.chmod(self._workdir, 0o755)
+            with open(os.path.join(self._workdir, "harness.py"), "w") as f:
+                f.write(PYTHON_HARNESS)
+            with open(os.path.join(self._workdir, "zygote.py"), "w") as f:
+                f.write(PYTHON_ZYGOTE)
+
+        runs_dir = os.path.join(base, "runs")
+        read_fd, write_fd = os.pipe()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self.runner._sandbox(
+                    os.path.join(self._workdir, "root"),
+                    cwd=self._workdir,
+                    readonly=[self._workdir],
+                    writable=[runs_dir],
+                    keep_caps=True
+                ),
+                "python3", "-I", "-S", "-B", "zygote.py", str(write_fd), runs_dir,
+                cwd=self._workdir,
+                env={"PATH": SANDBOX_PATH, "HOME": self._workdir},
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                pass_fds=(write_fd,),
+                preexec_fn=self.runner._drop_privileges,
+                start_new_session=True
+            )
+        except BaseException:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        results, transport = await pipe_reader(read_fd, self.runner.max_output_bytes)
+        self.spawned += 1
+        return WarmWorker(process, results, transport)
+
+    async def start(self) -> None:
+        """Pre-fork the full pool"""
+        workers = await asyncio.gather(*[self._spawn() for _ in range(self.size - len(self._idle))])
+        self._idle.extend(workers)
+
+    async def stop(self) -> None:
+        workers = self._idle + self._retired
+        for worker in workers:
+            worker.kill()
+        await asyncio.gather(*[worker.process.wait() for worker in workers], return_exceptions=True)
+        self._idle.clear()
+        self._retired.clear()
+        self._workdir = None
+
+    async def acquire(self) -> WarmWorker:
+        self.busy += 1
+        self._retired = [worker for worker in self._retired if worker.process.returncode is None]
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.process.returncode is None:
+                return worker
+        try:
+            return await self._spawn()
+        except Exception:
+            self.busy -= 1
+            raise
+
+    def release(self, worker: WarmWorker, healthy: bool = True) -> None:
+        self.busy -= 1
+        if (
+            healthy
+            and worker.runs < self.max_runs
+            and worker.rss_kb < self.max_rss_mb * 1024
+            and worker.process.returncode is None
+        ):
+            self._idle.append(worker)
+        else:
+            worker.kill()
+            self._retired.append(worker)
+            self.recycled += 1
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "busy": self.busy,
+            "idle": len(self._idle),
+            "occupancy": self.busy / self.size if self.size else 0.0,
+            "spawned": self.spawned,
+            "recycled": self.recycled
+        }
+
+
+class CodeRunner:
+    """Bounded pool of sandboxed interpreter subprocesses
+
+    Each run gets a fresh work directory, an empty environment, rlimits on
+    CPU, memory, file size and process count, a wall-clock timeout, and
+    the namespace sandbox described above, running as ``run_as_uid``.
+    Runs are refused when that uid is unset or is the server's own. At
+    most ``workers`` runs execute at once.
+    """
+
+    def __init__(
+        self,
+        workers: int = None,
+        timeout_seconds: float = 10,
+        cpu_seconds: int = 5,
+        memory_mb: int = 256,
+        max_file_bytes: int = 1024 * 1024,
+        max_processes: int = 32,
+        max_output_bytes: int = 1024 * 1024,
+        run_as_uid: Optional[int] = DEFAULT_RUNNER_UID,
+        warm_pool: bool = True,
+        warm_max_runs: int = 100,
+        warm_max_rss_mb: int = 128
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout_seconds = timeout_seconds
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_file_bytes = max_file_bytes
+        self.max_processes = max_processes
+        self.max_output_bytes = max_output_bytes
+        self.run_as_uid = run_as_uid
+        self._slots = asyncio.Semaphore(self.workers)
+        self.warm_pool = WarmPool(self, self.workers, warm_max_runs, warm_max_rss_mb) if warm_pool else None
+        self._base = None
+        self.active = 0
+        self.runs = 0
+
+    def _prepare(self) -> str:
+        """Create the server-owned directory holding the launcher and runs"""
+        if self._base is None:
+            base = tempfile.mkdtemp(prefix="codequest-")
+            os.chmod(base, 0o711)
+            with open(os.path.join(base, "sandbox.py"), "w") as f:
+                f.write(SANDBOX_LAUNCHER)
+            os.chmod(os.path.join(base, "sandbox.py"), 0o644)
+            os.mkdir(os.path.join(base, "runs"), 0o711)
+            self._base = base
+        return self._base
+
+    def _sandbox(self, root: str, cwd: str, readonly: list = (), writable: list = (), keep_caps: bool = False) -> list:
+        """Command prefix that confines the rest of the command (see ``SANDBOX_LAUNCHER``)"""
+        config = {"root": root, "cwd": cwd, "readonly": list(readonly), "writable": list(writable), "keep_caps": keep_caps}
+        return ["python3", "-I", "-S", "-B", os.path.join(self._prepare(), "sandbox.py"), json.dumps(config)]
+
+    def _refusal(self) -> Optional[str]:
+        """Why runs cannot be sandboxed as configured, if they cannot"""
+        if self.run_as_uid is None:
+            return "Code runner is disabled: CODE_RUNNER_UID is not set"
+        if self.run_as_uid == os.getuid() or self.run_as_uid == 0:
+            return "Code runner is disabled: CODE_RUNNER_UID must not be the server's own uid or root"
+        return None
+
+    def _command(self, language: str, harness: str) -> list:
+        if language == "python":
+            return ["python3", "-I", "-S", "-B", harness]
+        return ["node", f"--max-old-space-size={self.memory_mb}", harness]
+
+    def _limit_resources(self, language: str):
+        """Return a preexec_fn applying rlimits inside the child"""
+        import resource
+
+        def apply():
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 1))
+            resource.setrlimit(resource.RLIMIT_FSIZE, (self.max_file_bytes, self.max_file_bytes))
+            if language == "python":
+                # V8 reserves far more address space than it uses, so node is
+                # bounded by --max-old-space-size instead
+                memory = self.memory_mb * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+            self._drop_privileges()
+
+        return apply
+
+    def _drop_privileges(self) -> None:
+        """Switch to the dedicated runner account"""
+        import resource
+
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        # RLIMIT_NPROC counts every process of the runner uid: each worker
+        # slot holds a zygote and a run, on top of the per-run budget
+        processes = self.max_processes + 2 * self.workers
+        resource.setrlimit(resource.RLIMIT_NPROC, (processes, processes))
+        os.setgroups([])
+        os.setgid(self.run_as_uid)
+        os.setuid(self.run_as_uid)
+
+    async def run(self, code: str, language: str, spec: Optional[dict] = None) -> dict:
+        """Run ``code`` against ``spec`` and return ``test_results``"""
+        language = (language or "").lower()
+        if language not in LANGUAGE_FILES:
+            return summarize_results([], error=f"Unsupported language: {language}")
+
+        refusal = self._refusal()
+        if refusal:
+            print(f"⚠️ {refusal}")
+            return self._failed(spec or SMOKE_SPEC, refusal)
+
+        async with self._slots:
+            self.active += 1
+            try:
+                return await self._run(code, language, spec or SMOKE_SPEC)
+            finally:
+                self.active -= 1
+                self.runs += 1
+
+    async def _run(self, code: str, language: str, spec: dict) -> dict:
+        solution_file, harness_file = LANGUAGE_FILES[language]
+        # <run>/work is the only writable path a run sees; <run>/root is
+        # the mount point for its sandbox root
+        run_dir = tempfile.mkdtemp(dir=os.path.join(self._prepare(), "runs"))
+        os.chmod(run_dir, 0o711)
+        workdir = os.path.join(run_dir, "work")
+        os.mkdir(workdir, 0o700)
+        os.mkdir(os.path.join(run_dir, "root"), 0o755)
+        try:
+            with open(os.path.join(workdir, solution_file), "w") as f:
+                f.write(code)
+            with open(os.path.join(workdir, harness_file), "w") as f:
+                f.write(PYTHON_HARNESS if language == "python" else JS_HARNESS)
+            with open(os.path.join(workdir, "spec.json"), "w") as f:
+                json.dump(sandbox_spec(spec), f)
+            os.chown(workdir, self.run_as_uid, self.run_as_uid)
+
+            if language == "python" and self.warm_pool:
+                return await self._run_warm(spec, workdir)
+
+            # Results come back on their own pipe, tagged with a per-run nonce
+            nonce = secrets.token_hex(16)
+            read_fd, write_fd = os.pipe()
+            start = time.perf_counter()
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *self._sandbox(os.path.join(run_dir, "root"), cwd=workdir, writable=[workdir]),
+                    *self._command(language, harness_file), str(write_fd),
+                    cwd=workdir,
+                    env={"PATH": SANDBOX_PATH, "HOME": workdir},
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE,
+                    pass_fds=(write_fd,),
+                    preexec_fn=self._limit_resources(language),
+                    start_new_session=True
+                )
+            except BaseException:
+                os.close(read_fd)
+                raise
+            finally:
+                os.close(write_fd)
+            results, transport = await pipe_reader(read_fd, self.max_output_bytes)
+            try:
+                process.stdin.write(nonce.encode() + b"\n")
+                process.stdin.close()
+                output, stderr, _ = await asyncio.wait_for(
+                    asyncio.gather(
+                        self._read_limited(results),
+                        self._read_limited(process.stderr),
+                        process.wait()
+                    ),
+                    timeout=self.timeout_seconds
+                )
+            except asyncio.TimeoutError:
+                self._kill(process)
+                await process.wait()
+                return self._failed(spec, f"Timed out after {self.timeout_seconds}s")
+            finally:
+                # Reap anything the program left running in its session
+                self._kill(process)
+                transport.close()
+
+            duration_ms = round((time.perf_counter() - start) * 1000, 2)
+            return self._parse(spec, find_result(output, nonce), stderr, process.returncode, duration_ms)
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    async def _run_warm(self, spec: dict, workdir: str) -> dict:
+        """Run a prepared workdir on a pre-forked Python worker"""
+        request = {
+            "workdir": workdir,
+            "cpu_seconds": self.cpu_seconds,
+            "memory_bytes": self.memory_mb * 1024 * 1024,
+            "file_bytes": self.max_file_bytes
+        }
+        start = time.perf_counter()
+        worker = await self.warm_pool.acquire()
+        healthy = False
+        try:
+            _, returncode, result = await asyncio.wait_for(
+                worker.execute(request), timeout=self.timeout_seconds
+            )
+            healthy = True
+        except asyncio.TimeoutError:
+            return self._failed(spec, f"Timed out after {self.timeout_seconds}s")
+        finally:
+            self.warm_pool.release(worker, healthy)
+
+        duration_ms = round((time.perf_counter() - start) * 1000, 2)
+        try:
+            with open(os.path.join(workdir, "stderr.txt"), "rb") as f:
+                stderr = f.read()[-self.max_output_bytes:]
+        except OSError:
+            stderr = b""
+        return self._parse(spec, result, stderr, returncode, duration_ms)
+
+    async def start(self) -> None:
+        """Pre-fork the warm pool"""
+        if self.warm_pool:
+            await self.warm_pool.start()
+
+    async def stop(self) -> None:
+        if self.warm_pool:
+            await self.warm_pool.stop()
+        if self._base:
+            shutil.rmtree(self._base, ignore_errors=True)
+            self._base = None
+
+    async def _read_limited(self, stream) -> bytes:
+        """Read a pipe to EOF, keeping only the last ``max_output_bytes``"""
+        data = b""
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                return data
+            data = (data + chunk)[-self.max_output_bytes:]
+
+    @staticmethod
+    def _kill(process) -> None:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _failed(self, spec: dict, message: str) -> dict:
+        cases = [
+            {"name": case_name(case, i), "status": "error", "message": message}
+            for i, case in enumerate(spec.get("cases", []))
+        ]
+        return summarize_results(cases, error=message)
+
+    def _parse(self, spec: dict, result: Optional[bytes], stderr: bytes, returncode: int, duration_ms: float) -> dict:
+        """Grade the outputs the harness reported against the spec"""
+        if result is None:
+            if returncode == -signal.SIGKILL or returncode == -signal.SIGXCPU:
+                message = "CPU time limit exceeded"
+            elif b"MemoryError" in stderr or b"heap out of memory" in stderr:
+                message = "Memory limit exceeded"
+            else:
+                message = stderr.decode(errors="replace").strip()[-1000:] or f"Exited with code {returncode}"
+            return self._failed(spec, message)
+
+        spec_cases = spec.get("cases", [])
+        try:
+            outcomes = json.loads(result)
+            valid = (
+                isinstance(outcomes, list)
+                and len(outcomes) == len(spec_cases)
+                and all(
+                    isinstance(outcome, dict)
+                    and outcome.get("name") == case_name(case, i)
+                    and outcome.get("status") in ("ok", "error")
+                    for i, (case, outcome) in enumerate(zip(spec_cases, outcomes))
+                )
+            )
+        except ValueError:
+            valid = False
+        if not valid:
+            return self._failed(spec, "Malformed test output")
+
+        results = summarize_results([
+            grade_case(spec, case, outcome) for case, outcome in zip(spec_cases, outcomes)
+        ])
+        results["duration_ms"] = duration_ms
+        return results
+
+    def stats(self) -> dict:
+        stats = {"workers": self.workers, "active": self.active, "runs": self.runs}
+        if self.warm_pool:
+            stats["warm_pool"] = self.warm_pool.stats()
+        return stats
+
+
+code_runner = CodeRunner(
+    workers=settings.CODE_RUNNER_WORKERS or None,
+    timeout_seconds=settings.CODE_RUNNER_TIMEOUT_SECONDS,
+    cpu_seconds=settings.CODE_RUNNER_CPU_SECONDS,
+    memory_mb=settings.CODE_RUNNER_MEMORY_MB,
+    max_file_bytes=settings.CODE_RUNNER_MAX_FILE_BYTES,
+    max_processes=settings.CODE_RUNNER_MAX_PROCESSES,
+    run_as_uid=settings.CODE_RUNNER_UID,
+    warm_pool=settings.CODE_RUNNER_WARM_POOL,
+    warm_max_runs=settings.CODE_RUNNER_WARM_MAX_RUNS,
+    warm_max_rss_mb=settings.CODE_RUNNER_WARM_MAX_RSS_MB
+)
@@ -0,0 +1,130 @@
+"""
+Code Storage
+Compressed, delta-encoded storage for submitted code
+
+Submitted code is kept in a ``code_storage`` sub-document instead of a
+plaintext ``code`` field. Each attempt is zlib-compressed and, when that
+is smaller, stored as a line delta against the user's previous attempt at
+the same task. Blobs above ``inline_max_bytes`` are spilled to GridFS.
+Documents written before this change still carry plaintext ``code`` and
+are read as-is.
+"""
+
+import difflib
+import json
+import zlib
+from typing import Optional
+from bson import Binary, ObjectId
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from app.core.config import settings
+
+BUCKET = "code_blobs"
+
+# Fields never needed by list views
+CODE_FIELDS = {"code": 0, "code_storage": 0}
+
+
+def encode_delta(base: str, code: str) -> list:
+    """Line delta turning ``base`` into ``code``
+
+    Runs of unchanged lines are ``[start, end]`` slices of the base; new
+    lines are stored as strings.
+    """
+    base_lines = base.splitlines(keepends=True)
+    code_lines = code.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, code_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(code_lines[j1:j2]))
+    return ops
+
+
+def apply_delta(base: str, ops: list) -> str:
+    base_lines = base.splitlines(keepends=True)
+    return "".join(
+        "".join(base_lines[op[0]:op[1]]) if isinstance(op, list) else op
+        for op in ops
+    )
+
+
+class CodeStore:
+    """Encode code on write and decode it (following delta chains) on read"""
+
+    def __init__(self, inline_max_bytes: int = 256 * 1024, max_chain: int = 8, level: int = 6):
+        self.inline_max_bytes = inline_max_bytes
+        self.max_chain = max_chain
+        self.level = level
+
+    def _bucket(self, db) -> AsyncIOMotorGridFSBucket:
+        return AsyncIOMotorGridFSBucket(db, bucket_name=BUCKET)
+
+    async def encode(self, db, collection: str, code: str, base: Optional[dict] = None) -> dict:
+        """Build the ``code_storage`` document for ``code``
+
+        ``base`` is the previous attempt (with its ``_id`` and
+        ``code_storage``) to delta-encode against, if any.
+        """
+        data = zlib.compress(code.encode(), self.level)
+        storage = {"encoding": "zlib", "size": len(code)}
+
+        if base is not None and (base.get("code_storage") or {}).get("depth", 0) < self.max_chain:
+            base_code = await self.load(db, collection, base)
+            if base_code is not None:
+                delta = zlib.compress(json.dumps(encode_delta(base_code, code)).encode(), self.level)
+                if len(delta) < len(data):
+                    data = delta
+                    storage = {
+                        "encoding": "zlib-delta",
+                        "size": len(code),
+                        "base_id": base["_id"],
+                        "depth": base.get("code_storage", {}).get("depth", 0) + 1
+                    }
+
+        if len(data) > self.inline_max_bytes:
+            storage["blob_id"] = await self._bucket(db).upload_from_stream(
+                f"{collection}.code", data, metadata={"collection": collection}
+            )
+        else:
+            storage["data"] = Binary(data)
+        return storage
+
+    async def _read_data(self, db, storage: dict) -> bytes:
+        if "blob_id" in storage:
+            stream = await self._bucket(db).open_download_stream(storage["blob_id"])
+            return await stream.read()
+        return bytes(storage["data"])
+
+    async def load(self, db, collection: str, doc: dict) -> Optional[str]:
+        """Return the code of a stored submission"""
+        if doc.get("code") is not None:
+            return doc["code"]
+
+        storage = doc.get("code_storage")
+        if storage is None:
+            if doc.get("duplicate_of"):
+                original = await db[collection].find_one(
+                    {"_id": ObjectId(doc["duplicate_of"])}, {"code": 1, "code_storage": 1}
+                )
+                return await self.load(db, collection, original) if original else None
+            return None
+
+        data = zlib.decompress(await self._read_data(db, storage))
+        if storage["encoding"] == "zlib":
+            return data.decode()
+
+        base = await db[collection].find_one(
+            {"_id": storage["base_id"]}, {"code": 1, "code_storage": 1}
+        )
+        base_code = await self.load(db, collection, base) if base else None
+        if base_code is None:
+            raise ValueError("Delta base of stored code is missing")
+        return apply_delta(base_code, json.loads(data))
+
+
+code_store = CodeStore(
+    inline_max_bytes=settings.CODE_STORAGE_INLINE_MAX_BYTES,
+    max_chain=settings.CODE_STORAGE_MAX_DELTA_CHAIN
+)
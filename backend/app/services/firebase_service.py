@@ -3,18 +3,44 @@ Firebase Admin Service
 Handles Firebase token verification and user management on the backend
 """
 
+import asyncio
 import json
 import os
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+import cachecontrol
 import firebase_admin
+import requests
 from firebase_admin import auth, credentials
+from google.auth import exceptions as google_auth_exceptions
+from google.auth.transport import requests as google_requests
+from google.oauth2 import id_token as google_id_token
 from app.core.config import settings
+from app.core.security import VerifiedTokenCache
+
+# Google's public certificates for Firebase ID token signatures
+ID_TOKEN_CERT_URI = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+ID_TOKEN_ISSUER_PREFIX = "https://securetoken.google.com/"
+
+# auth.get_users accepts at most 100 identifiers per call
+GET_USERS_BATCH_SIZE = 100
+ADMIN_CALL_CONCURRENCY = 8
 
 class FirebaseAdminService:
     """Firebase Admin SDK service for token verification and user management"""
     
     def __init__(self):
         self.app = None
+        self.token_cache = VerifiedTokenCache(
+            max_size=settings.FIREBASE_TOKEN_CACHE_SIZE,
+            max_age_seconds=settings.FIREBASE_TOKEN_CACHE_MAX_AGE_SECONDS
+        )
+        # Honors the certificates' Cache-Control max-age, so verification
+        # only hits the network when the background refresh falls behind
+        self._cert_request = google_requests.Request(
+            session=cachecontrol.CacheControl(requests.Session())
+        )
+        self._cert_task: Optional[asyncio.Task] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
         self._initialize_firebase()
     
     def _initialize_firebase(self):
@@ -69,9 +95,23 @@ class FirebaseAdminService:
         if not self.app:
             raise Exception("Firebase Admin not initialized")
         
+        cached = self.token_cache.get(id_token)
+        if cached:
+            return cached
+        
+        # Share one verification between concurrent requests with the same token
+        task = self._inflight.get(id_token)
+        if task is None:
+            task = asyncio.ensure_future(self._verify_uncached(id_token))
+            self._inflight[id_token] = task
+            task.add_done_callback(lambda _: self._inflight.pop(id_token, None))
+        return await asyncio.shield(task)
+    
+    async def _verify_uncached(self, id_token: str) -> Optional[Dict[str, Any]]:
+        """Verify a token with the SDK and cache the result"""
         try:
-            # Verify the ID token
-            decoded_token = auth.verify_id_token(id_token)
+            # RSA signature checks and certificate fetches block, keep them off the loop
+            decoded_token = await asyncio.to_thread(self._decode_id_token, id_token)
             
             user_info = {
                 'uid': decoded_token['uid'],
@@ -82,19 +122,75 @@ class FirebaseAdminService:
                 'firebase_claims': decoded_token
             }
             
-            print(f"✅ Token verified for user: {user_info['email']}")
+            self.token_cache.put(id_token, user_info, decoded_token['exp'])
             return user_info
             
-        except auth.InvalidIdTokenError:
-            print("❌ Invalid ID token")
-            return None
-        except auth.ExpiredIdTokenError:
-            print("❌ Expired ID token")
+        except ValueError:
+            # Bad signature, audience, issuer or subject, or an expired token
             return None
         except Exception as e:
             print(f"❌ Token verification error: {e}")
             return None
     
+    def _decode_id_token(self, id_token: str) -> Dict[str, Any]:
+        """Check a Firebase ID token against the cached certificates
+        
+        Applies the same checks as ``auth.verify_id_token`` (signature,
+        expiry, audience, issuer and subject) and raises ``ValueError``
+        for invalid tokens.
+        """
+        project_id = self.app.project_id or settings.FIREBASE_PROJECT_ID
+        try:
+            claims = google_id_token.verify_token(
+                id_token,
+                self._cert_request,
+                audience=project_id,
+                certs_url=ID_TOKEN_CERT_URI
+            )
+        except google_auth_exceptions.TransportError:
+            raise
+        except google_auth_exceptions.GoogleAuthError as e:
+            raise ValueError(str(e))
+        
+        if claims.get("iss") != ID_TOKEN_ISSUER_PREFIX + project_id:
+            raise ValueError("Token has an unexpected issuer")
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise ValueError("Token has an invalid subject")
+        return {**claims, "uid": subject}
+    
+    def _fetch_certificates(self) -> None:
+        """Fetch signing certificates into the verification cache"""
+        response = self._cert_request(ID_TOKEN_CERT_URI, method="GET")
+        if response.status != 200:
+            raise google_auth_exceptions.TransportError(
+                f"Certificate fetch returned HTTP {response.status}"
+            )
+    
+    async def _refresh_certificates(self) -> None:
+        """Keep the certificate cache warm so requests never fetch inline"""
+        while True:
+            try:
+                await asyncio.to_thread(self._fetch_certificates)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Firebase certificate refresh failed: {e}")
+            await asyncio.sleep(settings.FIREBASE_CERT_REFRESH_SECONDS)
+    
+    async def start(self) -> None:
+        """Prefetch certificates and refresh them in the background"""
+        if self.app and not self._cert_task:
+            self._cert_task = asyncio.create_task(
+                self._refresh_certificates(), name="firebase_cert_refresh"
+            )
+    
+    async def stop(self) -> None:
+        if self._cert_task:
+            self._cert_task.cancel()
+            await asyncio.gather(self._cert_task, return_exceptions=True)
+            self._cert_task = None
+    
     async def get_user_by_uid(self, uid: str) -> Optional[Dict[str, Any]]:
         """
         Get Firebase user information by UID
@@ -109,18 +205,8 @@ class FirebaseAdminService:
             raise Exception("Firebase Admin not initialized")
         
         try:
-            user_record = auth.get_user(uid)
-            
-            return {
-                'uid': user_record.uid,
-                'email': user_record.email,
-                'email_verified': user_record.email_verified,
-                'display_name': user_record.display_name,
-                'photo_url': user_record.photo_url,
-                'disabled': user_record.disabled,
-                'creation_timestamp': user_record.user_metadata.creation_timestamp,
-                'last_sign_in_timestamp': user_record.user_metadata.last_sign_in_timestamp,
-            }
+            user_record = await asyncio.to_thread(auth.get_user, uid)
+            return self._user_record_to_dict(user_record)
             
         except auth.UserNotFoundError:
             print(f"❌ User not found: {uid}")
@@ -129,6 +215,43 @@ class FirebaseAdminService:
             print(f"❌ Error getting user: {e}")
             return None
     
+    @staticmethod
+    def _user_record_to_dict(user_record) -> Dict[str, Any]:
+        return {
+            'uid': user_record.uid,
+            'email': user_record.email,
+            'email_verified': user_record.email_verified,
+            'display_name': user_record.display_name,
+            'photo_url': user_record.photo_url,
+            'disabled': user_record.disabled,
+            'creation_timestamp': user_record.user_metadata.creation_timestamp,
+            'last_sign_in_timestamp': user_record.user_metadata.last_sign_in_timestamp,
+        }
+    
+    async def get_users_by_uids(self, uids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get many Firebase users with batched lookups
+        
+        Args:
+            uids: Firebase user UIDs
+            
+        Returns:
+            User information keyed by UID; unknown UIDs are omitted
+        """
+        if not self.app:
+            raise Exception("Firebase Admin not initialized")
+        
+        users = {}
+        for i in range(0, len(uids), GET_USERS_BATCH_SIZE):
+            batch = [auth.UidIdentifier(uid) for uid in uids[i:i + GET_USERS_BATCH_SIZE]]
+            try:
+                result = await asyncio.to_thread(auth.get_users, batch)
+                for user_record in result.users:
+                    users[user_record.uid] = self._user_record_to_dict(user_record)
+            except Exception as e:
+                print(f"❌ Error getting users: {e}")
+        return users
+    
     async def create_custom_token(self, uid: str, additional_claims: Optional[Dict] = None) -> Optional[str]:
         """
         Create a custom token for a user
@@ -144,7 +267,7 @@ class FirebaseAdminService:
             raise Exception("Firebase Admin not initialized")
         
         try:
-            custom_token = auth.create_custom_token(uid, additional_claims)
+            custom_token = await asyncio.to_thread(auth.create_custom_token, uid, additional_claims)
             return custom_token.decode('utf-8')
         except Exception as e:
             print(f"❌ Error creating custom token: {e}")
@@ -165,12 +288,32 @@ class FirebaseAdminService:
             raise Exception("Firebase Admin not initialized")
         
         try:
-            auth.set_custom_user_claims(uid, custom_claims)
-            print(f"✅ Custom claims set for user: {uid}")
+            await asyncio.to_thread(auth.set_custom_user_claims, uid, custom_claims)
             return True
         except Exception as e:
             print(f"❌ Error setting custom claims: {e}")
             return False
+    
+    async def set_custom_user_claims_many(self, claims_by_uid: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """
+        Set custom claims for many users with bounded concurrency
+        
+        Args:
+            claims_by_uid: Custom claims keyed by Firebase user UID
+            
+        Returns:
+            Success flag keyed by UID
+        """
+        semaphore = asyncio.Semaphore(ADMIN_CALL_CONCURRENCY)
+        
+        async def set_claims(uid, claims):
+            async with semaphore:
+                return await self.set_custom_user_claims(uid, claims)
+        
+        results = await asyncio.gather(*[
+            set_claims(uid, claims) for uid, claims in claims_by_uid.items()
+        ])
+        return dict(zip(claims_by_uid, results))
 
 # Global instance
 firebase_admin_service = FirebaseAdminService()
\ No newline at end of file
@@ -4,6 +4,11 @@ Manage XP, levels, badges, streaks, and achievements
 """
 
 from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from app.services.activity_service import ActivityService
+from app.services.notification_service import NotificationService
+from app.services.notification_hub import notification_hub, new_event
+from app.services.notification_digest import notification_digest
 
 class GamificationService:
     """Advanced gamification system"""
@@ -69,6 +74,9 @@ class GamificationService:
     # XP per level
     XP_PER_LEVEL = 1000
     
+    activity_service = ActivityService()
+    notification_service = NotificationService()
+    
     def get_level_from_xp(self, total_xp: int) -> int:
         """Calculate level from total XP"""
         return (total_xp // self.XP_PER_LEVEL) + 1
@@ -154,6 +162,13 @@ class GamificationService:
                     await db["user_badges"].insert_one(badge_doc)
                     new_badges.append(badge_id)
             
+            await notification_hub.publish_many([
+                new_event(user_id, "badge_unlocked", {"badge_id": badge_id, **self.BADGES[badge_id]})
+                for badge_id in new_badges
+            ])
+            for badge_id in new_badges:
+                notification_digest.add(user_id, "badge", self.BADGES[badge_id]["name"])
+            
             return new_badges
         
         except Exception as e:
@@ -165,6 +180,9 @@ class GamificationService:
         try:
             today = datetime.utcnow().date()
             
+            # Record today in the activity bitmap
+            bitmap_streak = await self.activity_service.record_activity_streak(db, user_id)
+            
             # Get current streak
             streak_doc = await db["user_streaks"].find_one({"user_id": user_id})
             
@@ -202,6 +220,10 @@ class GamificationService:
                 # Streak broken, restart
                 current_streak = 1
             
+            # The bitmap is authoritative once it has history
+            current_streak = max(current_streak, bitmap_streak)
+            longest_streak = max(longest_streak, current_streak)
+            
             # Update
             await db["user_streaks"].update_one(
                 {"user_id": user_id},
@@ -223,6 +245,83 @@ class GamificationService:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    async def expire_lapsed_streaks(self, db, now: datetime = None, batch_size: int = 1000) -> dict:
+        """Reset every streak that lapsed at the last UTC day boundary
+        
+        A streak survives while the last activity is no older than
+        yesterday, so anything before the start of yesterday is broken.
+        Uses the ``user_streaks.last_activity`` index and resets each batch
+        with ``update_many`` plus one ``insert_many`` of notifications.
+        Safe to run from several workers: one run is claimed per day, and
+        a failed run releases its claim so a later attempt can finish it.
+        """
+        try:
+            now = now or datetime.utcnow()
+            today = now.date()
+            cutoff = datetime.combine(today - timedelta(days=1), datetime.min.time())
+            
+            claim = {"_id": f"streak_sweep:{today.isoformat()}"}
+            try:
+                await db["job_runs"].insert_one({**claim, "started_at": now})
+            except DuplicateKeyError:
+                return {"success": True, "skipped": True, "expired": 0}
+            
+            try:
+                lapsed_query = {
+                    "last_activity": {"$lt": cutoff},
+                    "current_streak": {"$gt": 0}
+                }
+                expired = 0
+                
+                while True:
+                    lapsed = await db["user_streaks"].find(
+                        lapsed_query,
+                        {"user_id": 1, "current_streak": 1}
+                    ).limit(batch_size).to_list(batch_size)
+                
+                    if not lapsed:
+                        break
+                
+                    user_ids = [doc["user_id"] for doc in lapsed]
+                
+                    await db["user_streaks"].update_many(
+                        {"user_id": {"$in": user_ids}, **lapsed_query},
+                        {"$set": {"current_streak": 0, "streak_broken_at": now}}
+                    )
+                    await db["users"].update_many(
+                        {"_id": {"$in": user_ids}},
+                        {"$set": {"current_streak": 0}}
+                    )
+                    await self.notification_service.create_notifications(db, [
+                        self.notification_service.build_notification(
+                            doc["user_id"],
+                            "Streak lost",
+                            f"Your {doc['current_streak']}-day streak ended. Complete a task today to start a new one!",
+                            "streak",
+                            action_url="/quests",
+                            created_at=now
+                        )
+                        for doc in lapsed
+                    ])
+                
+                    expired += len(lapsed)
+                    if len(lapsed) < batch_size:
+                        break
+            except Exception:
+                # Reset streaks drop out of the query, so a retry resumes where this stopped
+                await db["job_runs"].delete_one(claim)
+                raise
+            
+            await db["job_runs"].update_one(
+                claim,
+                {"$set": {"finished_at": datetime.utcnow(), "expired": expired}}
+            )
+            
+            return {"success": True, "expired": expired, "cutoff": cutoff}
+        
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
     async def get_user_stats(self, db, user_id: str) -> dict:
         """Get comprehensive gamification stats"""
         try:
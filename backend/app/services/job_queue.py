@@ -0,0 +1,275 @@
+"""
+Job Queue
+Durable background jobs stored in MongoDB with leases, retries and priorities
+"""
+
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.services.notification_hub import notification_hub
+
+COLLECTION = "jobs"
+
+Handler = Callable[[object, dict, Callable[..., Awaitable]], Awaitable[dict]]
+
+
+def format_job(job: dict) -> dict:
+    """Public view of a job (payloads may hold submitted code)"""
+    return {
+        "job_id": str(job["_id"]),
+        "type": job["type"],
+        "status": job["status"],
+        "progress": job.get("progress"),
+        "progress_message": job.get("progress_message"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "attempts": job.get("attempts", 0),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at")
+    }
+
+
+class JobQueue:
+    """Lease-based work queue over the ``jobs`` collection
+
+    Workers claim the highest-priority due job with one
+    ``find_one_and_update`` and hold a lease they renew while working. A
+    job whose worker dies becomes claimable again once its lease expires;
+    failures are retried with exponential backoff up to ``max_attempts``.
+    """
+
+    def __init__(self, lease_seconds: float = 60, poll_seconds: float = 1.0, retry_base_seconds: float = 5):
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.handlers: Dict[str, Handler] = {}
+        self._workers: List[asyncio.Task] = []
+        self._worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self.processed = 0
+        self.failed = 0
+
+    def register(self, job_type: str, handler: Handler) -> None:
+        """Register the coroutine that runs jobs of ``job_type``
+
+        Handlers are called as ``handler(db, job, report_progress)`` and
+        return the job result.
+        """
+        self.handlers[job_type] = handler
+
+    async def enqueue(
+        self,
+        db,
+        job_type: str,
+        payload: dict,
+        user_id: str = None,
+        priority: int = 0,
+        max_attempts: int = 3
+    ) -> str:
+        """Queue a job and return its id"""
+        now = datetime.utcnow()
+        job = {
+            "type": job_type,
+            "payload": payload,
+            "user_id": user_id,
+            "priority": priority,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": max_attempts,
+            "run_after": now,
+            "lease_until": None,
+            "worker_id": None,
+            "progress": None,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        result = await db[COLLECTION].insert_one(job)
+        job["_id"] = result.inserted_id
+        await self._publish(job)
+        return str(result.inserted_id)
+
+    async def get_job(self, db, job_id: str, user_id: str = None) -> Optional[dict]:
+        """Get a job, only if it belongs to ``user_id`` when one is given"""
+        if not ObjectId.is_valid(job_id):
+            return None
+        query = {"_id": ObjectId(job_id)}
+        if user_id is not None:
+            query["user_id"] = user_id
+        job = await db[COLLECTION].find_one(query, {"payload": 0})
+        return format_job(job) if job else None
+
+    async def claim(self, db, worker_id: str) -> Optional[dict]:
+        """Lease the next due job, including ones whose lease has expired"""
+        now = datetime.utcnow()
+        return await db[COLLECTION].find_one_and_update(
+            {
+                "$or": [
+                    {"status": "queued", "run_after": {"$lte": now}},
+                    {"status": "running", "lease_until": {"$lt": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "worker_id": worker_id,
+                    "lease_until": now + timedelta(seconds=self.lease_seconds),
+                    "started_at": now,
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("priority", -1), ("run_after", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _finish(self, db, job: dict, changes: dict) -> Optional[dict]:
+        """Apply a terminal or retry update if this worker still holds the lease"""
+        return await db[COLLECTION].find_one_and_update(
+            {"_id": job["_id"], "worker_id": job["worker_id"], "status": "running"},
+            {"$set": {**changes, "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def complete(self, db, job: dict, result: dict) -> None:
+        updated = await self._finish(db, job, {
+            "status": "succeeded",
+            "result": result,
+            "error": None,
+            "progress": 100,
+            "lease_until": None,
+            "finished_at": datetime.utcnow()
+        })
+        if updated:
+            await self._publish(updated)
+
+    async def fail(self, db, job: dict, error: str) -> None:
+        """Retry with backoff, or fail permanently after ``max_attempts``"""
+        if job["attempts"] < job["max_attempts"]:
+            delay = self.retry_base_seconds * 2 ** (job["attempts"] - 1)
+            changes = {
+                "status": "queued",
+                "error": error,
+                "lease_until": None,
+                "run_after": datetime.utcnow() + timedelta(seconds=delay)
+            }
+        else:
+            changes = {
+                "status": "failed",
+                "error": error,
+                "lease_until": None,
+                "finished_at": datetime.utcnow()
+            }
+        updated = await self._finish(db, job, changes)
+        if updated:
+            await self._publish(updated)
+
+    async def report_progress(self, db, job: dict, progress: int, message: str = None) -> None:
+        """Record progress, renew the lease and push it to the job's user"""
+        now = datetime.utcnow()
+        updated = await db[COLLECTION].find_one_and_update(
+            {"_id": job["_id"], "worker_id": job["worker_id"]},
+            {"$set": {
+                "progress": progress,
+                "progress_message": message,
+                "lease_until": now + timedelta(seconds=self.lease_seconds),
+                "updated_at": now
+            }},
+            projection={"payload": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if updated:
+            await self._publish(updated)
+
+    async def _publish(self, job: dict) -> None:
+        if job.get("user_id"):
+            await notification_hub.publish(job["user_id"], "job_update", format_job(job))
+
+    async def _renew_lease(self, db, job: dict) -> None:
+        """Keep the lease alive while a handler runs"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await db[COLLECTION].update_one(
+                {"_id": job["_id"], "worker_id": job["worker_id"]},
+                {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+            )
+
+    async def run_one(self, db, worker_id: str) -> bool:
+        """Claim and run a single job; returns False when the queue is empty"""
+        job = await self.claim(db, worker_id)
+        if not job:
+            return False
+
+        if job["attempts"] > job["max_attempts"]:
+            # Lease expired on the final attempt (worker crashed mid-job)
+            await self.fail(db, job, job.get("error") or "Worker lease expired")
+            self.failed += 1
+            return True
+
+        handler = self.handlers.get(job["type"])
+        if not handler:
+            job["attempts"] = job["max_attempts"]
+            await self.fail(db, job, f"No handler for job type {job['type']}")
+            self.failed += 1
+            return True
+
+        async def report(progress: int, message: str = None):
+            await self.report_progress(db, job, progress, message)
+
+        renewer = asyncio.create_task(self._renew_lease(db, job))
+        try:
+            result = await handler(db, job, report)
+            await self.complete(db, job, result)
+            self.processed += 1
+        except Exception as e:
+            await self.fail(db, job, str(e))
+            self.failed += 1
+        finally:
+            renewer.cancel()
+        return True
+
+    async def _work(self, get_db, worker_id: str) -> None:
+        while True:
+            try:
+                db = await get_db()
+                if not await self.run_one(db, worker_id):
+                    await asyncio.sleep(self.poll_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Job worker {worker_id} error: {e}")
+                await asyncio.sleep(self.poll_seconds)
+
+    def start(self, get_db, workers: int) -> None:
+        """Start ``workers`` polling loops in this process"""
+        for i in range(workers):
+            worker_id = f"{self._worker_prefix}:{i}"
+            self._workers.append(asyncio.create_task(self._work(get_db, worker_id), name=f"job_worker_{i}"))
+        print(f"✅ Started {workers} job workers")
+
+    async def stop(self) -> None:
+        """Stop workers; in-flight jobs are retried once their lease expires"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "processed": self.processed,
+            "failed": self.failed
+        }
+
+
+job_queue = JobQueue(
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+    poll_seconds=settings.JOB_POLL_SECONDS,
+    retry_base_seconds=settings.JOB_RETRY_BASE_SECONDS
+)
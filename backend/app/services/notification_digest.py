@@ -0,0 +1,163 @@
+"""
+Notification Digest
+Coalesces bursts of same-kind events for a user into one stored notification
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.services.notification_service import NotificationService
+
+
+class NotificationDigest:
+    """Buffer events per (user, kind) and flush them as digest notifications
+
+    Events arriving within ``window_seconds`` of each other are merged, so
+    a batch sync that awards a user dozens of tasks stores one notification
+    instead of dozens. Live push events are unaffected; this only governs
+    what lands in the ``notifications`` collection.
+
+    At most ``max_pending`` entries are buffered: reaching it triggers an
+    early flush, and events for new (user, kind) pairs are dropped until
+    the buffer drains (e.g. while the flush loop is not running or the
+    database is down).
+    """
+
+    def __init__(self, window_seconds: float = 5.0, max_pending: int = 10000, max_items: int = 20):
+        self.window_seconds = window_seconds
+        self.max_pending = max_pending
+        self.max_items = max_items
+        self.notification_service = NotificationService()
+        self._pending: Dict[Tuple[str, str], dict] = {}
+        self._get_db = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self.events = 0
+        self.flushed = 0
+        self.dropped = 0
+
+    async def start(self, get_db) -> None:
+        self._get_db = get_db
+        self._task = asyncio.create_task(self._run(), name="notification_digest")
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write out anything still buffered"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pending and self._get_db:
+            await self.flush(await self._get_db())
+
+    def add(self, user_id: str, kind: str, title: str, xp: int = 0) -> None:
+        """Buffer one event; ``title`` describes it in the digest message"""
+        entry = self._pending.get((user_id, kind))
+        if entry is None:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                self._wake.set()
+                return
+            entry = self._pending[(user_id, kind)] = {
+                "count": 0,
+                "xp": 0,
+                "items": [],
+                "first_at": datetime.utcnow()
+            }
+        entry["count"] += 1
+        entry["xp"] += xp
+        if len(entry["items"]) < self.max_items:
+            entry["items"].append(title)
+        self.events += 1
+
+        if len(self._pending) >= self.max_pending:
+            self._wake.set()
+
+    def _render(self, user_id: str, kind: str, entry: dict) -> dict:
+        """Build the stored notification for one coalesced entry"""
+        count = entry["count"]
+        items = ", ".join(entry["items"])
+        if count > len(entry["items"]):
+            items += f" and {count - len(entry['items'])} more"
+
+        if kind == "xp":
+            title = "XP earned"
+            message = f"You earned {entry['xp']} XP" + (f" from {count} tasks" if count > 1 else f" for {items}")
+            action_url = "/quests"
+        elif kind == "badge":
+            title = "New badge unlocked!" if count == 1 else f"{count} new badges unlocked!"
+            message = f"You unlocked: {items}"
+            action_url = "/profile"
+        else:
+            title = kind.replace("_", " ").capitalize()
+            message = items
+            action_url = None
+
+        notification = self.notification_service.build_notification(
+            user_id, title, message, kind, action_url=action_url
+        )
+        notification["digest"] = {
+            "count": count,
+            "xp": entry["xp"],
+            "first_at": entry["first_at"]
+        }
+        return notification
+
+    async def flush(self, db) -> int:
+        """Write all buffered entries with a single ``insert_many``"""
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, {}
+        notifications = [
+            self._render(user_id, kind, entry)
+            for (user_id, kind), entry in pending.items()
+        ]
+        try:
+            await self.notification_service.create_notifications(db, notifications)
+        except Exception:
+            self._restore(pending)
+            raise
+        self.flushed += len(notifications)
+        return len(notifications)
+
+    def _restore(self, pending: Dict[Tuple[str, str], dict]) -> None:
+        """Merge entries from a failed flush back into the buffer"""
+        for key, old in pending.items():
+            entry = self._pending.get(key)
+            if entry is None:
+                self._pending[key] = old
+                continue
+            entry["count"] += old["count"]
+            entry["xp"] += old["xp"]
+            entry["items"] = (old["items"] + entry["items"])[:self.max_items]
+            entry["first_at"] = min(entry["first_at"], old["first_at"])
+
+    async def _run(self) -> None:
+        """Flush every window, or early when the buffer is full"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.window_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush(await self._get_db())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Failed to flush notification digest: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "events": self.events,
+            "flushed": self.flushed,
+            "dropped": self.dropped
+        }
+
+
+notification_digest = NotificationDigest(
+    window_seconds=settings.NOTIFICATION_DIGEST_WINDOW_SECONDS,
+    max_pending=settings.NOTIFICATION_DIGEST_MAX_PENDING
+)
@@ -0,0 +1,228 @@
+"""
+Notification Hub
+In-process pub/sub for pushing notifications, XP awards and badge unlocks
+to connected clients, with a broker that fans events out across workers
+"""
+
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+from app.core.config import settings
+
+
+def new_event(user_id: str, kind: str, data: dict) -> dict:
+    """Build a push event with a unique id
+
+    Ids are not ordered across workers; the broker's log order is.
+    """
+    return {
+        "id": str(ObjectId()),
+        "user_id": user_id,
+        "kind": kind,
+        "data": data,
+        "created_at": datetime.utcnow().isoformat()
+    }
+
+
+def events_after(events: List[dict], after_id: str) -> List[dict]:
+    """Events that follow ``after_id`` in publish order
+
+    If the cursor has already aged out of the log, everything still
+    retained is newer than it.
+    """
+    for i, event in enumerate(events):
+        if event["id"] == after_id:
+            return events[i + 1:]
+    return events
+
+
+class LocalBroker:
+    """Single-process stand-in for a message broker
+
+    Delivers straight to this worker's hub and keeps a bounded history
+    so reconnecting clients can resume.
+    """
+
+    def __init__(self, history_size: int = 1000):
+        self._history = deque(maxlen=history_size)
+        self._deliver: Optional[Callable[[dict], None]] = None
+
+    async def start(self, deliver: Callable[[dict], None]) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+    async def publish(self, events: List[dict]) -> None:
+        for event in events:
+            self._history.append(event)
+            if self._deliver:
+                self._deliver(event)
+
+    async def replay(self, user_id: str, after_id: str) -> List[dict]:
+        return events_after([e for e in self._history if e["user_id"] == user_id], after_id)
+
+
+class MongoBroker:
+    """Fan events out between workers through a capped collection
+
+    Every worker tails ``notification_events`` with a tailable cursor and
+    hands new documents to its own hub. The capped collection doubles as
+    the replay log for resume-from-cursor; its natural (insertion) order is
+    the only sequence shared by all workers, so positions are never
+    derived from ObjectId order.
+    """
+
+    COLLECTION = "notification_events"
+
+    def __init__(self, get_db, size_bytes: int = 16 * 1024 * 1024, retry_seconds: float = 1.0):
+        self._get_db = get_db
+        self._size_bytes = size_bytes
+        self._retry_seconds = retry_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Callable[[dict], None]) -> None:
+        db = await self._get_db()
+        try:
+            await db.create_collection(self.COLLECTION, capped=True, size=self._size_bytes)
+        except CollectionInvalid:
+            pass  # already exists
+        self._task = asyncio.create_task(self._tail(db, deliver), name="notification_broker")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def publish(self, events: List[dict]) -> None:
+        db = await self._get_db()
+        await db[self.COLLECTION].insert_many(
+            [{"_id": ObjectId(e["id"]), **{k: v for k, v in e.items() if k != "id"}} for e in events],
+            ordered=True
+        )
+
+    async def replay(self, user_id: str, after_id: str) -> List[dict]:
+        db = await self._get_db()
+        docs = await db[self.COLLECTION].find({"user_id": user_id}).sort("$natural", 1).to_list(None)
+        return events_after([self._to_event(doc) for doc in docs], after_id)
+
+    @staticmethod
+    def _to_event(doc: dict) -> dict:
+        return {"id": str(doc["_id"]), **{k: v for k, v in doc.items() if k != "_id"}}
+
+    async def _tail(self, db, deliver: Callable[[dict], None]) -> None:
+        """Follow the capped collection from its current end
+
+        A tailable cursor always starts at the head of the log, so after
+        a restart documents are skipped up to the last one delivered.
+        """
+        collection = db[self.COLLECTION]
+        last = await collection.find_one({}, sort=[("$natural", -1)])
+        last_id = last["_id"] if last else None
+
+        while True:
+            try:
+                skipping = last_id is not None and await collection.find_one({"_id": last_id}) is not None
+                cursor = collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for doc in cursor:
+                        if skipping:
+                            skipping = doc["_id"] != last_id
+                            continue
+                        last_id = doc["_id"]
+                        deliver(self._to_event(doc))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Notification broker tail failed: {e}")
+            # Tailable cursors die on an empty collection; retry shortly
+            await asyncio.sleep(self._retry_seconds)
+
+
+class NotificationHub:
+    """Per-worker subscriber registry fed by a broker"""
+
+    def __init__(self, broker, queue_size: int = 100):
+        self.broker = broker
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        await self.broker.start(self._deliver)
+
+    async def stop(self) -> None:
+        await self.broker.stop()
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(user_id)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def _deliver(self, event: dict) -> None:
+        """Hand an event to every local subscriber of its user"""
+        for queue in self._subscribers.get(event["user_id"], ()):
+            if queue.full():
+                # Slow consumer: drop the oldest event, it can resume by cursor
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+            self.delivered += 1
+
+    async def publish(self, user_id: str, kind: str, data: dict) -> dict:
+        """Publish one event to a user's connected clients on every worker"""
+        event = new_event(user_id, kind, data)
+        await self.publish_many([event])
+        return event
+
+    async def publish_many(self, events: List[dict]) -> None:
+        """Publish a batch of events built with ``new_event``"""
+        if not events:
+            return
+        try:
+            await self.broker.publish(events)
+            self.published += len(events)
+        except Exception as e:
+            # Push is best effort; the source of truth is already stored
+            print(f"⚠️ Failed to publish notification events: {e}")
+
+    async def replay(self, user_id: str, after_id: str) -> List[dict]:
+        """Events for a user after ``after_id`` (resume from cursor)"""
+        if not after_id or not ObjectId.is_valid(after_id):
+            return []
+        return await self.broker.replay(user_id, after_id)
+
+    def stats(self) -> dict:
+        return {
+            "connections": sum(len(q) for q in self._subscribers.values()),
+            "users": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped
+        }
+
+
+def _create_hub() -> NotificationHub:
+    if settings.NOTIFICATION_BROKER == "mongo":
+        from app.core.database import get_database
+        broker = MongoBroker(get_database, settings.NOTIFICATION_EVENTS_CAP_BYTES)
+    else:
+        broker = LocalBroker(settings.NOTIFICATION_HISTORY_SIZE)
+    return NotificationHub(broker, settings.NOTIFICATION_QUEUE_SIZE)
+
+
+notification_hub = _create_hub()
@@ -0,0 +1,206 @@
+"""
+Notification Service
+Stores notifications and pushes them to connected clients
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.utils.json_encoder import convert_objectid
+from app.services.notification_hub import notification_hub, new_event
+
+COUNTERS_COLLECTION = "notification_counters"
+ARCHIVE_COLLECTION = "notifications_archive"
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(notification: dict) -> str:
+    """Keyset cursor for the (created_at, _id) sort order"""
+    # Stored datetimes are naive UTC; naive .timestamp() would use local time
+    created_ms = int(notification["created_at"].replace(tzinfo=timezone.utc).timestamp() * 1000)
+    return f"{created_ms}_{notification['_id']}"
+
+def decode_cursor(cursor: str) -> tuple:
+    """Inverse of ``encode_cursor``"""
+    created_ms, _, object_id = cursor.partition("_")
+    created_at = datetime.fromtimestamp(int(created_ms) / 1000, timezone.utc).replace(tzinfo=None)
+    return created_at, ObjectId(object_id)
+
+class NotificationService:
+    """Create notifications and publish them on the push channel"""
+
+    def build_notification(
+        self,
+        user_id: str,
+        title: str,
+        message: str,
+        type: str,
+        action_url: str = None,
+        created_at: datetime = None
+    ) -> dict:
+        """Notification document matching ``models.notification.Notification``"""
+        return {
+            "user_id": user_id,
+            "title": title,
+            "message": message,
+            "type": type,
+            "is_read": False,
+            "action_url": action_url,
+            "created_at": created_at or datetime.utcnow()
+        }
+
+    async def create_notifications(self, db, notifications: list) -> list:
+        """Insert notifications in one batch and push each to its user"""
+        if not notifications:
+            return []
+
+        await db["notifications"].insert_many(notifications, ordered=False)
+
+        # Keep the per-user unread counters in step with the inserts
+        unread = {}
+        for n in notifications:
+            if not n.get("is_read"):
+                unread[n["user_id"]] = unread.get(n["user_id"], 0) + 1
+        if unread:
+            await db[COUNTERS_COLLECTION].bulk_write(
+                [
+                    UpdateOne({"_id": user_id}, {"$inc": {"unread": count}}, upsert=True)
+                    for user_id, count in unread.items()
+                ],
+                ordered=False
+            )
+
+        await notification_hub.publish_many([
+            new_event(n["user_id"], "notification", convert_objectid(n))
+            for n in notifications
+        ])
+        return notifications
+
+    async def create_notification(self, db, user_id: str, title: str, message: str, type: str, action_url: str = None) -> dict:
+        """Insert a single notification and push it"""
+        notification = self.build_notification(user_id, title, message, type, action_url)
+        await self.create_notifications(db, [notification])
+        return notification
+
+    async def get_notifications(
+        self,
+        db,
+        user_id: str,
+        unread_only: bool = False,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> dict:
+        """Newest-first page of notifications using keyset pagination"""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        query = {"user_id": user_id}
+        if unread_only:
+            query["is_read"] = False
+        if cursor:
+            created_at, object_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": object_id}}
+            ]
+
+        # Fetch one extra row to know whether another page exists
+        rows = await db["notifications"].find(query).sort(
+            [("created_at", -1), ("_id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+
+        page = rows[:limit]
+        return {
+            "notifications": [
+                {"id": str(n["_id"]), **{k: v for k, v in n.items() if k != "_id"}}
+                for n in page
+            ],
+            "next_cursor": encode_cursor(page[-1]) if len(rows) > limit else None
+        }
+
+    async def get_unread_count(self, db, user_id: str) -> int:
+        """Unread notifications from the denormalized counter"""
+        counter = await db[COUNTERS_COLLECTION].find_one({"_id": user_id})
+        return max(counter.get("unread", 0), 0) if counter else 0
+
+    async def mark_as_read(self, db, user_id: str, notification_id: str) -> bool:
+        """Mark one notification as read, decrementing the counter once"""
+        result = await db["notifications"].update_one(
+            {"_id": ObjectId(notification_id), "user_id": user_id, "is_read": False},
+            {"$set": {"is_read": True}}
+        )
+        if result.modified_count:
+            await db[COUNTERS_COLLECTION].update_one(
+                {"_id": user_id},
+                {"$inc": {"unread": -1}}
+            )
+        return bool(result.modified_count)
+
+    async def mark_all_as_read(self, db, user_id: str) -> int:
+        """Mark only the unread notifications as read"""
+        result = await db["notifications"].update_many(
+            {"user_id": user_id, "is_read": False},
+            {"$set": {"is_read": True}}
+        )
+        if result.modified_count:
+            # Subtract exactly what was marked so concurrent inserts still count
+            await db[COUNTERS_COLLECTION].update_one(
+                {"_id": user_id},
+                {"$inc": {"unread": -result.modified_count}}
+            )
+        return result.modified_count
+
+    async def archive_old_notifications(self, db, retention_days: int, batch_size: int = 1000) -> dict:
+        """Move notifications past the retention window to the archive
+
+        The archive has a TTL index, so old notifications eventually
+        expire instead of growing ``notifications`` without bound. Unread
+        counters are decremented for any unread notification archived.
+        """
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=retention_days)
+            archived = 0
+
+            while True:
+                batch = await db["notifications"].find(
+                    {"created_at": {"$lt": cutoff}}
+                ).limit(batch_size).to_list(batch_size)
+
+                if not batch:
+                    break
+
+                now = datetime.utcnow()
+                try:
+                    await db[ARCHIVE_COLLECTION].insert_many(
+                        [{**n, "archived_at": now} for n in batch],
+                        ordered=False
+                    )
+                except BulkWriteError as e:
+                    # Rows already archived by an interrupted run are fine
+                    if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                        raise
+
+                result = await db["notifications"].delete_many(
+                    {"_id": {"$in": [n["_id"] for n in batch]}}
+                )
+
+                unread = {}
+                for n in batch:
+                    if not n.get("is_read"):
+                        unread[n["user_id"]] = unread.get(n["user_id"], 0) + 1
+                if unread:
+                    await db[COUNTERS_COLLECTION].bulk_write(
+                        [
+                            UpdateOne({"_id": user_id}, {"$inc": {"unread": -count}})
+                            for user_id, count in unread.items()
+                        ],
+                        ordered=False
+                    )
+
+                archived += result.deleted_count
+                if len(batch) < batch_size:
+                    break
+
+            return {"success": True, "archived": archived}
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
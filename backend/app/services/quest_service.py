@@ -2,21 +2,7 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime
 from bson import ObjectId
 from app.utils.json_encoder import convert_objectid
-
-# In-memory storage for demo purposes (will be replaced with database later)
-IN_MEMORY_USERS = {
-    "demo_user": {
-        "username": "demo_user",
-        "total_xp": 0,
-        "level": 1,
-        "quests_completed": 0,
-        "current_streak": 0,
-        "longest_streak": 0,
-        "badges_earned": 0,
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat()
-    }
-}
+from app.services.user_state_cache import user_state_cache
 
 IN_MEMORY_QUESTS = [
     {
@@ -49,7 +35,7 @@ class QuestService:
     def __init__(self, db: AsyncIOMotorDatabase = None):
         self.db = db
         # Initialize collections (but we'll use in-memory for now)
-        if db:
+        if db is not None:
             self.quests_collection = db["quests"]
             self.user_quests_collection = db["user_quests"]
             self.tasks_collection = db["tasks"]
@@ -80,25 +66,6 @@ class QuestService:
                 return quest
         raise ValueError(f"Quest not found: {quest_id}")
 
-    async def start_quest(self, user_id: str, quest_id: str) -> dict:
-        """User starts a quest (in-memory version)"""
-        # Ensure user exists
-        if user_id not in IN_MEMORY_USERS:
-            IN_MEMORY_USERS[user_id] = {
-                "username": user_id,
-                "total_xp": 0,
-                "level": 1,
-                "quests_completed": 0,
-                "current_streak": 0,
-                "longest_streak": 0,
-                "badges_earned": 0,
-                "created_at": datetime.utcnow().isoformat(),
-                "updated_at": datetime.utcnow().isoformat()
-            }
-        
-        print(f"▶️ Starting quest {quest_id} for user {user_id}")
-        return {"quest_started": True, "quest_id": quest_id}
-
     async def get_quest_by_id(self, quest_id: str) -> dict:
         """Get quest by ID"""
         try:
@@ -180,7 +147,7 @@ class QuestService:
         return convert_objectid(task)
 
     async def complete_quest(self, user_id: str, quest_id: str) -> dict:
-        """Complete a quest and update user analytics (in-memory version)"""
+        """Complete a quest and update user analytics"""
         try:
             # Get quest details for XP calculation
             quest = await self.get_quest_by_id(quest_id)
@@ -194,41 +161,31 @@ class QuestService:
             }
             xp_reward = xp_rewards.get(difficulty, 50)
             
-            # Ensure user exists in memory
-            if user_id not in IN_MEMORY_USERS:
-                IN_MEMORY_USERS[user_id] = {
-                    "username": user_id,
-                    "total_xp": 0,
-                    "level": 1,
-                    "quests_completed": 0,
-                    "current_streak": 0,
-                    "longest_streak": 0,
-                    "badges_earned": 0,
-                    "created_at": datetime.utcnow().isoformat(),
-                    "updated_at": datetime.utcnow().isoformat()
-                }
+            # Increment in the database: cached state may be stale in this worker
+            user = await user_state_cache.update(self.db, user_id, inc={
+                "total_xp": xp_reward,
+                "quests_completed": 1,
+                "current_streak": 1
+            })
+            if user is None:
+                raise ValueError(f"User {user_id} not found")
             
-            # Update user analytics in memory
-            user = IN_MEMORY_USERS[user_id]
-            old_xp = user.get("total_xp", 0)
-            new_xp = old_xp + xp_reward
+            new_xp = user.get("total_xp", 0)
+            old_xp = new_xp - xp_reward
             old_level = (old_xp // 1000) + 1
             new_level = (new_xp // 1000) + 1
             level_up = new_level > old_level
             
-            quests_completed = user.get("quests_completed", 0) + 1
-            current_streak = user.get("current_streak", 0) + 1
+            quests_completed = user["quests_completed"]
+            current_streak = user["current_streak"]
             longest_streak = max(user.get("longest_streak", 0), current_streak)
             
-            # Update in-memory user data
-            IN_MEMORY_USERS[user_id].update({
-                "total_xp": new_xp,
-                "level": new_level,
-                "quests_completed": quests_completed,
-                "current_streak": current_streak,
-                "longest_streak": longest_streak,
-                "updated_at": datetime.utcnow().isoformat()
-            })
+            # Both only ever grow, so $max is safe against concurrent completions
+            if new_level > user.get("level", 1) or longest_streak > user.get("longest_streak", 0):
+                await user_state_cache.update(self.db, user_id, maximum={
+                    "level": new_level,
+                    "longest_streak": longest_streak
+                })
             
             print(f"🎯 Quest completed! User {user_id} earned {xp_reward} XP. Total: {new_xp}")
             
@@ -4,6 +4,10 @@ Manages quests, tasks, progress, and gamification
 """
 
 from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from app.services.analytics_service import AnalyticsService, daily_rollup_op
+from app.services.notification_hub import notification_hub, new_event
+from app.services.notification_digest import notification_digest
 
 class QuestSystemService:
     """Complete quest system management"""
@@ -601,6 +605,27 @@ git branch -d fix/issue-description
         """Get quests by category"""
         return [q for q in self.QUESTS if q["category"] == category]
     
+    def _new_progress(self, user_id: str, quest: dict) -> dict:
+        """Build a fresh progress record for a quest"""
+        return {
+            "user_id": user_id,
+            "quest_id": quest["id"],
+            "status": "in_progress",
+            "tasks_completed": 0,
+            "total_tasks": len(quest["tasks"]),
+            "xp_earned": 0,
+            "started_at": datetime.utcnow(),
+            "completed_at": None,
+            "task_progress": {
+                task["id"]: {
+                    "status": "pending",
+                    "completed_at": None,
+                    "xp_earned": 0
+                }
+                for task in quest["tasks"]
+            }
+        }
+    
     async def start_quest(self, db, user_id: str, quest_id: str):
         """Start a new quest"""
         try:
@@ -622,24 +647,7 @@ git branch -d fix/issue-description
                 }
             
             # Create progress record
-            progress = {
-                "user_id": user_id,
-                "quest_id": quest_id,
-                "status": "in_progress",
-                "tasks_completed": 0,
-                "total_tasks": len(quest["tasks"]),
-                "xp_earned": 0,
-                "started_at": datetime.utcnow(),
-                "completed_at": None,
-                "task_progress": {
-                    task["id"]: {
-                        "status": "pending",
-                        "completed_at": None,
-                        "xp_earned": 0
-                    }
-                    for task in quest["tasks"]
-                }
-            }
+            progress = self._new_progress(user_id, quest)
             
             result = await db["user_quest_progress"].insert_one(progress)
             
@@ -719,6 +727,22 @@ git branch -d fix/issue-description
                     }
                 )
             
+            # Daily rollup for progress charts
+            await AnalyticsService(db).record_daily_activity(
+                user_id,
+                xp=task["xp_reward"],
+                tasks=1,
+                quests=1 if quest_completed else 0
+            )
+            
+            await notification_hub.publish(user_id, "xp_awarded", {
+                "xp": task["xp_reward"],
+                "quest_id": quest_id,
+                "task_id": task_id,
+                "quest_completed": quest_completed
+            })
+            notification_digest.add(user_id, "xp", task["title"], xp=task["xp_reward"])
+            
             return {
                 "success": True,
                 "task_xp": task["xp_reward"],
@@ -731,6 +755,209 @@ git branch -d fix/issue-description
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    async def bulk_start_quests(self, db, enrollments: list):
+        """Start quests for many users in a single bulk write
+        
+        ``enrollments`` is a list of ``{"user_id", "quest_id"}`` dicts.
+        Already-started quests are left untouched.
+        """
+        try:
+            errors = []
+            operations = []
+            seen = set()
+            
+            for enrollment in enrollments:
+                user_id = enrollment["user_id"]
+                quest_id = enrollment["quest_id"]
+                
+                if (user_id, quest_id) in seen:
+                    continue
+                seen.add((user_id, quest_id))
+                
+                quest = await self.get_quest(quest_id)
+                if not quest:
+                    errors.append({
+                        "user_id": user_id,
+                        "quest_id": quest_id,
+                        "error": "Quest not found"
+                    })
+                    continue
+                
+                operations.append(UpdateOne(
+                    {"user_id": user_id, "quest_id": quest_id},
+                    {"$setOnInsert": self._new_progress(user_id, quest)},
+                    upsert=True
+                ))
+            
+            started = 0
+            if operations:
+                result = await db["user_quest_progress"].bulk_write(
+                    operations, ordered=False
+                )
+                started = result.upserted_count
+            
+            return {
+                "success": True,
+                "started": started,
+                "already_started": len(operations) - started,
+                "errors": errors
+            }
+        
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    async def bulk_complete_tasks(self, db, completions: list):
+        """Complete many tasks across users and quests in a few round trips
+        
+        ``completions`` is a list of ``{"user_id", "quest_id", "task_id"}``
+        dicts. Progress is read with one query, written with one
+        ``bulk_write`` and XP is awarded with one bulk update on ``users``.
+        Tasks that are already completed are reported but not re-awarded,
+        so an offline client can safely replay a sync.
+        """
+        try:
+            results = []
+            pending = []
+            seen = set()
+            
+            for completion in completions:
+                key = (completion["user_id"], completion["quest_id"], completion["task_id"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                
+                user_id, quest_id, task_id = key
+                entry = {"user_id": user_id, "quest_id": quest_id, "task_id": task_id}
+                
+                quest = await self.get_quest(quest_id)
+                if not quest:
+                    results.append({**entry, "status": "error", "error": "Quest not found"})
+                    continue
+                
+                task = next((t for t in quest["tasks"] if t["id"] == task_id), None)
+                if not task:
+                    results.append({**entry, "status": "error", "error": "Task not found"})
+                    continue
+                
+                pending.append((entry, quest, task))
+            
+            # Load every affected progress document at once
+            pairs = {(e["user_id"], e["quest_id"]) for e, _, _ in pending}
+            progress_docs = {}
+            if pairs:
+                cursor = db["user_quest_progress"].find({
+                    "$or": [{"user_id": u, "quest_id": q} for u, q in pairs]
+                })
+                async for doc in cursor:
+                    progress_docs[(doc["user_id"], doc["quest_id"])] = doc
+            
+            now = datetime.utcnow()
+            progress_updates = {}
+            xp_by_user = {}
+            tasks_by_user = {}
+            completed_tasks = []
+            
+            for entry, quest, task in pending:
+                pair = (entry["user_id"], entry["quest_id"])
+                progress = progress_docs.get(pair)
+                if not progress:
+                    results.append({**entry, "status": "error", "error": "Quest not started"})
+                    continue
+                
+                task_progress = progress.setdefault("task_progress", {})
+                task_state = task_progress.setdefault(task["id"], {})
+                if task_state.get("status") == "completed":
+                    results.append({**entry, "status": "already_completed", "task_xp": 0})
+                    continue
+                
+                task_state.update({
+                    "status": "completed",
+                    "completed_at": now,
+                    "xp_earned": task["xp_reward"]
+                })
+                
+                update = progress_updates.setdefault(pair, {})
+                update[f"task_progress.{task['id']}.status"] = "completed"
+                update[f"task_progress.{task['id']}.completed_at"] = now
+                update[f"task_progress.{task['id']}.xp_earned"] = task["xp_reward"]
+                
+                xp_by_user[entry["user_id"]] = xp_by_user.get(entry["user_id"], 0) + task["xp_reward"]
+                tasks_by_user[entry["user_id"]] = tasks_by_user.get(entry["user_id"], 0) + 1
+                results.append({**entry, "status": "completed", "task_xp": task["xp_reward"]})
+                completed_tasks.append((entry["user_id"], task))
+            
+            # Fold quest completion into the same update as the tasks
+            completed_quests = []
+            for pair, update in progress_updates.items():
+                progress = progress_docs[pair]
+                quest = await self.get_quest(pair[1])
+                task_states = progress["task_progress"].values()
+                completed = sum(1 for t in task_states if t.get("status") == "completed")
+                
+                if completed == len(quest["tasks"]):
+                    update["status"] = "completed"
+                    update["completed_at"] = now
+                    update["xp_earned"] = sum(t.get("xp_earned", 0) for t in task_states)
+                    completed_quests.append({"user_id": pair[0], "quest_id": pair[1]})
+            
+            if progress_updates:
+                await db["user_quest_progress"].bulk_write(
+                    [
+                        UpdateOne({"user_id": u, "quest_id": q}, {"$set": update})
+                        for (u, q), update in progress_updates.items()
+                    ],
+                    ordered=False
+                )
+            
+            if xp_by_user:
+                await db["users"].bulk_write(
+                    [
+                        UpdateOne({"_id": user_id}, {"$inc": {"total_xp": xp}})
+                        for user_id, xp in xp_by_user.items()
+                    ],
+                    ordered=False
+                )
+                
+                # Daily rollups for progress charts
+                quests_by_user = {}
+                for quest in completed_quests:
+                    quests_by_user[quest["user_id"]] = quests_by_user.get(quest["user_id"], 0) + 1
+                
+                await db["user_daily_stats"].bulk_write(
+                    [
+                        daily_rollup_op(
+                            user_id,
+                            xp=xp,
+                            tasks=tasks_by_user[user_id],
+                            quests=quests_by_user.get(user_id, 0),
+                            when=now
+                        )
+                        for user_id, xp in xp_by_user.items()
+                    ],
+                    ordered=False
+                )
+                
+                await notification_hub.publish_many([
+                    new_event(user_id, "xp_awarded", {
+                        "xp": xp,
+                        "tasks": tasks_by_user[user_id],
+                        "quests_completed": quests_by_user.get(user_id, 0)
+                    })
+                    for user_id, xp in xp_by_user.items()
+                ])
+                for user_id, task in completed_tasks:
+                    notification_digest.add(user_id, "xp", task["title"], xp=task["xp_reward"])
+            
+            return {
+                "success": True,
+                "results": results,
+                "completed_quests": completed_quests,
+                "xp_by_user": xp_by_user
+            }
+        
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
     async def get_user_quest_progress(self, db, user_id: str, quest_id: str):
         """Get user's progress on specific quest"""
         try:
@@ -0,0 +1,251 @@
+"""
+Repository Review
+Reviews many files at once on a process pool and merges the results
+"""
+
+import asyncio
+import io
+import os
+import posixpath
+import tarfile
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from app.core.config import settings
+
+LANGUAGES = {
+    ".py": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".mjs": "javascript",
+    ".ts": "javascript",
+    ".tsx": "javascript",
+    ".java": "java",
+    ".cpp": "cpp",
+    ".cc": "cpp",
+    ".cxx": "cpp",
+    ".hpp": "cpp",
+    ".h": "cpp",
+}
+
+SKIPPED_DIRS = {"node_modules", ".git", "__pycache__", "venv", ".venv", "dist", "build"}
+
+
+class ArchiveError(ValueError):
+    """Raised for unreadable or over-budget archives"""
+
+
+# Corrupt or truncated archives surface as any of these, even mid-read
+ARCHIVE_ERRORS = (zipfile.BadZipFile, tarfile.TarError, OSError, EOFError, zlib.error)
+
+
+def detect_language(path: str) -> Optional[str]:
+    return LANGUAGES.get(posixpath.splitext(path)[1].lower())
+
+
+def _wanted(path: str) -> bool:
+    parts = path.split("/")
+    return not SKIPPED_DIRS.intersection(parts[:-1]) and detect_language(path) is not None
+
+
+def _decode(data: bytes) -> Optional[str]:
+    if b"\0" in data[:1024]:
+        return None  # binary
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def _members(data: bytes) -> Iterator[Tuple[str, int, Callable[[], bytes]]]:
+    """Yield ``(name, declared size, read)`` for each file, one header at a time
+
+    Tar members are read lazily: the stream is only decompressed as far as
+    the member being looked at, never past members the caller stops at.
+    """
+    if zipfile.is_zipfile(io.BytesIO(data)):
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        for info in archive.infolist():
+            if not info.is_dir():
+                yield info.filename, info.file_size, lambda info=info: archive.read(info)
+    else:
+        archive = tarfile.open(fileobj=io.BytesIO(data), mode="r:*")
+        for info in archive:
+            if info.isfile():
+                yield info.name, info.size, lambda info=info: archive.extractfile(info).read()
+
+
+def extract_archive(
+    data: bytes,
+    filename: str,
+    max_files: int = 500,
+    max_file_bytes: int = 512 * 1024,
+    max_total_bytes: int = 32 * 1024 * 1024,
+    max_declared_bytes: int = 128 * 1024 * 1024
+) -> List[Tuple[str, str]]:
+    """Return ``(path, source)`` for the reviewable files of a zip or tar archive
+
+    Sizes are checked against the archive's headers before anything is
+    decompressed, so an archive bomb is rejected rather than expanded.
+    ``max_declared_bytes`` caps the declared size of every member,
+    skipped ones included, since moving past a tar member still means
+    decompressing it. Oversized, binary and non-source files are skipped.
+    CPU-bound: call it off the event loop.
+    """
+    files = []
+    total = 0
+    declared = 0
+    try:
+        for name, size, read in _members(data):
+            declared += size
+            if declared > max_declared_bytes:
+                raise ArchiveError(f"Archive expands to more than {max_declared_bytes // (1024 * 1024)} MB")
+            path = posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+            if not _wanted(path) or size > max_file_bytes:
+                continue
+            if len(files) >= max_files:
+                raise ArchiveError(f"Archive has more than {max_files} source files")
+            total += size
+            if total > max_total_bytes:
+                raise ArchiveError(f"Archive expands to more than {max_total_bytes // (1024 * 1024)} MB of source")
+            source = _decode(read())
+            if source is not None:
+                files.append((path, source))
+    except ARCHIVE_ERRORS as e:
+        raise ArchiveError(f"Could not read archive {filename}: {e}")
+    return files
+
+
+def review_file(path: str, code: str, language: str) -> dict:
+    """Run the rule-based analyzers on one file (executes in a worker process)"""
+    from app.api.v1.code_review import analyze_code_quality
+
+    result = analyze_code_quality(code, language).model_dump()
+    result.pop("corrected_code", None)
+    result.update({"path": path, "language": language, "lines": code.count("\n") + 1})
+    return result
+
+
+def aggregate_report(results: List[dict], skipped: List[dict]) -> dict:
+    """Merge per-file results into one repository report"""
+    by_severity: Dict[str, int] = {}
+    by_type: Dict[str, int] = {}
+    by_language: Dict[str, int] = {}
+    total_lines = 0
+    weighted_score = 0
+
+    for result in results:
+        total_lines += result["lines"]
+        weighted_score += result["score"] * result["lines"]
+        by_language[result["language"]] = by_language.get(result["language"], 0) + 1
+        for suggestion in result["suggestions"]:
+            by_severity[suggestion["severity"]] = by_severity.get(suggestion["severity"], 0) + 1
+            by_type[suggestion["type"]] = by_type.get(suggestion["type"], 0) + 1
+
+    worst = sorted(results, key=lambda r: r["score"])[:5]
+    return {
+        "files_reviewed": len(results),
+        "files_skipped": len(skipped),
+        "total_lines": total_lines,
+        "score": round(weighted_score / total_lines) if total_lines else 0,
+        "suggestions": sum(by_severity.values()),
+        "by_severity": by_severity,
+        "by_type": by_type,
+        "by_language": by_language,
+        "lowest_scoring": [{"path": r["path"], "score": r["score"]} for r in worst],
+        "skipped": skipped
+    }
+
+
+class RepositoryReviewer:
+    """Fan files out across a process pool and stream results as they finish
+
+    The analyzers are CPU-bound pure Python, so processes (not threads)
+    give real parallelism. At most ``memory_budget_bytes`` of source is in
+    flight at once; further files wait until earlier ones finish.
+    """
+
+    def __init__(self, workers: int = 0, memory_budget_bytes: int = 64 * 1024 * 1024):
+        self.workers = workers or os.cpu_count() or 2
+        self.memory_budget_bytes = memory_budget_bytes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.files_reviewed = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def review(self, files: Iterable[Tuple[str, str]]) -> AsyncIterator[dict]:
+        """Yield a ``file`` event per reviewed file, then a ``summary`` event"""
+        loop = asyncio.get_running_loop()
+        reviewable = []
+        skipped = []
+        for path, code in files:
+            language = detect_language(path)
+            if language is None:
+                skipped.append({"path": path, "reason": "unsupported language"})
+            elif not code.strip():
+                skipped.append({"path": path, "reason": "empty file"})
+            else:
+                reviewable.append((path, code, language))
+
+        total = len(reviewable)
+        results = []
+        pending = {}
+        in_flight = 0
+        completed = 0
+
+        async def finished():
+            nonlocal in_flight, completed
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            events = []
+            for future in done:
+                path, size = pending.pop(future)
+                in_flight -= size
+                completed += 1
+                try:
+                    result = future.result()
+                except Exception as e:
+                    skipped.append({"path": path, "reason": f"analysis failed: {e}"})
+                    continue
+                results.append(result)
+                events.append({"event": "file", "completed": completed, "total": total, "result": result})
+            return events
+
+        try:
+            for path, code, language in reviewable:
+                size = len(code)
+                while pending and in_flight + size > self.memory_budget_bytes:
+                    for event in await finished():
+                        yield event
+                future = loop.run_in_executor(self._pool(), review_file, path, code, language)
+                pending[future] = (path, size)
+                in_flight += size
+
+            while pending:
+                for event in await finished():
+                    yield event
+        finally:
+            # Client went away: drop files that have not started yet
+            for future in pending:
+                future.cancel()
+
+        self.files_reviewed += len(results)
+        results.sort(key=lambda r: r["path"])
+        yield {"event": "summary", "report": aggregate_report(results, skipped)}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "files_reviewed": self.files_reviewed}
+
+
+repository_reviewer = RepositoryReviewer(
+    workers=settings.REVIEW_WORKERS,
+    memory_budget_bytes=settings.REVIEW_MEMORY_BUDGET_MB * 1024 * 1024
+)
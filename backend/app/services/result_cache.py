@@ -0,0 +1,62 @@
+"""
+Result Cache
+Reuses evaluation and review results for identical code on the same task
+"""
+
+from datetime import datetime
+from typing import Optional
+from pymongo.errors import DuplicateKeyError
+
+COLLECTION = "evaluation_results"
+
+
+class ResultCache:
+    """Results keyed by (kind, content hash, task id, evaluator version)
+
+    ``kind`` separates test evaluations from AI reviews. The evaluator
+    version is part of the key, so changing the harness, a task's tests or
+    the review prompt simply stops matching old entries (which then expire
+    through the TTL index on ``created_at``).
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(kind: str, code_hash: str, task_id: str, version: str) -> str:
+        return f"{kind}:{code_hash}:{task_id}:{version}"
+
+    async def get(self, db, kind: str, code_hash: str, task_id: str, version: str) -> Optional[dict]:
+        entry = await db[COLLECTION].find_one_and_update(
+            {"_id": self.key(kind, code_hash, task_id, version)},
+            {"$inc": {"hits": 1}, "$set": {"last_hit_at": datetime.utcnow()}},
+            projection={"result": 1}
+        )
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["result"]
+
+    async def put(self, db, kind: str, code_hash: str, task_id: str, version: str, result: dict) -> None:
+        """Store a result; the first writer wins for concurrent duplicates"""
+        try:
+            await db[COLLECTION].insert_one({
+                "_id": self.key(kind, code_hash, task_id, version),
+                "kind": kind,
+                "content_hash": code_hash,
+                "task_id": task_id,
+                "evaluator_version": version,
+                "result": result,
+                "hits": 0,
+                "created_at": datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            pass
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+result_cache = ResultCache()
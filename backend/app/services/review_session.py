@@ -0,0 +1,376 @@
+"""
+Review Sessions
+Incremental as-you-type code review for the editor
+
+A session keeps the document and its findings between edits. An edit
+replaces a range of lines; only those lines (plus a little context for
+look-ahead checks) go back through the line analyzers, and for Python only
+the top-level statements around the edit are re-parsed. Each update
+returns a diff of findings against the previous version.
+"""
+
+import ast
+import secrets
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.api.v1.code_review import (
+    PythonAnalyzer,
+    analyze_cpp,
+    analyze_general_patterns,
+    analyze_java,
+    analyze_javascript,
+)
+from app.core.config import settings
+
+# Language checks that look at one line at a time; the code argument is
+# only used for their whole-file checks
+LINE_ANALYZERS = {
+    "javascript": analyze_javascript,
+    "java": analyze_java,
+    "cpp": analyze_cpp,
+}
+
+# Java's empty-catch check looks up to this many lines ahead
+CONTEXT_LINES = 3
+
+
+class SessionConflict(ValueError):
+    """Raised when an edit targets a stale version of the document"""
+
+
+def _key(finding: dict) -> tuple:
+    return (finding["type"], finding["severity"], finding["message"])
+
+
+class ReviewSession:
+    """Document plus cached per-line and per-statement findings"""
+
+    def __init__(self, session_id: str, code: str, language: str):
+        self.id = session_id
+        self.language = language.lower()
+        self.lines = code.split("\n")
+        self.version = 0
+        self.touched_at = time.monotonic()
+        self._line_findings: List[List[dict]] = [[] for _ in self.lines]
+        self._blocks: List[dict] = []  # Python top-level statements: start, end, findings, functions
+        self._syntax_error: Optional[dict] = None
+        self._ids: List[Tuple[Optional[int], tuple, str]] = []
+        self._next_id = 0
+
+        self._check_lines(1, len(self.lines))
+        if self.language == "python":
+            self._parse_region(1, len(self.lines), full=True)
+        self._ids = [(line, key, self._new_id()) for line, key, _ in self._current()]
+
+    def _new_id(self) -> str:
+        self._next_id += 1
+        return f"f{self._next_id}"
+
+    # Line-level checks
+
+    def _check_lines(self, first: int, last: int) -> None:
+        """Re-run the line analyzers on lines ``first``..``last`` (1-based)"""
+        first = max(1, first)
+        last = min(len(self.lines), last)
+        if last < first:
+            return
+
+        # Feed a little trailing context for look-ahead checks, keep only hits in range
+        window = self.lines[first - 1:min(len(self.lines), last + CONTEXT_LINES)]
+        suggestions = analyze_general_patterns("", window)
+        analyzer = LINE_ANALYZERS.get(self.language)
+        if analyzer:
+            suggestions = suggestions + analyzer("", window)
+
+        for line in range(first, last + 1):
+            self._line_findings[line - 1] = []
+        for suggestion in suggestions:
+            if suggestion.line is None or first + suggestion.line - 1 > last:
+                continue
+            finding = suggestion.model_dump()
+            del finding["line"]
+            self._line_findings[first + suggestion.line - 2].append(finding)
+
+    # Python statement-level checks
+
+    def _parse_region(self, first: int, last: int, full: bool = False) -> bool:
+        """Re-analyze the top-level statements in lines ``first``..``last``"""
+        source = "\n".join(self.lines[first - 1:last])
+        try:
+            tree = ast.parse(source)
+        except SyntaxError as e:
+            if full:
+                self._syntax_error = {
+                    "type": "bug",
+                    "severity": "high",
+                    "line": min(last, first + (e.lineno or 1) - 1),
+                    "message": f"Syntax error: {e.msg}",
+                    "suggestion": "Fix the syntax error so the code can run",
+                    "corrected_code": None
+                }
+            return False
+
+        offset = first - 1
+        blocks = []
+        for node in tree.body:
+            analyzer = PythonAnalyzer()
+            analyzer.visit(node)
+            start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+            functions = [
+                f.model_copy(update={"line": f.line + offset}) for f in analyzer.functions
+            ]
+            findings = [
+                {**s.model_dump(), "line": s.line + offset}
+                for s in analyzer.suggestions + PythonAnalyzer.function_suggestions(functions)
+            ]
+            blocks.append({
+                "start": start + offset,
+                "end": node.end_lineno + offset,
+                "findings": findings,
+                "functions": functions
+            })
+
+        self._blocks = [b for b in self._blocks if b["end"] < first or b["start"] > last] + blocks
+        self._blocks.sort(key=lambda b: b["start"])
+        if full:
+            self._syntax_error = None
+        return True
+
+    def _shift_blocks(self, after: int, delta: int) -> None:
+        """Move statement findings below line ``after`` by ``delta`` lines"""
+        if not delta:
+            return
+        for block in self._blocks:
+            if block["start"] > after:
+                block["start"] += delta
+                block["end"] += delta
+                for finding in block["findings"]:
+                    finding["line"] += delta
+                block["functions"] = [
+                    f.model_copy(update={"line": f.line + delta}) for f in block["functions"]
+                ]
+        if self._syntax_error and self._syntax_error["line"] > after:
+            self._syntax_error["line"] = max(1, self._syntax_error["line"] + delta)
+
+    def _reparse_python(self, start: int, end: int) -> None:
+        """Re-parse the statements around an edit of lines ``start``..``end``
+
+        The region runs from the first statement the edit touched or that
+        ends just above it (so a new ``else:`` or function body line joins
+        its statement, and a statement that lost lines is checked again),
+        taking in any lines left over from statements the edit cut through,
+        up to the next untouched statement. Falls back to the whole document,
+        which is also re-parsed on every edit while it has a syntax error.
+        """
+        if self._syntax_error is None:
+            before = [b for b in self._blocks if b["start"] <= start]
+            touched = [b for b in before if b["end"] >= start - 1]
+            first = (touched or before)[0]["start"] if before else start
+            earlier = [b for b in self._blocks if b["end"] < first]
+            first = earlier[-1]["end"] + 1 if earlier else 1
+            after = [b for b in self._blocks if b["start"] > end]
+            last = after[0]["start"] - 1 if after else len(self.lines)
+            if self._parse_region(first, last):
+                return
+
+        if not self._parse_region(1, len(self.lines), full=True):
+            # Drop statements touching the edit until the code parses again
+            self._blocks = [b for b in self._blocks if b["end"] < start - 1 or b["start"] > end]
+
+    # Editing
+
+    def apply_edit(self, start_line: int, end_line: int, lines: List[str], positions: List[Optional[int]]) -> None:
+        """Replace lines ``start_line``..``end_line`` (1-based, inclusive) with ``lines``
+
+        ``end_line = start_line - 1`` inserts before ``start_line``.
+        ``positions`` maps each original line to its current line and is
+        updated in place.
+        """
+        if not 1 <= start_line <= len(self.lines) + 1 or not start_line - 1 <= end_line <= len(self.lines):
+            raise ValueError(f"Edit range {start_line}-{end_line} is outside the document")
+
+        delta = len(lines) - (end_line - start_line + 1)
+        self.lines[start_line - 1:end_line] = lines
+        self._line_findings[start_line - 1:end_line] = [[] for _ in lines]
+        if not self.lines:
+            self.lines = [""]
+            self._line_findings = [[]]
+
+        for i, line in enumerate(positions):
+            if line is None or line < start_line:
+                continue
+            positions[i] = None if line <= end_line else line + delta
+
+        new_end = start_line + len(lines) - 1
+        self._check_lines(start_line - CONTEXT_LINES, new_end)
+
+        if self.language == "python":
+            def contains(block):
+                # Statements the edit lands inside (rather than replaces outright);
+                # insertions only count strictly after the first line
+                if (block["start"], block["end"]) == (start_line, end_line):
+                    return False
+                return block["start"] <= start_line and block["end"] >= end_line and (
+                    end_line >= start_line or block["start"] < start_line
+                )
+
+            self._blocks = [
+                b for b in self._blocks
+                if b["end"] < start_line or b["start"] > end_line or contains(b)
+            ]
+            for block in self._blocks:
+                if contains(block):
+                    block["end"] = max(block["start"], block["end"] + delta)
+            self._shift_blocks(end_line, delta)
+            self._reparse_python(start_line, max(start_line, new_end))
+
+    def _current(self) -> List[Tuple[Optional[int], tuple, dict]]:
+        """All findings as ``(line, key, finding)``"""
+        findings = []
+        for i, line_findings in enumerate(self._line_findings, 1):
+            for finding in line_findings:
+                findings.append((i, _key(finding), {**finding, "line": i}))
+
+        if self.language == "python":
+            functions = [f for block in self._blocks for f in block["functions"]]
+            statement_findings = [f for block in self._blocks for f in block["findings"]]
+            statement_findings += [s.model_dump() for s in PythonAnalyzer.docstring_suggestions(functions)]
+            if self._syntax_error:
+                statement_findings.append(self._syntax_error)
+            for finding in statement_findings:
+                findings.append((finding["line"], _key(finding), dict(finding)))
+        else:
+            analyzer = LINE_ANALYZERS.get(self.language)
+            if analyzer:
+                # Whole-file checks only (no lines)
+                for suggestion in analyzer("\n".join(self.lines), []):
+                    finding = suggestion.model_dump()
+                    findings.append((None, _key(finding), finding))
+
+        findings.sort(key=lambda f: (f[0] or 0))
+        return findings
+
+    def update(self, edits: List[dict], version: int) -> dict:
+        """Apply edits made against ``version`` and return the finding diff"""
+        if version != self.version:
+            raise SessionConflict(f"Session is at version {self.version}, edits are for {version}")
+
+        # Check every range up front so a bad batch leaves the session untouched
+        length = len(self.lines)
+        for edit in edits:
+            start_line, end_line = edit["start_line"], edit["end_line"]
+            if not 1 <= start_line <= length + 1 or not start_line - 1 <= end_line <= length:
+                raise ValueError(f"Edit range {start_line}-{end_line} is outside the document")
+            length = max(1, length + len(edit["lines"]) - (end_line - start_line + 1))
+
+        started = time.perf_counter()
+        positions: List[Optional[int]] = list(range(len(self.lines) + 1))
+        for edit in edits:
+            self.apply_edit(edit["start_line"], edit["end_line"], edit["lines"], positions)
+        self.version += 1
+        self.touched_at = time.monotonic()
+
+        # Match findings to the previous ones at their shifted lines to keep ids stable
+        previous: Dict[tuple, List[str]] = {}
+        previous_lines = {}
+        for line, key, finding_id in self._ids:
+            shifted = positions[line] if line is not None and line < len(positions) else None
+            previous_lines[finding_id] = line
+            if line is None or shifted is not None:
+                previous.setdefault((shifted, key), []).append(finding_id)
+
+        added = []
+        moved = []
+        ids = []
+        kept = set()
+        for line, key, finding in self._current():
+            matches = previous.get((line, key))
+            if matches:
+                finding_id = matches.pop()
+                kept.add(finding_id)
+                if previous_lines[finding_id] != line:
+                    moved.append({"id": finding_id, "line": line})
+            else:
+                finding_id = self._new_id()
+                added.append({"id": finding_id, **finding})
+            ids.append((line, key, finding_id))
+
+        removed = [finding_id for _, _, finding_id in self._ids if finding_id not in kept]
+        self._ids = ids
+        return {
+            "session_id": self.id,
+            "version": self.version,
+            "added": added,
+            "removed": removed,
+            "moved": moved,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def snapshot(self) -> dict:
+        """Full finding list for the current version"""
+        findings = self._current()
+        return {
+            "session_id": self.id,
+            "version": self.version,
+            "findings": [
+                {"id": finding_id, **finding}
+                for (_, _, finding), (_, _, finding_id) in zip(findings, self._ids)
+            ]
+        }
+
+
+class ReviewSessionStore:
+    """In-memory LRU of review sessions with an idle timeout
+
+    Sessions are per process, so a multi-worker deployment needs sticky
+    routing for the session endpoints.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 1800, max_lines: int = 5000):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_lines = max_lines
+        self._sessions: "OrderedDict[str, ReviewSession]" = OrderedDict()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.touched_at < self.ttl_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+    def create(self, code: str, language: str) -> ReviewSession:
+        if code.count("\n") + 1 > self.max_lines:
+            raise ValueError(f"Review sessions support at most {self.max_lines} lines")
+        session = ReviewSession(secrets.token_urlsafe(16), code, language)
+        self._sessions[session.id] = session
+        self._expire()
+        return session
+
+    def get(self, session_id: str) -> Optional[ReviewSession]:
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def update(self, session: ReviewSession, edits: List[dict], version: int) -> dict:
+        added_lines = sum(len(edit["lines"]) - (edit["end_line"] - edit["start_line"] + 1) for edit in edits)
+        if len(session.lines) + added_lines > self.max_lines:
+            raise ValueError(f"Review sessions support at most {self.max_lines} lines")
+        return session.update(edits, version)
+
+    def close(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._sessions)}
+
+
+review_sessions = ReviewSessionStore(
+    max_sessions=settings.REVIEW_SESSION_MAX,
+    ttl_seconds=settings.REVIEW_SESSION_TTL_SECONDS,
+    max_lines=settings.REVIEW_SESSION_MAX_LINES
+)
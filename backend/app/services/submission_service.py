@@ -1,6 +1,11 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from datetime import datetime
+from app.services.analytics_service import AnalyticsService
+from app.services.code_runner import code_runner, HARNESS_VERSION
+from app.services.code_storage import code_store, CODE_FIELDS
+from app.services.result_cache import result_cache
+from app.utils.code_hash import content_hash, spec_hash
 
 class SubmissionService:
     def __init__(self, db: AsyncIOMotorDatabase):
@@ -10,12 +15,20 @@ class SubmissionService:
         self.tasks_collection = db["tasks"]
 
     async def create_submission(self, user_id: str, task_id: str, code: str, language: str) -> dict:
-        """Create code submission"""
+        """Create code submission
+
+        Resubmitting code identical to one of the user's earlier submissions
+        for the task stores a reference to it instead of another copy of the
+        code, and reuses its evaluation. Other attempts are stored compressed
+        (see ``code_storage``).
+        """
         try:
+            code_hash = content_hash(code, language)
             submission = {
                 "user_id": user_id,
                 "task_id": task_id,
                 "code": code,
+                "content_hash": code_hash,
                 "language": language,
                 "status": "pending",
                 "test_results": None,
@@ -25,8 +38,39 @@ class SubmissionService:
                 "updated_at": datetime.utcnow(),
             }
             
+            original = await self.submissions_collection.find_one(
+                {
+                    "user_id": user_id,
+                    "task_id": task_id,
+                    "content_hash": code_hash,
+                    "duplicate_of": {"$exists": False}
+                },
+                {"status": 1, "test_results": 1},
+                sort=[("created_at", -1)]
+            )
+            del submission["code"]
+            if original:
+                submission["duplicate_of"] = str(original["_id"])
+                if original.get("status") in ("passed", "failed"):
+                    # XP was settled on the original
+                    submission["status"] = original["status"]
+                    submission["test_results"] = original.get("test_results")
+            else:
+                # Delta-encode against the previous attempt at the task
+                previous = await self.submissions_collection.find_one(
+                    {"user_id": user_id, "task_id": task_id, "duplicate_of": {"$exists": False}},
+                    {"code": 1, "code_storage": 1},
+                    sort=[("created_at", -1), ("_id", -1)]
+                )
+                submission["code_storage"] = await code_store.encode(
+                    self.db, "submissions", code, previous
+                )
+            
             result = await self.submissions_collection.insert_one(submission)
-            return {"submission_id": str(result.inserted_id), "status": "pending"}
+            response = {"submission_id": str(result.inserted_id), "status": submission["status"]}
+            if original:
+                response["duplicate_of"] = submission["duplicate_of"]
+            return response
         except Exception as e:
             raise ValueError(f"Error creating submission: {str(e)}")
 
@@ -40,18 +84,19 @@ class SubmissionService:
             if not submission:
                 raise ValueError("Submission not found")
             
-            return self._format_submission(submission)
+            submission["code"] = await code_store.load(self.db, "submissions", submission)
+            return self._format_submission(submission, include_code=True)
         except Exception as e:
             raise ValueError(f"Error fetching submission: {str(e)}")
 
     async def get_user_submissions(self, user_id: str, task_id: str = None, limit: int = 50) -> list:
-        """Get user's submissions"""
+        """Get user's submissions (metadata only; fetch one for its code)"""
         try:
             query = {"user_id": user_id}
             if task_id:
                 query["task_id"] = task_id
             
-            submissions = await self.submissions_collection.find(query).sort(
+            submissions = await self.submissions_collection.find(query, CODE_FIELDS).sort(
                 "created_at", -1
             ).limit(limit).to_list(limit)
             
@@ -59,8 +104,13 @@ class SubmissionService:
         except Exception as e:
             raise ValueError(f"Error fetching submissions: {str(e)}")
 
-    async def evaluate_submission(self, submission_id: str) -> dict:
-        """Evaluate submission and run tests"""
+    async def evaluate_submission(self, submission_id: str, cached_only: bool = False) -> dict:
+        """Evaluate submission and run tests
+
+        Results are cached by (code hash, task, evaluator version), so
+        identical code is only run once. With ``cached_only`` a cache miss
+        returns None instead of running the tests.
+        """
         try:
             submission = await self.submissions_collection.find_one({
                 "_id": ObjectId(submission_id)
@@ -69,29 +119,52 @@ class SubmissionService:
             if not submission:
                 raise ValueError("Submission not found")
             
-            # Run code validation (mock for now)
-            test_results = self._run_tests(submission["code"], submission["language"])
+            test_spec = await self._get_test_spec(submission["task_id"])
+            code = await code_store.load(self.db, "submissions", submission)
+            # Hash the code itself: older submissions stored a looser hash
+            code_hash = content_hash(code or "", submission["language"])
+            version = f"{HARNESS_VERSION}:{spec_hash(test_spec)}"
+            test_results = await result_cache.get(
+                self.db, "tests", code_hash, submission["task_id"], version
+            )
+            
+            if test_results is None:
+                if cached_only:
+                    return None
+                
+                # Run the task's tests in the sandbox
+                test_results = await self._run_tests(code, submission["language"], test_spec)
+                if not test_results.get("error"):
+                    # Timeouts and sandbox failures may be transient
+                    await result_cache.put(
+                        self.db, "tests", code_hash, submission["task_id"], version, test_results
+                    )
             
             status = "passed" if test_results.get("all_passed") else "failed"
             xp_awarded = 50 if status == "passed" else 0
             
-            # Update submission
-            await self.submissions_collection.update_one(
+            # Update submission; XP is only awarded on the first pass so a
+            # retried or repeated evaluation cannot award it twice
+            previous = await self.submissions_collection.find_one_and_update(
                 {"_id": ObjectId(submission_id)},
                 {"$set": {
                     "status": status,
                     "test_results": test_results,
                     "xp_awarded": xp_awarded,
                     "updated_at": datetime.utcnow()
-                }}
+                }},
+                projection={"status": 1}
             )
             
             # Award XP if passed
-            if status == "passed" and xp_awarded > 0:
+            if status == "passed" and xp_awarded > 0 and previous.get("status") != "passed":
                 await self.users_collection.update_one(
                     {"_id": ObjectId(submission["user_id"])},
                     {"$inc": {"total_xp": xp_awarded}}
                 )
+                await AnalyticsService(self.db).record_daily_activity(
+                    str(submission["user_id"]), xp=xp_awarded, tasks=1
+                )
             
             return {
                 "status": status,
@@ -101,33 +174,35 @@ class SubmissionService:
         except Exception as e:
             raise ValueError(f"Error evaluating submission: {str(e)}")
 
-    def _run_tests(self, code: str, language: str) -> dict:
-        """Run tests on code (mock implementation)"""
-        # Mock test results
-        return {
-            "total_tests": 5,
-            "passed": 5,
-            "failed": 0,
-            "all_passed": True,
-            "test_cases": [
-                {"name": "Test 1", "status": "passed"},
-                {"name": "Test 2", "status": "passed"},
-                {"name": "Test 3", "status": "passed"},
-                {"name": "Test 4", "status": "passed"},
-                {"name": "Test 5", "status": "passed"},
-            ]
-        }
+    async def _get_test_spec(self, task_id: str) -> dict:
+        """Load the task's test spec (``test_cases``), if it has one"""
+        query = {"_id": ObjectId(task_id)} if ObjectId.is_valid(task_id) else {"id": task_id}
+        task = await self.tasks_collection.find_one(query, {"test_cases": 1})
+        return task.get("test_cases") if task else None
+
+    async def _run_tests(self, code: str, language: str, test_spec: dict = None) -> dict:
+        """Run tests on code in a sandboxed subprocess"""
+        return await code_runner.run(code, language, test_spec)
+
+    @staticmethod
+    async def evaluate_job(db, job: dict, report_progress) -> dict:
+        """Job handler: evaluate a queued submission"""
+        await report_progress(10, "Running tests")
+        return await SubmissionService(db).evaluate_submission(job["payload"]["submission_id"])
 
-    def _format_submission(self, submission: dict) -> dict:
+    def _format_submission(self, submission: dict, include_code: bool = False) -> dict:
         """Format submission response"""
-        return {
+        formatted = {
             "id": str(submission.get("_id")),
             "user_id": submission.get("user_id"),
             "task_id": submission.get("task_id"),
-            "code": submission.get("code"),
             "language": submission.get("language"),
             "status": submission.get("status"),
             "test_results": submission.get("test_results"),
             "xp_awarded": submission.get("xp_awarded"),
+            "duplicate_of": submission.get("duplicate_of"),
             "created_at": submission.get("created_at"),
         }
+        if include_code:
+            formatted["code"] = submission.get("code")
+        return formatted
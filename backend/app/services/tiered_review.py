@@ -0,0 +1,128 @@
+"""
+Tiered Code Review
+Runs the local analyzers on every review and calls Gemini only when needed
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Dict, List
+from app.core.config import settings
+
+# Languages with a dedicated local analyzer
+LOCAL_LANGUAGES = {"python", "javascript", "java", "cpp"}
+
+# Local findings that make the code wrong regardless of what the model says
+BLOCKING_TYPES = {"bug", "security"}
+
+
+class TieredReviewer:
+    """Local rule engine first, Gemini second
+
+    Every review runs the rule-based analyzers. The model is only asked
+    when a quest needs semantic grading, the code is large or complex, or
+    there is no analyzer for the language. It gets the local findings in
+    its prompt so it only adds what the rules missed. Code that does not
+    parse is never escalated.
+    """
+
+    def __init__(self, max_local_lines: int = 40, max_local_complexity: int = 6):
+        self.max_local_lines = max_local_lines
+        self.max_local_complexity = max_local_complexity
+        self.reviews = 0
+        self.escalated = 0
+        self.ai_failures = 0
+        self.reasons: Dict[str, int] = {}
+
+    def escalation_reasons(self, code: str, language: str, quest_context: dict, local) -> List[str]:
+        """Why the local result is not enough (empty when it is)"""
+        if any(s.message.startswith("Syntax error") for s in local.suggestions):
+            return []
+
+        reasons = []
+        if quest_context and (quest_context.get("requirements") or quest_context.get("description")):
+            reasons.append("quest_grading")
+        if language not in LOCAL_LANGUAGES:
+            reasons.append("unsupported_language")
+        if sum(1 for line in code.split("\n") if line.strip()) > self.max_local_lines:
+            reasons.append("size")
+        if local.functions and max(f.complexity for f in local.functions) > self.max_local_complexity:
+            reasons.append("complexity")
+        return reasons
+
+    def _local_result(self, language: str, quest_context: dict, local, suggestions: List[dict]) -> dict:
+        """Review built from the analyzers alone
+
+        Rules can show code is wrong but never that it is right, so
+        ``is_correct`` is ``False`` for blocking findings and ``None``
+        (not graded) otherwise.
+        """
+        blocking = [s for s in suggestions if s["severity"] == "high" and s["type"] in BLOCKING_TYPES]
+        if suggestions:
+            feedback = f"Automated review found {len(suggestions)} issue(s):\n" + "\n".join(
+                f"- Line {s['line']}: {s['message']}" if s["line"] else f"- {s['message']}"
+                for s in suggestions[:10]
+            )
+        else:
+            feedback = "✅ The automated checks found no issues. Nice work!"
+
+        return {
+            "success": True,
+            "is_correct": False if blocking else None,
+            "score": max(1, round(local.score / 10)),
+            "feedback": feedback,
+            "analysis": feedback,
+            "suggestions": suggestions,
+            "language": language,
+            "quest_context": quest_context.get("title") if quest_context else None,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    async def review(self, ai_service, code: str, language: str, quest_context: dict = None) -> dict:
+        """Review code; the result has the shape of ``AIService.review_code``"""
+        from app.api.v1.code_review import analyze_code_quality
+
+        language = language.lower()
+        local = await asyncio.to_thread(analyze_code_quality, code, language)
+        suggestions = [s.model_dump() for s in local.suggestions]
+        reasons = self.escalation_reasons(code, language, quest_context, local)
+
+        self.reviews += 1
+        for reason in reasons:
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+        result = None
+        if reasons and ai_service.model:
+            self.escalated += 1
+            result = await ai_service.review_code(code, language, quest_context, local_findings=suggestions)
+            if not result.get("success"):
+                print(f"⚠️ AI review failed, using local review: {result.get('error')}")
+                self.ai_failures += 1
+                result = None
+
+        if result is None:
+            result = self._local_result(language, quest_context, local, suggestions)
+            result["tier"] = "local"
+        else:
+            seen = {s["message"].lower() for s in suggestions}
+            result["suggestions"] = suggestions + [
+                s for s in result["suggestions"] if s["message"].lower() not in seen
+            ]
+            result["tier"] = "ai"
+        result["escalation_reasons"] = reasons
+        result["local_score"] = local.score
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "reviews": self.reviews,
+            "escalated": self.escalated,
+            "escalation_rate": round(self.escalated / self.reviews, 3) if self.reviews else 0.0,
+            "ai_failures": self.ai_failures,
+            "reasons": dict(self.reasons)
+        }
+
+
+tiered_reviewer = TieredReviewer(
+    max_local_lines=settings.AI_REVIEW_LOCAL_MAX_LINES,
+    max_local_complexity=settings.AI_REVIEW_LOCAL_MAX_COMPLEXITY
+)
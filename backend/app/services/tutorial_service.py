@@ -1,4 +1,5 @@
 from datetime import datetime
+from app.services.analytics_service import AnalyticsService
 
 class TutorialService:
     """Manage tutorials and learning"""
@@ -587,6 +588,7 @@ git branch -d feature/new-feature
                 {"_id": user_id},
                 {"$inc": {"total_xp": xp_earned}}
             )
+            await AnalyticsService(db).record_daily_activity(user_id, xp=xp_earned)
             
             return {
                 "success": True,
@@ -1,9 +1,12 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from app.utils.json_encoder import convert_objectid
 from app.models.user import User
+from app.services.analytics_service import AnalyticsService
 
 class UserService:
     async def get_user_by_id(self, db: AsyncIOMotorDatabase, user_id: str) -> dict:
@@ -96,6 +99,7 @@ class UserService:
                 {"_id": ObjectId(user_id)},
                 {"$set": update_data}
             )
+            await AnalyticsService(db).record_daily_activity(user_id, xp=xp)
             
             return {
                 "xp_added": xp, 
@@ -133,6 +137,7 @@ class UserService:
                 {"_id": ObjectId(user_id)},
                 {"$set": update_data}
             )
+            await AnalyticsService(db).record_daily_activity(user_id, quests=1)
             
             return {
                 **xp_result,
@@ -198,6 +203,63 @@ class UserService:
         except Exception as e:
             raise ValueError(f"Error updating last login: {str(e)}")
 
+    async def upsert_firebase_user(
+        self,
+        db: AsyncIOMotorDatabase,
+        firebase_user: Dict[str, Any],
+        username: str = None,
+        display_name: str = None
+    ) -> Tuple[User, bool]:
+        """Get or create a Firebase user and record the login in one round trip
+        
+        Relies on the unique ``firebase_uid`` index, so concurrent logins for
+        a new account create a single user. Returns ``(user, created)``.
+        """
+        now = datetime.utcnow()
+        email = firebase_user.get('email') or ''
+        
+        update = {
+            "$set": {"last_login": now, "updated_at": now},
+            "$setOnInsert": {
+                "_id": ObjectId(),
+                "firebase_uid": firebase_user['uid'],
+                "email": firebase_user.get('email'),
+                "username": username or email.split('@')[0],
+                "display_name": display_name or firebase_user.get('name') or email,
+                "avatar_url": firebase_user.get('picture'),
+                "level": 1,
+                "xp": 0,
+                "total_xp": 0,
+                "badges": [],
+                "completed_quests": [],
+                "streak_count": 0,
+                "created_at": now,
+                "last_activity": now
+            }
+        }
+        
+        try:
+            for attempt in range(2):
+                try:
+                    # No previous document means this call inserted the user
+                    previous = await db["users"].find_one_and_update(
+                        {"firebase_uid": firebase_user['uid']},
+                        update,
+                        upsert=True,
+                        return_document=ReturnDocument.BEFORE
+                    )
+                    break
+                except DuplicateKeyError:
+                    # Lost the insert race to another login; the retry matches it
+                    if attempt:
+                        raise
+            
+            created = previous is None
+            user_data = {**(update["$setOnInsert"] if created else previous), **update["$set"]}
+            return User(**convert_objectid(user_data)), created
+        except Exception as e:
+            raise ValueError(f"Error upserting Firebase user: {str(e)}")
+
     async def get_user_by_email(self, db: AsyncIOMotorDatabase, email: str) -> Optional[User]:
         """Get user by email"""
         try:
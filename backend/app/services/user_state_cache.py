@@ -0,0 +1,122 @@
+"""
+User State Cache
+Bounded LRU cache of user documents backed by the ``users`` collection
+"""
+
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from pymongo import ReturnDocument
+from app.core.config import settings
+
+class UserStateCache:
+    """Write-through LRU cache for gamification user state
+
+    Entries are keyed by username and refreshed from MongoDB once they are
+    older than ``ttl_seconds``, so several workers converge on the stored
+    state. Updates go to the database first and the returned document
+    replaces the cached copy.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 60):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _default_user(user_id: str) -> dict:
+        """State reported for a user with no stored document"""
+        now = datetime.utcnow()
+        return {
+            "username": user_id,
+            "total_xp": 0,
+            "level": 1,
+            "quests_completed": 0,
+            "current_streak": 0,
+            "longest_streak": 0,
+            "badges_earned": 0,
+            "created_at": now,
+            "updated_at": now
+        }
+
+    def _store(self, user_id: str, user: dict) -> dict:
+        """Insert or refresh an entry and evict the least recently used"""
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, user)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return user
+
+    async def get(self, db, user_id: str) -> dict:
+        """Get user state, loading it on miss or expiry
+
+        Unknown users get default state that is neither stored nor cached;
+        user documents are only created by registration.
+        """
+        entry = self._entries.get(user_id)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+        self.misses += 1
+        user = await db["users"].find_one({"username": user_id})
+        if not user:
+            return self._default_user(user_id)
+        return self._store(user_id, user)
+
+    async def update(
+        self,
+        db,
+        user_id: str,
+        changes: dict = None,
+        inc: dict = None,
+        maximum: dict = None
+    ) -> Optional[dict]:
+        """Write changes through to MongoDB and cache the stored result
+
+        ``inc`` and ``maximum`` apply ``$inc`` and ``$max`` so counters stay
+        correct when workers update the same user from stale entries.
+        Returns ``None`` without writing when the user does not exist.
+        """
+        update = {"$set": {**(changes or {}), "updated_at": datetime.utcnow()}}
+        if inc:
+            update["$inc"] = inc
+        if maximum:
+            update["$max"] = maximum
+        user = await db["users"].find_one_and_update(
+            {"username": user_id},
+            update,
+            return_document=ReturnDocument.AFTER
+        )
+        if not user:
+            self.invalidate(user_id)
+            return None
+        return self._store(user_id, user)
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a cached entry"""
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        """Cache size and hit-rate metrics"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+user_state_cache = UserStateCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS
+)
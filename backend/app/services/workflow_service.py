@@ -4,6 +4,13 @@ Manages the complete user journey through the platform
 """
 
 from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.services.code_storage import code_store
+from app.services.result_cache import result_cache
+from app.utils.code_hash import content_hash
 
 class WorkflowService:
     """Manage user workflow through quests and tasks"""
@@ -21,66 +28,295 @@ class WorkflowService:
         "completed": "workflow_complete"
     }
     
+    # Per-user state durations are folded into a snapshot every N events
+    SNAPSHOT_INTERVAL = 20
+    
+    # Bump when the review prompt changes so cached reviews are not reused
+    REVIEW_PROMPT_VERSION = 1
+    
+    def _workflow_pipeline(self, user_id: str) -> list:
+        """Aggregation that assembles the whole workflow read model
+        
+        Starts from the user and pulls the workflow document (with its
+        denormalized counters), quest progress and the latest submission
+        in a single round trip.
+        """
+        return [
+            {"$match": {"_id": user_id}},
+            {"$project": {"total_xp": 1}},
+            {"$lookup": {
+                "from": "user_workflows",
+                "localField": "_id",
+                "foreignField": "user_id",
+                "as": "workflow"
+            }},
+            {"$lookup": {
+                "from": "user_quest_progress",
+                "let": {"uid": "$_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$user_id", "$$uid"]}}},
+                    {"$facet": {
+                        "in_progress": [
+                            {"$match": {"status": "in_progress"}},
+                            {"$limit": 1}
+                        ],
+                        "completed": [
+                            {"$match": {"status": "completed"}},
+                            {"$count": "count"}
+                        ]
+                    }}
+                ],
+                "as": "quests"
+            }},
+            {"$lookup": {
+                "from": "code_submissions",
+                "let": {"uid": "$_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$user_id", "$$uid"]}}},
+                    {"$sort": {"submitted_at": -1}},
+                    {"$limit": 1},
+                    {"$project": {"code": 0, "code_storage": 0}}
+                ],
+                "as": "recent_submission"
+            }}
+        ]
+    
+    async def _load_read_model(self, db, user_id: str) -> dict:
+        """Run the read model aggregation and flatten the lookups"""
+        docs = await db["users"].aggregate(self._workflow_pipeline(user_id)).to_list(1)
+        if not docs:
+            return None
+        
+        doc = docs[0]
+        quests = doc["quests"][0] if doc["quests"] else {}
+        in_progress = quests.get("in_progress", [])
+        completed = quests.get("completed", [])
+        
+        return {
+            "user": doc,
+            "workflow": doc["workflow"][0] if doc["workflow"] else None,
+            "quest_progress": in_progress[0] if in_progress else None,
+            "quests_completed": completed[0]["count"] if completed else 0,
+            "recent_submission": doc["recent_submission"][0] if doc["recent_submission"] else None
+        }
+    
+    def _build_state(self, model: dict) -> dict:
+        """Current workflow state and its context from the read model
+        
+        The state comes from the workflow document, like
+        ``get_current_state``; it is only inferred from quest progress for
+        users without one.
+        """
+        quest_progress = model["quest_progress"]
+        total_xp = model["user"].get("total_xp", 0)
+        
+        # Get current task
+        current_task = None
+        if quest_progress:
+            for task_id, task_data in quest_progress.get("task_progress", {}).items():
+                if task_data.get("status") == "in_progress":
+                    current_task = {
+                        "task_id": task_id,
+                        "status": task_data.get("status")
+                    }
+                    break
+        
+        workflow = model["workflow"]
+        if workflow and workflow.get("current_state"):
+            current_state = workflow["current_state"]
+        elif quest_progress and current_task:
+            current_state = "task_execution"
+        else:
+            current_state = "quest_selection"
+        
+        return {
+            "state": current_state,
+            "user": {
+                "total_xp": total_xp,
+                "level": (total_xp // 1000) + 1
+            },
+            "quest_progress": quest_progress,
+            "current_task": current_task,
+            "recent_submission": model["recent_submission"]
+        }
+    
+    def _build_analytics(self, model: dict) -> dict:
+        """Workflow analytics from the denormalized workflow counters"""
+        workflow = model["workflow"]
+        return {
+            "total_submissions": workflow.get("submissions_count", 0),
+            "ai_help_requests": workflow.get("ai_help_requests", 0),
+            "tasks_completed": model["quests_completed"],
+            "current_state": workflow.get("current_state"),
+            "started_at": workflow.get("started_at"),
+            "contributions": workflow.get("contributions_made", 0)
+        }
+    
     async def get_user_workflow_state(self, db, user_id: str) -> dict:
         """Get user's current workflow state"""
         try:
-            # Get user
-            user = await db["users"].find_one({"_id": user_id})
-            if not user:
+            model = await self._load_read_model(db, user_id)
+            if not model:
                 return {
                     "success": False,
                     "error": "User not found"
                 }
             
-            # Get current quest
-            quest_progress = await db["user_quest_progress"].find_one(
-                {
-                    "user_id": user_id,
-                    "status": "in_progress"
+            return {"success": True, **self._build_state(model)}
+        
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    async def get_workflow_progress(self, db, user_id: str) -> dict:
+        """Get workflow state and analytics in one round trip"""
+        try:
+            model = await self._load_read_model(db, user_id)
+            if not model:
+                return {
+                    "success": False,
+                    "error": "User not found"
                 }
-            )
-            
-            # Get current task
-            current_task = None
-            if quest_progress:
-                for task_id, task_data in quest_progress.get("task_progress", {}).items():
-                    if task_data.get("status") == "in_progress":
-                        current_task = {
-                            "task_id": task_id,
-                            "status": task_data.get("status")
-                        }
-                        break
-            
-            # Get recent submissions
-            recent_submission = await db["code_submissions"].find_one(
-                {"user_id": user_id},
-                sort=[("timestamp", -1)]
-            )
-            
-            # Determine current state
-            if quest_progress:
-                if current_task:
-                    current_state = "task_execution"
-                else:
-                    current_state = "quest_selection"
-            else:
-                current_state = "quest_selection"
             
             return {
                 "success": True,
-                "state": current_state,
-                "user": {
-                    "total_xp": user.get("total_xp", 0),
-                    "level": (user.get("total_xp", 0) // 1000) + 1
-                },
-                "quest_progress": quest_progress,
-                "current_task": current_task,
-                "recent_submission": recent_submission
+                "state": self._build_state(model)["state"],
+                "analytics": self._build_analytics(model) if model["workflow"] else None
             }
         
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def _new_workflow(self, user_id: str, now: datetime = None) -> dict:
+        """Fresh workflow document with zeroed counters"""
+        now = now or datetime.utcnow()
+        return {
+            "user_id": user_id,
+            "started_at": now,
+            "current_state": "onboarding",
+            "state_entered_at": now,
+            "event_seq": 0,
+            "quest_count": 0,
+            "tasks_completed": 0,
+            "submissions_count": 0,
+            "ai_help_requests": 0,
+            "contributions_made": 0
+        }
+    
+    async def _record_transition(
+        self,
+        db,
+        user_id: str,
+        new_state: str,
+        metadata: dict = None,
+        inc: dict = None,
+        fields: dict = None
+    ) -> dict:
+        """Move a user to ``new_state`` and append the transition event
+        
+        The workflow document is the head of the event log: one
+        ``find_one_and_update`` sets the new state, bumps ``event_seq``
+        (and any counters in ``inc``) and returns the previous state, so
+        the dwell time can be recorded on the event and added to the
+        global funnel counters incrementally.
+        """
+        if new_state not in self.WORKFLOW_STATES:
+            raise ValueError(f"Unknown workflow state: {new_state}")
+        
+        now = datetime.utcnow()
+        set_fields = {
+            **(fields or {}),
+            "current_state": new_state,
+            "state_entered_at": now,
+            "last_updated": now
+        }
+        inc_fields = {"event_seq": 1, **(inc or {})}
+        defaults = {
+            k: v for k, v in self._new_workflow(user_id, now).items()
+            if k not in set_fields and k not in inc_fields
+        }
+        
+        previous = await db["user_workflows"].find_one_and_update(
+            {"user_id": user_id},
+            {"$set": set_fields, "$inc": inc_fields, "$setOnInsert": defaults},
+            projection={"current_state": 1, "state_entered_at": 1, "started_at": 1, "event_seq": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+        
+        previous = previous or {}
+        from_state = previous.get("current_state")
+        entered_at = previous.get("state_entered_at") or previous.get("started_at")
+        event = {
+            "user_id": user_id,
+            "seq": previous.get("event_seq", 0) + 1,
+            "from_state": from_state,
+            "to_state": new_state,
+            "dwell_seconds": (now - entered_at).total_seconds() if entered_at else 0,
+            "metadata": metadata or {},
+            "at": now
+        }
+        await db["workflow_events"].insert_one(event)
+        
+        funnel_ops = [UpdateOne({"_id": new_state}, {"$inc": {"entered": 1}}, upsert=True)]
+        if from_state:
+            funnel_ops.append(UpdateOne(
+                {"_id": from_state},
+                {"$inc": {"exited": 1, "total_seconds": event["dwell_seconds"]}},
+                upsert=True
+            ))
+        await db["workflow_funnel"].bulk_write(funnel_ops, ordered=False)
+        
+        if event["seq"] % self.SNAPSHOT_INTERVAL == 0:
+            await self._write_snapshot(db, user_id)
+        
+        return event
+    
+    def _fold_events(self, snapshot: dict, events: list) -> dict:
+        """Apply events on top of a snapshot"""
+        time_in_state = dict(snapshot.get("time_in_state", {}))
+        folded = {
+            "state": snapshot.get("state"),
+            "state_entered_at": snapshot.get("state_entered_at"),
+            "seq": snapshot.get("seq", 0),
+            "transitions": snapshot.get("transitions", 0)
+        }
+        
+        for event in events:
+            if event.get("from_state"):
+                time_in_state[event["from_state"]] = (
+                    time_in_state.get(event["from_state"], 0) + event["dwell_seconds"]
+                )
+            folded.update({
+                "state": event["to_state"],
+                "state_entered_at": event["at"],
+                "seq": event["seq"],
+                "transitions": folded["transitions"] + 1
+            })
+        
+        folded["time_in_state"] = time_in_state
+        return folded
+    
+    async def _load_history(self, db, user_id: str) -> dict:
+        """Latest snapshot plus the (at most SNAPSHOT_INTERVAL) events after it"""
+        snapshot = await db["workflow_snapshots"].find_one({"_id": user_id}) or {}
+        events = await db["workflow_events"].find(
+            {"user_id": user_id, "seq": {"$gt": snapshot.get("seq", 0)}}
+        ).sort("seq", 1).to_list(None)
+        return self._fold_events(snapshot, events)
+    
+    async def _write_snapshot(self, db, user_id: str) -> None:
+        """Persist the folded history so reads replay only a short tail"""
+        folded = await self._load_history(db, user_id)
+        try:
+            await db["workflow_snapshots"].update_one(
+                {"_id": user_id, "seq": {"$lt": folded["seq"]}},
+                {"$set": folded},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A newer snapshot was written concurrently
+            pass
+    
     async def start_workflow(self, db, user_id: str) -> dict:
         """Initialize user workflow"""
         try:
@@ -97,18 +333,14 @@ class WorkflowService:
                 }
             
             # Create new workflow
-            new_workflow = {
-                "user_id": user_id,
-                "started_at": datetime.utcnow(),
-                "current_state": "onboarding",
-                "quest_count": 0,
-                "tasks_completed": 0,
-                "submissions_count": 0,
-                "ai_help_requests": 0,
-                "contributions_made": 0
-            }
+            new_workflow = self._new_workflow(user_id)
             
             result = await db["user_workflows"].insert_one(new_workflow)
+            await db["workflow_funnel"].update_one(
+                {"_id": "onboarding"},
+                {"$inc": {"entered": 1}},
+                upsert=True
+            )
             
             return {
                 "success": True,
@@ -128,23 +360,19 @@ class WorkflowService:
     ) -> dict:
         """Update user's workflow state"""
         try:
-            update_data = {
-                "current_state": new_state,
-                "last_updated": datetime.utcnow()
-            }
-            
-            if metadata:
-                update_data.update(metadata)
-            
-            result = await db["user_workflows"].update_one(
-                {"user_id": user_id},
-                {"$set": update_data}
+            event = await self._record_transition(
+                db,
+                user_id,
+                new_state,
+                metadata=metadata,
+                fields=metadata
             )
             
             return {
                 "success": True,
                 "message": f"State updated to {new_state}",
-                "modified": result.modified_count
+                "from_state": event["from_state"],
+                "seq": event["seq"]
             }
         
         except Exception as e:
@@ -162,10 +390,13 @@ class WorkflowService:
             
             result = await db["ai_help_requests"].insert_one(help_record)
             
-            # Update workflow
-            await db["user_workflows"].update_one(
-                {"user_id": user_id},
-                {"$inc": {"ai_help_requests": 1}}
+            # Transition and keep the denormalized counter in step
+            await self._record_transition(
+                db,
+                user_id,
+                "need_help",
+                metadata={"task_id": task_id},
+                inc={"ai_help_requests": 1}
             )
             
             return {
@@ -185,12 +416,18 @@ class WorkflowService:
         code: str,
         status: str = "pending_review"
     ) -> dict:
-        """Record code submission"""
+        """Record code submission
+
+        Code identical to one of the user's earlier submissions for the task
+        is stored as a reference to it rather than another copy.
+        """
         try:
+            code_hash = content_hash(code)
             submission = {
                 "user_id": user_id,
                 "task_id": task_id,
                 "code": code,
+                "content_hash": code_hash,
                 "status": status,
                 "submitted_at": datetime.utcnow(),
                 "ai_feedback": None,
@@ -198,65 +435,212 @@ class WorkflowService:
                 "revision_count": 0
             }
             
+            original = await db["code_submissions"].find_one(
+                {
+                    "user_id": user_id,
+                    "task_id": task_id,
+                    "content_hash": code_hash,
+                    "duplicate_of": {"$exists": False}
+                },
+                {"_id": 1},
+                sort=[("submitted_at", -1)]
+            )
+            del submission["code"]
+            if original:
+                submission["duplicate_of"] = str(original["_id"])
+            else:
+                previous = await db["code_submissions"].find_one(
+                    {"user_id": user_id, "task_id": task_id, "duplicate_of": {"$exists": False}},
+                    {"code": 1, "code_storage": 1},
+                    sort=[("submitted_at", -1), ("_id", -1)]
+                )
+                submission["code_storage"] = await code_store.encode(
+                    db, "code_submissions", code, previous
+                )
+            
             result = await db["code_submissions"].insert_one(submission)
             
-            # Update workflow
-            await db["user_workflows"].update_one(
-                {"user_id": user_id},
-                {"$inc": {"submissions_count": 1}}
+            # Transition and keep the denormalized counter in step
+            await self._record_transition(
+                db,
+                user_id,
+                "code_review",
+                metadata={"task_id": task_id, "submission_id": str(result.inserted_id)},
+                inc={"submissions_count": 1}
             )
             
             return {
                 "success": True,
                 "submission_id": str(result.inserted_id),
+                "content_hash": code_hash,
+                "duplicate_of": submission.get("duplicate_of"),
                 "message": "Code submitted for review"
             }
         
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def review_version(self) -> str:
+        """Evaluator version for cached AI reviews"""
+        return f"{settings.GEMINI_MODEL}:{self.REVIEW_PROMPT_VERSION}"
+    
+    async def apply_cached_review(self, db, submission_id: str, task_id: str, code_hash: str) -> dict:
+        """Reuse the AI review of identical code for the task, if there is one"""
+        cached = await result_cache.get(db, "review", code_hash, task_id, self.review_version())
+        if cached is None:
+            return None
+        
+        await db["code_submissions"].update_one(
+            {"_id": ObjectId(submission_id)},
+            {"$set": {"ai_feedback": cached["feedback"], "status": "reviewed"}}
+        )
+        return {
+            "submission_id": submission_id,
+            "feedback": cached["feedback"],
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    
+    async def review_code_submission(self, db, job: dict, report_progress) -> dict:
+        """Job handler: get AI feedback for a recorded code submission"""
+        from app.services.ai_service import AIService
+        
+        payload = job["payload"]
+        await report_progress(10, "Requesting AI review")
+        
+        feedback_prompt = f"""
+Review this code and provide constructive feedback:
+
+Code:
+{payload["code"]}
+
+Please provide:
+1. What the code does well
+2. Areas for improvement
+3. Best practices suggestions
+4. Any bugs or issues
+5. Rating (1-5 stars)
+        """
+        
+        ai_response = await AIService().chat(
+            feedback_prompt,
+            payload["user_id"],
+            f"Code review for task: {payload['task_id']}"
+        )
+        if not ai_response.get("success"):
+            # Raising lets the job queue retry with backoff
+            raise RuntimeError(ai_response.get("error") or "AI review failed")
+        
+        await result_cache.put(
+            db,
+            "review",
+            payload.get("content_hash") or content_hash(payload["code"]),
+            payload["task_id"],
+            self.review_version(),
+            {"feedback": ai_response.get("response")}
+        )
+        
+        # Save feedback to database
+        await db["code_submissions"].update_one(
+            {"_id": ObjectId(payload["submission_id"])},
+            {
+                "$set": {
+                    "ai_feedback": ai_response.get("response"),
+                    "status": "reviewed"
+                }
+            }
+        )
+        
+        return {
+            "submission_id": payload["submission_id"],
+            "feedback": ai_response.get("response"),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    
     async def get_workflow_analytics(self, db, user_id: str) -> dict:
         """Get user's workflow analytics"""
         try:
-            workflow = await db["user_workflows"].find_one(
-                {"user_id": user_id}
-            )
+            model = await self._load_read_model(db, user_id)
             
-            if not workflow:
+            if not model or not model["workflow"]:
                 return {
                     "success": False,
                     "error": "No workflow found"
                 }
             
-            # Count submissions
-            submissions = await db["code_submissions"].count_documents(
-                {"user_id": user_id}
+            return {
+                "success": True,
+                "analytics": self._build_analytics(model)
+            }
+        
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    async def get_current_state(self, db, user_id: str) -> dict:
+        """Current workflow state from the head of the event log"""
+        try:
+            workflow = await db["user_workflows"].find_one(
+                {"user_id": user_id},
+                {"current_state": 1, "state_entered_at": 1, "event_seq": 1}
             )
             
-            # Count AI help requests
-            help_requests = await db["ai_help_requests"].count_documents(
-                {"user_id": user_id}
-            )
+            if not workflow:
+                return {"success": False, "error": "No workflow found"}
             
-            # Count completed tasks
-            tasks_completed = await db["user_quest_progress"].count_documents(
-                {
-                    "user_id": user_id,
-                    "status": "completed"
-                }
-            )
+            return {
+                "success": True,
+                "state": workflow.get("current_state"),
+                "entered_at": workflow.get("state_entered_at"),
+                "seq": workflow.get("event_seq", 0)
+            }
+        
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    async def get_state_history(self, db, user_id: str) -> dict:
+        """Time spent in each state, replayed from the latest snapshot"""
+        try:
+            history = await self._load_history(db, user_id)
+            
+            # Include the time spent so far in the current state
+            time_in_state = history["time_in_state"]
+            if history["state"] and history["state_entered_at"]:
+                elapsed = (datetime.utcnow() - history["state_entered_at"]).total_seconds()
+                time_in_state[history["state"]] = time_in_state.get(history["state"], 0) + elapsed
             
             return {
                 "success": True,
-                "analytics": {
-                    "total_submissions": submissions,
-                    "ai_help_requests": help_requests,
-                    "tasks_completed": tasks_completed,
-                    "current_state": workflow.get("current_state"),
-                    "started_at": workflow.get("started_at"),
-                    "contributions": workflow.get("contributions_made", 0)
-                }
+                "state": history["state"],
+                "transitions": history["transitions"],
+                "time_in_state": time_in_state
             }
         
         except Exception as e:
             return {"success": False, "error": str(e)}
+    
+    async def get_funnel(self, db) -> dict:
+        """Funnel analytics maintained incrementally from the event stream"""
+        try:
+            counters = {
+                doc["_id"]: doc
+                for doc in await db["workflow_funnel"].find({}).to_list(len(self.WORKFLOW_STATES))
+            }
+            
+            funnel = []
+            for state in self.WORKFLOW_STATES:
+                doc = counters.get(state, {})
+                entered = doc.get("entered", 0)
+                exited = doc.get("exited", 0)
+                still_there = max(entered - exited, 0)
+                funnel.append({
+                    "state": state,
+                    "entered": entered,
+                    "exited": exited,
+                    "avg_seconds": doc.get("total_seconds", 0) / exited if exited else 0,
+                    "drop_off": still_there,
+                    "drop_off_rate": still_there / entered if entered else 0
+                })
+            
+            return {"success": True, "funnel": funnel}
+        
+        except Exception as e:
+            return {"success": False, "error": str(e)}
@@ -0,0 +1,124 @@
+"""
+Activity bitmap helpers
+
+A user's activity for one calendar year is stored as a bitmap with one bit
+per day (bit 0 = January 1st). MongoDB's ``$bit`` operator only works on
+32/64-bit integers, so the 366 bits are split across six int64 fields
+``w0``..``w5`` of a single ``user_activity`` document.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Iterable
+from bson.int64 import Int64
+
+WORD_BITS = 64
+WORD_COUNT = 6  # 6 * 64 = 384 bits >= 366 days
+
+
+def day_index(day: date) -> int:
+    """Zero-based day of the year"""
+    return day.timetuple().tm_yday - 1
+
+
+def days_in_year(year: int) -> int:
+    """Number of days in a year"""
+    return (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+
+def activity_doc_id(user_id: str, year: int) -> str:
+    """Document id of a user's bitmap for one year"""
+    return f"{user_id}:{year}"
+
+
+def mark_day_update(day: date) -> dict:
+    """``$bit`` update that sets the bit for ``day``"""
+    index = day_index(day)
+    word, bit = divmod(index, WORD_BITS)
+    mask = 1 << bit
+    if mask >= 1 << (WORD_BITS - 1):
+        mask -= 1 << WORD_BITS  # int64 is signed
+    return {"$bit": {f"w{word}": {"or": Int64(mask)}}}
+
+
+def bitmap_from_doc(doc: dict) -> int:
+    """Combine the int64 words of a bitmap document into one integer"""
+    if not doc:
+        return 0
+    bitmap = 0
+    for word in range(WORD_COUNT):
+        value = int(doc.get(f"w{word}", 0)) & ((1 << WORD_BITS) - 1)
+        bitmap |= value << (word * WORD_BITS)
+    return bitmap
+
+
+def is_active(bitmap: int, day: date) -> bool:
+    """Check whether the bit for ``day`` is set"""
+    return bool(bitmap >> day_index(day) & 1)
+
+
+def _timeline(bitmaps: Dict[int, int]) -> tuple:
+    """Concatenate yearly bitmaps into one integer starting at Jan 1 of the first year"""
+    if not bitmaps:
+        return 0, date.today()
+    first_year = min(bitmaps)
+    timeline = 0
+    offset = 0
+    for year in range(first_year, max(bitmaps) + 1):
+        timeline |= bitmaps.get(year, 0) << offset
+        offset += days_in_year(year)
+    return timeline, date(first_year, 1, 1)
+
+
+def current_streak(bitmaps: Dict[int, int], today: date) -> int:
+    """Length of the run of active days ending today (or yesterday)
+
+    A streak is still alive if the user was active yesterday but has not
+    acted yet today, matching ``is_streak_alive``.
+    """
+    timeline, start = _timeline(bitmaps)
+    position = (today - start).days
+    if position < 0:
+        return 0
+    if not timeline >> position & 1:
+        position -= 1
+    # Count trailing ones of the timeline truncated at ``position``
+    window = timeline & ((1 << (position + 1)) - 1)
+    inverted = ~window & ((1 << (position + 1)) - 1)
+    if inverted == 0:
+        return position + 1
+    return (position + 1) - inverted.bit_length()
+
+
+def longest_streak(bitmaps: Dict[int, int]) -> int:
+    """Longest run of consecutive active days"""
+    timeline, _ = _timeline(bitmaps)
+    longest = 0
+    while timeline:
+        timeline &= timeline >> 1
+        longest += 1
+    return longest
+
+
+def active_days(bitmaps: Dict[int, int], start: date, end: date) -> int:
+    """Number of active days between ``start`` and ``end`` inclusive"""
+    timeline, origin = _timeline(bitmaps)
+    low = max((start - origin).days, 0)
+    high = (end - origin).days
+    if high < low:
+        return 0
+    mask = ((1 << (high - low + 1)) - 1) << low
+    return (timeline & mask).bit_count()
+
+
+def active_dates(bitmap: int, year: int) -> Iterable[date]:
+    """Yield every active date of a year"""
+    start = date(year, 1, 1)
+    while bitmap:
+        low_bit = bitmap & -bitmap
+        yield start + timedelta(days=low_bit.bit_length() - 1)
+        bitmap ^= low_bit
+
+
+def heatmap(bitmap: int, year: int) -> Dict[str, int]:
+    """Sparse ``{"YYYY-MM-DD": 1}`` map of active days, as used by ActivityHeatmap"""
+    return {day.isoformat(): 1 for day in active_dates(bitmap, year)}
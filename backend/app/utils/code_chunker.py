@@ -0,0 +1,87 @@
+"""
+Code chunking
+
+Splits large source files into chunks along function and class
+boundaries so each chunk can be reviewed on its own. Chunks keep their
+starting line so findings can be mapped back to the whole file.
+"""
+
+import ast
+import re
+from typing import List, Tuple
+
+# String literals and line comments, ignored when counting braces
+_BRACE_NOISE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|//.*')
+
+
+def _python_starts(code: str, max_lines: int) -> List[int]:
+    """First line of each top-level statement (and of methods in large classes)"""
+    tree = ast.parse(code)
+    starts = []
+    for node in tree.body:
+        starts.append(min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])]))
+        if isinstance(node, ast.ClassDef) and node.end_lineno - node.lineno + 1 > max_lines:
+            for child in node.body[1:]:
+                starts.append(min([child.lineno] + [d.lineno for d in getattr(child, "decorator_list", [])]))
+    return starts
+
+
+def _brace_starts(lines: List[str]) -> List[int]:
+    """Lines following a closing brace back at the outermost level
+
+    Java and C++ methods usually live inside a class or namespace, so when
+    the top level yields a single block the next level down is used.
+    """
+    depths = []
+    depth = 0
+    for line in lines:
+        stripped = _BRACE_NOISE.sub("", line)
+        depth += stripped.count("{") - stripped.count("}")
+        depths.append(depth)
+
+    for level in (0, 1):
+        starts = [i + 2 for i, d in enumerate(depths[:-1]) if d <= level and "}" in lines[i]]
+        if len(starts) > 1 or level == 1:
+            return starts
+    return []
+
+
+def split_code(code: str, language: str, max_lines: int) -> List[Tuple[int, str]]:
+    """Split ``code`` into ``(start_line, chunk)`` pieces of about ``max_lines``
+
+    Units (top-level statements, functions, classes) are packed greedily
+    into chunks; a unit longer than ``max_lines`` is cut into slices.
+    Comments and blank lines stay with the unit that follows them.
+    """
+    lines = code.split("\n")
+    if len(lines) <= max_lines:
+        return [(1, code)]
+
+    starts = []
+    if language == "python":
+        try:
+            starts = _python_starts(code, max_lines)
+        except SyntaxError:
+            starts = []
+    elif language in ("javascript", "java", "cpp"):
+        starts = _brace_starts(lines)
+
+    bounds = sorted({1, *[s for s in starts if 1 < s <= len(lines)]}) + [len(lines) + 1]
+    units = list(zip(bounds, bounds[1:]))  # [start, end) line ranges
+
+    chunks = []
+    chunk_start = None
+    for start, end in units:
+        if chunk_start is not None and end - chunk_start > max_lines:
+            chunks.append((chunk_start, start))
+            chunk_start = None
+        if end - start > max_lines:
+            for slice_start in range(start, end, max_lines):
+                chunks.append((slice_start, min(end, slice_start + max_lines)))
+            continue
+        if chunk_start is None:
+            chunk_start = start
+    if chunk_start is not None:
+        chunks.append((chunk_start, len(lines) + 1))
+
+    return [(start, "\n".join(lines[start - 1:end - 1])) for start, end in chunks]
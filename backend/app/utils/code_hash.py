@@ -0,0 +1,41 @@
+"""
+Code content hashing
+
+Submissions are compared by a hash of their source with line endings
+normalized, so a resubmission from another platform is recognised as the
+same code. Nothing else is normalized: trailing whitespace can change what
+a program does (string literals, line continuations), and an identical
+hash reuses stored code and cached test results.
+"""
+
+import hashlib
+import json
+
+
+def normalize_line_endings(code: str) -> str:
+    """Source with ``\r\n`` and ``\r`` line endings turned into ``\n``"""
+    return code.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def normalize_code(code: str) -> str:
+    """Loose canonical form ignoring trailing whitespace and blank edges
+
+    Only for text whose meaning does not depend on exact whitespace, such
+    as coalescing identical prompts; never for cache keys of code results.
+    """
+    lines = normalize_line_endings(code).split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+def content_hash(code: str, language: str = "") -> str:
+    """SHA-256 of the source with normalized line endings, scoped to its language"""
+    digest = hashlib.sha256(language.lower().encode())
+    digest.update(b"\0")
+    digest.update(normalize_line_endings(code).encode())
+    return digest.hexdigest()
+
+
+def spec_hash(spec) -> str:
+    """Short stable hash of a JSON-like document (e.g. a task's test spec)"""
+    encoded = json.dumps(spec, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
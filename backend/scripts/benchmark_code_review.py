@@ -0,0 +1,74 @@
+"""
+Benchmark the Python code review pipeline on large files
+
+Compares the line/regex pipeline (analyze_python_lines and
+fix_python_issues) against the single AST pass that now backs
+analyze_python, end to end through corrected-code generation.
+
+Usage: python scripts/benchmark_code_review.py [functions]
+"""
+
+import sys
+import os
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api.v1.code_review import (
+    analyze_code_quality,
+    analyze_general_patterns,
+    analyze_python_lines,
+    calculate_metrics,
+    calculate_overall_score,
+    generate_corrected_code,
+)
+
+FUNCTION = '''def handler_{i}(event, context):
+    # print(event) was useful while debugging
+    message = "retry after except: {i}"
+    try:
+        if event and context:
+            for item in event:
+                while item:
+                    item -= 1
+    except:
+        pass
+    print(message)
+    return message
+'''
+
+def regex_pipeline(code: str):
+    """The review pipeline as it was before the AST analyzer"""
+    lines = code.split('\n')
+    suggestions = analyze_python_lines(code, lines) + analyze_general_patterns(code, lines)
+    corrected_code = generate_corrected_code(code, suggestions, 'python')
+    analysis = calculate_metrics(code, lines, suggestions)
+    calculate_overall_score(analysis, len(suggestions))
+    return suggestions, corrected_code
+
+def _time(fn, code: str, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(code)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    code = "\n".join(FUNCTION.format(i=i) for i in range(functions))
+    lines = code.count('\n') + 1
+
+    regex_suggestions, _ = regex_pipeline(code)
+    result = analyze_code_quality(code, 'python')
+
+    print(f"🐍 {functions} functions, {lines} lines")
+    print(f"regex  {_time(regex_pipeline, code) * 1000:8.1f} ms, {len(regex_suggestions)} suggestions")
+    print(
+        f"ast    {_time(lambda c: analyze_code_quality(c, 'python'), code) * 1000:8.1f} ms, "
+        f"{len(result.suggestions)} suggestions, docstring coverage {result.docstring_coverage}"
+    )
+
+if __name__ == "__main__":
+    main()
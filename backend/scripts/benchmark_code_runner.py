@@ -0,0 +1,61 @@
+"""
+Benchmark per-submission latency of the code runner
+
+Compares spawning a fresh interpreter for every run against the
+pre-forked warm pool, for a short test spec where start-up dominates.
+
+Usage: python scripts/benchmark_code_runner.py [runs] [concurrency]
+"""
+
+import asyncio
+import sys
+import os
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.code_runner import CodeRunner
+
+CODE = "def add(a, b):\n    return a + b"
+SPEC = {
+    "entrypoint": "add",
+    "cases": [{"name": f"case {i}", "args": [i, i], "expected": 2 * i} for i in range(5)]
+}
+
+async def _run(name: str, runner: CodeRunner, runs: int, concurrency: int):
+    await runner.start()
+    await runner.run(CODE, "python", SPEC)  # warm-up
+
+    latencies = []
+
+    async def one():
+        start = time.perf_counter()
+        result = await runner.run(CODE, "python", SPEC)
+        latencies.append(time.perf_counter() - start)
+        assert result["all_passed"], result
+
+    start = time.perf_counter()
+    for i in range(0, runs, concurrency):
+        await asyncio.gather(*[one() for _ in range(min(concurrency, runs - i))])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(
+        f"{name:<6} {runs} runs in {elapsed:.2f}s ({runs / elapsed:.1f}/s), "
+        f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms"
+    )
+    print(f"       {runner.stats()}")
+    await runner.stop()
+
+async def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    print(f"🐍 {runs} Python submissions, {concurrency} at a time")
+    await _run("cold", CodeRunner(workers=concurrency, warm_pool=False), runs, concurrency)
+    await _run("warm", CodeRunner(workers=concurrency, warm_pool=True), runs, concurrency)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -50,12 +50,115 @@ async def init_db():
         except Exception as e:
             print(f"⚠️  Index on users.username already exists")
         
+        try:
+            await db["users"].create_index(
+                "firebase_uid",
+                unique=True,
+                partialFilterExpression={"firebase_uid": {"$type": "string"}}
+            )
+            print("✅ Created unique index on users.firebase_uid")
+        except Exception as e:
+            print(f"⚠️  Index on users.firebase_uid already exists")
+        
         try:
             await db["quests"].create_index("title")
             print("✅ Created index on quests.title")
         except Exception as e:
             print(f"⚠️  Index on quests.title already exists")
         
+        try:
+            await db["user_quest_progress"].create_index(
+                [("user_id", 1), ("quest_id", 1)], unique=True
+            )
+            print("✅ Created unique index on user_quest_progress.user_id+quest_id")
+        except Exception as e:
+            print(f"⚠️  Index on user_quest_progress.user_id+quest_id already exists")
+        
+        try:
+            await db["user_streaks"].create_index("user_id", unique=True)
+            await db["user_streaks"].create_index("last_activity")
+            print("✅ Created indexes on user_streaks.user_id and user_streaks.last_activity")
+        except Exception as e:
+            print(f"⚠️  Indexes on user_streaks already exist")
+        
+        try:
+            await db["user_daily_stats"].create_index([("user_id", 1), ("date", 1)])
+            print("✅ Created index on user_daily_stats.user_id+date")
+        except Exception as e:
+            print(f"⚠️  Index on user_daily_stats.user_id+date already exists")
+        
+        try:
+            await db["user_workflows"].create_index("user_id", unique=True)
+            await db["code_submissions"].create_index([("user_id", 1), ("submitted_at", -1)])
+            print("✅ Created indexes for the workflow read model")
+        except Exception as e:
+            print(f"⚠️  Workflow indexes already exist")
+        
+        try:
+            await db["workflow_events"].create_index([("user_id", 1), ("seq", 1)], unique=True)
+            print("✅ Created unique index on workflow_events.user_id+seq")
+        except Exception as e:
+            print(f"⚠️  Index on workflow_events.user_id+seq already exists")
+        
+        try:
+            await db["notifications"].create_index(
+                [("user_id", 1), ("created_at", -1), ("_id", -1)]
+            )
+            print("✅ Created index on notifications.user_id+created_at+_id")
+        except Exception as e:
+            print(f"⚠️  Index on notifications.user_id+created_at+_id already exists")
+        
+        try:
+            await db["notifications"].create_index(
+                [("user_id", 1), ("is_read", 1), ("created_at", -1), ("_id", -1)]
+            )
+            print("✅ Created index on notifications.user_id+is_read+created_at+_id")
+        except Exception as e:
+            print(f"⚠️  Index on notifications.user_id+is_read+created_at+_id already exists")
+        
+        try:
+            await db["notifications"].create_index("created_at")
+            print("✅ Created index on notifications.created_at")
+        except Exception as e:
+            print(f"⚠️  Index on notifications.created_at already exists")
+        
+        try:
+            await db["notifications_archive"].create_index(
+                "archived_at",
+                expireAfterSeconds=settings.NOTIFICATION_ARCHIVE_TTL_DAYS * 86400
+            )
+            print("✅ Created TTL index on notifications_archive.archived_at")
+        except Exception as e:
+            print(f"⚠️  TTL index on notifications_archive.archived_at already exists")
+        
+        try:
+            await db["jobs"].create_index([("status", 1), ("priority", -1), ("run_after", 1)])
+            print("✅ Created index on jobs.status+priority+run_after")
+        except Exception as e:
+            print(f"⚠️  Index on jobs.status+priority+run_after already exists")
+        
+        try:
+            await db["jobs"].create_index([("status", 1), ("lease_until", 1)])
+            print("✅ Created index on jobs.status+lease_until")
+        except Exception as e:
+            print(f"⚠️  Index on jobs.status+lease_until already exists")
+        
+        try:
+            await db["submissions"].create_index([("user_id", 1), ("task_id", 1), ("content_hash", 1)])
+            await db["code_submissions"].create_index([("user_id", 1), ("task_id", 1), ("content_hash", 1)])
+            print("✅ Created content hash indexes on submissions and code_submissions")
+        except Exception as e:
+            print(f"⚠️  Content hash indexes already exist")
+        
+        try:
+            await db["evaluation_results"].create_index(
+                "created_at",
+                expireAfterSeconds=settings.EVALUATION_CACHE_TTL_DAYS * 86400
+            )
+            print("✅ Created TTL index on evaluation_results.created_at")
+        except Exception as e:
+            print(f"⚠️  TTL index on evaluation_results.created_at already exists")
+        
         print("\n✅ Database initialized successfully!")
         
     except Exception as e:
@@ -30,3 +30,310 @@ async def test_code_review(client):
         headers=headers
     )
     assert response.status_code in [200, 401]
+
+def test_python_analyzer_uses_ast():
+    """Test Python review ignores strings/comments and measures functions"""
+    from app.api.v1.code_review import analyze_code_quality
+    
+    code = '''message = "print('hi') except:"
+# print(message)
+def handle(event):
+    if event and event.ok:
+        for item in event.items:
+            if item:
+                pass
+    elif event:
+        pass
+    try:
+        print(event)
+    except:
+        pass
+
+def documented():
+    """Has a docstring"""
+    return 1'''
+    
+    result = analyze_code_quality(code, "python")
+    messages = {(s.line, s.message) for s in result.suggestions}
+    assert (11, "Consider using logging instead of print") in messages
+    assert (12, "Avoid bare except clauses") in messages
+    assert not any(line in (1, 2) for line, _ in messages)
+    
+    handle = result.functions[0]
+    assert handle.complexity == 7
+    assert handle.nesting_depth == 3
+    assert not handle.has_docstring
+    assert result.docstring_coverage == 0.5
+    assert '    """handle function."""' in result.corrected_code.split('\n')
+    
+    tabbed = analyze_code_quality("class Box:\n\tdef open(self):\n\t\t@cache\n\t\tdef inner():\n\t\t\treturn 1\n\t\treturn inner\n", "python")
+    corrected = tabbed.corrected_code.split('\n')
+    assert corrected[2:4] == ['\t\t"""open function."""', '\t\t@cache']
+    compile(tabbed.corrected_code, "<corrected>", "exec")
+
+@pytest.mark.asyncio
+async def test_repository_review_streams_per_file_results():
+    """Test archive files are reviewed on the process pool and aggregated"""
+    import io
+    import zipfile
+    from app.services.repository_review import RepositoryReviewer, extract_archive
+    
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("app/main.py", "def main():\n    print('hi')\n")
+        archive.writestr("web/app.js", "var total = eval(input)\n")
+        archive.writestr("web/node_modules/lib.js", "var skipped = 1\n")
+        archive.writestr("README.md", "# Project\n")
+    files = extract_archive(buffer.getvalue(), "project.zip")
+    assert sorted(path for path, _ in files) == ["app/main.py", "web/app.js"]
+    
+    reviewer = RepositoryReviewer(workers=2, memory_budget_bytes=1024)
+    try:
+        events = [event async for event in reviewer.review(files + [("notes.txt", "todo")])]
+    finally:
+        reviewer.shutdown()
+    
+    file_events = [event for event in events if event["event"] == "file"]
+    assert [event["completed"] for event in file_events] == [1, 2]
+    
+    report = events[-1]["report"]
+    assert events[-1]["event"] == "summary"
+    assert report["files_reviewed"] == 2
+    assert report["by_language"] == {"python": 1, "javascript": 1}
+    assert report["by_type"]["security"] == 1
+    assert report["skipped"] == [{"path": "notes.txt", "reason": "unsupported language"}]
+
+def test_review_session_returns_finding_diffs():
+    """Test edits re-check only the changed lines and keep finding ids stable"""
+    from app.services.review_session import ReviewSession, SessionConflict
+    
+    session = ReviewSession("s1", "def f(x):\n    return x\n\nglobal counter\n", "python")
+    snapshot = session.snapshot()
+    global_finding = next(f for f in snapshot["findings"] if "global" in f["message"])
+    assert global_finding["line"] == 4
+    
+    # Inserting above moves the existing finding instead of re-reporting it
+    diff = session.update([{"start_line": 1, "end_line": 0, "lines": ["import os", ""]}], version=0)
+    assert diff["version"] == 1
+    assert diff["added"] == [] and diff["removed"] == []
+    assert {"id": global_finding["id"], "line": 6} in diff["moved"]
+    
+    diff = session.update([{"start_line": 4, "end_line": 4, "lines": ["    print(x)", "    return x"]}], version=1)
+    assert [f["message"] for f in diff["added"]] == ["Consider using logging instead of print"]
+    assert diff["added"][0]["line"] == 4
+    
+    diff = session.update([{"start_line": 7, "end_line": 7, "lines": []}], version=2)
+    assert diff["removed"] == [global_finding["id"]]
+    
+    with pytest.raises(SessionConflict):
+        session.update([{"start_line": 1, "end_line": 1, "lines": [""]}], version=1)
+    with pytest.raises(ValueError):
+        session.update([{"start_line": 50, "end_line": 50, "lines": [""]}], version=3)
+    assert session.version == 3
+
+def test_review_session_matches_fresh_analysis_after_edits():
+    """Test random edits, valid or not, leave the same findings as a fresh session"""
+    import random
+    from collections import Counter
+    from app.services.review_session import ReviewSession
+    
+    snippets = ["class A:", "def f(x):", "    x = 1", "    return x", "", "print(x)", "    print(x)",
+                "global counter", "@decorator", "if x:", "else:", "    pass", "        y = 2",
+                "def g(:", "x = (", ")", "    def h(self):", "        return 1", "try:", "except:"]
+    
+    def findings(session):
+        return Counter((line, key) for line, key, _ in session._current())
+    
+    def line_findings(session):
+        return [[f["message"] for f in line] for line in session._line_findings]
+    
+    # Deleting the end of a statement must re-check it even though the next one parses
+    session = ReviewSession("s", "class A:\n    x = 1\nclass B:\n    y = 2", "python")
+    session.update([{"start_line": 2, "end_line": 2, "lines": []}], version=0)
+    assert session._syntax_error and session._syntax_error["line"] == 2
+    
+    rnd = random.Random(7)
+    for _ in range(300):
+        code = "\n".join(rnd.choice(snippets) for _ in range(rnd.randint(1, 10)))
+        session = ReviewSession("s", code, "python")
+        for _ in range(20):
+            start = rnd.randint(1, len(session.lines) + 1)
+            end = rnd.randint(start - 1, min(len(session.lines), start + 2))
+            lines = [rnd.choice(snippets) for _ in range(rnd.randint(0, 3))]
+            session.update([{"start_line": start, "end_line": end, "lines": lines}], session.version)
+            
+            fresh = ReviewSession("f", "\n".join(session.lines), "python")
+            assert session._syntax_error == fresh._syntax_error
+            if fresh._syntax_error is None:
+                assert findings(session) == findings(fresh)
+            else:
+                # Untouched statements keep their findings until the code parses again
+                assert line_findings(session) == line_findings(fresh)
+
+@pytest.mark.asyncio
+async def test_tiered_review_escalates_only_when_needed():
+    """Test small code stays local and quest grading goes to the model with local findings"""
+    from app.services.tiered_review import TieredReviewer
+    
+    class FakeAIService:
+        model = object()
+        
+        def __init__(self):
+            self.calls = []
+        
+        async def review_code(self, code, language, quest_context=None, local_findings=None):
+            self.calls.append(local_findings)
+            return {
+                "success": True,
+                "is_correct": True,
+                "score": 9,
+                "feedback": "Meets the requirements",
+                "suggestions": [{"type": "bug", "severity": "low", "line": None,
+                                 "message": "Handle empty input", "suggestion": None, "corrected_code": None}]
+            }
+    
+    ai_service = FakeAIService()
+    reviewer = TieredReviewer(max_local_lines=10, max_local_complexity=5)
+    code = "def add(a, b):\n    print(a)\n    return a + b\n"
+    
+    local = await reviewer.review(ai_service, code, "python")
+    assert local["tier"] == "local" and local["escalation_reasons"] == []
+    assert local["is_correct"] is None
+    assert ai_service.calls == []
+    
+    broken = await reviewer.review(ai_service, "def add(a, b)\n", "python", {"description": "Add numbers"})
+    assert broken["tier"] == "local" and broken["is_correct"] is False
+    
+    graded = await reviewer.review(ai_service, code, "python", {"title": "Add", "description": "Add two numbers"})
+    assert graded["tier"] == "ai" and graded["escalation_reasons"] == ["quest_grading"]
+    assert any("logging" in f["message"] for f in ai_service.calls[0])
+    assert [s["message"] for s in graded["suggestions"]][-1] == "Handle empty input"
+    
+    assert reviewer.stats()["escalated"] == 1
+    assert reviewer.stats()["escalation_rate"] == round(1 / 3, 3)
+
+@pytest.mark.asyncio
+async def test_large_review_is_chunked_and_merged_with_line_offsets():
+    """Test a large file is reviewed in concurrent parts along function boundaries"""
+    import asyncio
+    from app.services.ai_service import AIService
+    
+    class FakeModel:
+        def __init__(self):
+            self.prompts = []
+            self.active = 0
+            self.max_active = 0
+        
+        async def generate_content_async(self, prompt, generation_config=None):
+            self.prompts.append(prompt)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            await asyncio.sleep(0.01)
+            self.active -= 1
+            
+            class Response:
+                text = "CORRECTNESS: YES\nSCORE: 8\nFEEDBACK: Fine\nSUGGESTIONS:\n* Line 2: Validate the input"
+            return Response()
+    
+    code = "".join(f"def step_{i}(x):\n    y = x + {i}\n    return y\n\n" for i in range(30))
+    service = AIService()
+    service.model = FakeModel()
+    service.review_chunk_lines = 25
+    
+    result = await service.review_code(code, "python")
+    
+    assert result["success"] is True
+    assert result["chunks"] == len(service.model.prompts) > 1
+    assert service.model.max_active > 1
+    # Every part starts at a function and its "Line 2" maps back to that function's body
+    assert all("def step_" in prompt.split("```python\n")[1].split("\n")[0] for prompt in service.model.prompts)
+    lines = code.split("\n")
+    assert len(result["suggestions"]) == result["chunks"]
+    assert all(lines[s["line"] - 1].startswith("    y = x") for s in result["suggestions"])
+    assert result["score"] == 8 and result["is_correct"] is True
+
+@pytest.mark.asyncio
+async def test_identical_hint_requests_share_one_model_call():
+    """Test concurrent identical prompts are coalesced and cancellation is safe"""
+    import asyncio
+    from app.services.ai_service import AIService, SingleFlight
+    
+    class FakeModel:
+        def __init__(self):
+            self.calls = 0
+            self.release = asyncio.Event()
+        
+        async def generate_content_async(self, prompt, generation_config=None):
+            self.calls += 1
+            await self.release.wait()
+            
+            class Response:
+                text = "Think about a loop 🎯"
+            return Response()
+    
+    service = AIService()
+    service.model = FakeModel()
+    quest = {"title": "Sum a list", "description": "Add up the numbers", "difficulty": "beginner"}
+    before = service.coalescing_stats()["coalesced"]
+    
+    callers = [asyncio.ensure_future(service.get_hint_for_quest(quest)) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    callers[0].cancel()  # one student closes the tab
+    service.model.release.set()
+    results = await asyncio.gather(*callers[1:])
+    
+    assert service.model.calls == 1
+    assert all(r["hint"] == "Think about a loop 🎯" for r in results)
+    assert service.coalescing_stats()["coalesced"] - before == 4
+    assert service.coalescing_stats()["in_flight"] == 0
+    
+    # The shared call is cancelled once nobody is waiting for it
+    flight = SingleFlight()
+    upstream = asyncio.Event()
+    
+    async def slow_call():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            upstream.set()
+            raise
+    
+    waiters = [asyncio.ensure_future(flight.do("key", slow_call)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert upstream.is_set()
+    assert flight.stats() == {"calls": 1, "coalesced": 1, "in_flight": 0}
+
+def test_corrupt_archive_member_is_an_archive_error():
+    """Test a member failing its CRC check is reported as a bad archive, not a crash"""
+    import io
+    import zipfile
+    from app.services.repository_review import ArchiveError, extract_archive
+    
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("main.py", "print('hello')\n")
+    data = buffer.getvalue().replace(b"print('hello')", b"print('HELLO')", 1)
+    
+    with pytest.raises(ArchiveError):
+        extract_archive(data, "corrupt.zip")
+
+def test_archive_declared_size_limit_counts_skipped_members():
+    """Test skipped members count toward the expansion limit (tar must decompress past them)"""
+    import io
+    import tarfile
+    from app.services.repository_review import ArchiveError, extract_archive
+    
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in (("data.bin", bytes(4096)), ("main.py", b"print('hi')\n")):
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    
+    assert extract_archive(buffer.getvalue(), "project.tar.gz") == [("main.py", "print('hi')\n")]
+    with pytest.raises(ArchiveError):
+        extract_archive(buffer.getvalue(), "project.tar.gz", max_declared_bytes=1024)
@@ -23,3 +23,148 @@ async def test_health_check(client):
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
+
+def test_verified_token_cache_respects_expiry_and_size():
+    """Test verified tokens are cached until exp and evicted LRU"""
+    import time
+    from app.core.security import VerifiedTokenCache
+    
+    cache = VerifiedTokenCache(max_size=2, max_age_seconds=300)
+    cache.put("token-a", {"uid": "a"}, time.time() + 3600)
+    cache.put("token-expired", {"uid": "x"}, time.time() - 1)
+    
+    assert cache.get("token-a") == {"uid": "a"}
+    assert cache.get("token-expired") is None
+    
+    cache.put("token-b", {"uid": "b"}, time.time() + 3600)
+    cache.put("token-c", {"uid": "c"}, time.time() + 3600)
+    assert cache.get("token-a") is None
+    assert cache.get("token-c") == {"uid": "c"}
+
+@pytest.mark.asyncio
+async def test_password_hasher_rehashes_outdated_cost():
+    """Test the hashing pool verifies off-loop and upgrades old bcrypt costs"""
+    from passlib.context import CryptContext
+    from app.core.security import PasswordHasher
+    
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("SecurePass123!")
+    hasher = PasswordHasher(
+        workers=1,
+        queue_limit=0,
+        context=CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5)
+    )
+    
+    valid, new_hash = await hasher.verify_and_update("SecurePass123!", old_hash)
+    assert valid
+    assert new_hash and new_hash.startswith("$2b$05$")
+    
+    valid, new_hash = await hasher.verify_and_update("wrong", old_hash)
+    assert not valid and new_hash is None
+    hasher.shutdown()
+
+@pytest.mark.asyncio
+async def test_password_hasher_rejects_when_queue_full():
+    """Test the hashing pool sheds load instead of queueing unboundedly"""
+    import asyncio
+    from passlib.context import CryptContext
+    from app.core.security import PasswordHasher, PasswordHasherBusy
+    
+    hasher = PasswordHasher(
+        workers=1,
+        queue_limit=0,
+        context=CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+    )
+    
+    results = await asyncio.gather(
+        hasher.hash("one"), hasher.hash("two"), return_exceptions=True
+    )
+    assert isinstance(results[1], PasswordHasherBusy)
+    hasher.shutdown()
+
+def test_principal_carries_role_claims():
+    """Test access tokens resolve to a principal with cached claims"""
+    from app.api.deps import resolve_principal
+    from app.core.security import create_access_token, token_claims_cache
+    
+    token = create_access_token({"sub": "user_1", "roles": ["admin"]})
+    hits = token_claims_cache.hits
+    
+    assert resolve_principal(token).is_admin
+    assert resolve_principal(token).user_id == "user_1"
+    assert token_claims_cache.hits == hits + 1
+    assert resolve_principal("not-a-token") is None
+
+@pytest.mark.asyncio
+async def test_firebase_upsert_reports_creation_once():
+    """Test only the login that inserts a Firebase user reports it as created"""
+    from mongomock_motor import AsyncMongoMockClient
+    from app.services.user_service import UserService
+    
+    db = AsyncMongoMockClient()["test_firebase_upsert"]
+    service = UserService()
+    firebase_user = {"uid": "uid_1", "email": "ada@example.com", "name": "Ada"}
+    
+    first, created = await service.upsert_firebase_user(db, firebase_user)
+    second, created_again = await service.upsert_firebase_user(db, firebase_user)
+    
+    assert created and not created_again
+    assert first.id == second.id == str((await db["users"].find_one())["_id"])
+    assert second.username == "ada"
+
+def test_firebase_tokens_verify_against_fetched_certificates():
+    """Test ID tokens are checked with the certificates from the cached request"""
+    import datetime
+    import json
+    import time
+    import jwt
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+    from app.services.firebase_service import FirebaseAdminService, ID_TOKEN_CERT_URI
+    
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken")])
+    now = datetime.datetime.utcnow()
+    cert = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(
+        key.public_key()
+    ).serial_number(1).not_valid_before(now).not_valid_after(
+        now + datetime.timedelta(days=1)
+    ).sign(key, hashes.SHA256())
+    pem = cert.public_bytes(serialization.Encoding.PEM).decode()
+    
+    class FakeResponse:
+        status = 200
+        headers = {}
+        data = json.dumps({"kid-1": pem}).encode()
+    
+    fetched = []
+    
+    def fake_request(url, method="GET", **kwargs):
+        fetched.append(url)
+        return FakeResponse()
+    
+    class FakeApp:
+        project_id = "demo-project"
+    
+    service = FirebaseAdminService.__new__(FirebaseAdminService)
+    service.app = FakeApp()
+    service._cert_request = fake_request
+    
+    def token(**overrides):
+        claims = {
+            "iss": "https://securetoken.google.com/demo-project",
+            "aud": "demo-project",
+            "sub": "uid_1",
+            "iat": int(time.time()),
+            "exp": int(time.time()) + 3600,
+            **overrides
+        }
+        return jwt.encode(claims, key, algorithm="RS256", headers={"kid": "kid-1"})
+    
+    assert service._decode_id_token(token())["uid"] == "uid_1"
+    assert fetched == [ID_TOKEN_CERT_URI]
+    
+    for bad in (token(aud="other-project"), token(iss="https://example.com/demo-project"), token(sub="")):
+        with pytest.raises(ValueError):
+            service._decode_id_token(bad)
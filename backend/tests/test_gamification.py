@@ -21,3 +21,145 @@ async def test_level_calculation():
     
     level_100 = calculate_level(100)
     assert level_100 >= 1
+
+@pytest.mark.asyncio
+async def test_activity_bitmap_streaks():
+    """Test streaks computed from the activity bitmap"""
+    from datetime import date, timedelta
+    from app.utils.activity_bitmap import day_index, current_streak, longest_streak, active_days
+    
+    def bitmap(days):
+        value = 0
+        for day in days:
+            value |= 1 << day_index(day)
+        return value
+    
+    new_year = date(2026, 1, 1)
+    bitmaps = {
+        2025: bitmap([new_year - timedelta(days=i) for i in range(1, 5)]),
+        2026: bitmap([new_year + timedelta(days=i) for i in range(3)]),
+    }
+    
+    assert current_streak(bitmaps, date(2026, 1, 3)) == 7
+    assert current_streak(bitmaps, date(2026, 1, 4)) == 7
+    assert current_streak(bitmaps, date(2026, 1, 5)) == 0
+    assert longest_streak(bitmaps) == 7
+    assert active_days(bitmaps, date(2025, 12, 30), date(2026, 1, 1)) == 3
+
+@pytest.mark.asyncio
+async def test_activity_bitmap_update_is_int64():
+    """Test the bitwise update fits MongoDB's signed int64"""
+    from datetime import date
+    from app.utils.activity_bitmap import mark_day_update, bitmap_from_doc, is_active
+    
+    day = date(2025, 3, 5)  # day 63 -> top bit of the first word
+    update = mark_day_update(day)["$bit"]["w0"]["or"]
+    assert -2**63 <= update < 2**63
+    assert is_active(bitmap_from_doc({"w0": update}), day)
+
+@pytest.mark.asyncio
+async def test_streak_sweep_runs_at_utc_midnight():
+    """Test the daily scheduler targets the next UTC day boundary"""
+    from datetime import datetime
+    from app.core.scheduler import seconds_until_next_utc_midnight
+    
+    assert seconds_until_next_utc_midnight(datetime(2026, 5, 9, 23, 59, 0)) == 60
+    assert seconds_until_next_utc_midnight(datetime(2026, 5, 10, 0, 0, 0)) == 86400
+
+@pytest.mark.asyncio
+async def test_user_state_cache_does_not_create_users():
+    """Test unknown users get defaults without a stored document"""
+    from mongomock_motor import AsyncMongoMockClient
+    from app.services.user_state_cache import UserStateCache
+    
+    db = AsyncMongoMockClient()["test"]
+    cache = UserStateCache(max_size=4, ttl_seconds=60)
+    
+    user = await cache.get(db, "ghost")
+    assert user["total_xp"] == 0 and user["level"] == 1
+    assert await cache.update(db, "ghost", {"total_xp": 50}) is None
+    assert await db["users"].count_documents({}) == 0
+    
+    await db["users"].insert_one({"username": "alice", "email": "a@example.com", "total_xp": 10})
+    assert (await cache.get(db, "alice"))["total_xp"] == 10
+    assert (await cache.update(db, "alice", {"total_xp": 60}))["total_xp"] == 60
+    assert (await cache.get(db, "alice"))["total_xp"] == 60
+
+@pytest.mark.asyncio
+async def test_concurrent_quest_completions_keep_all_xp():
+    """Test two completions at once both count against a stale cache"""
+    import asyncio
+    from mongomock_motor import AsyncMongoMockClient
+    from app.services.quest_service import QuestService
+    from app.services.user_state_cache import user_state_cache
+    
+    db = AsyncMongoMockClient()["test"]
+    await db["users"].insert_one({
+        "username": "racer", "email": "r@example.com", "total_xp": 950, "level": 1,
+        "quests_completed": 3, "current_streak": 2, "longest_streak": 2
+    })
+    await user_state_cache.get(db, "racer")
+    
+    results = await asyncio.gather(
+        QuestService(db).complete_quest("racer", "test-quest-id"),
+        QuestService(db).complete_quest("racer", "test-quest-id")
+    )
+    user_state_cache.invalidate("racer")
+    
+    user = await db["users"].find_one({"username": "racer"})
+    assert user["total_xp"] == 1050
+    assert user["level"] == 2
+    assert user["quests_completed"] == 5
+    assert user["current_streak"] == user["longest_streak"] == 4
+    assert sorted(r["total_xp"] for r in results) == [1000, 1050]
+    assert sum(r["level_up"] for r in results) == 1
+
+@pytest.mark.asyncio
+async def test_streak_sweep_resets_lapsed_streaks_once_per_day():
+    """Test the sweep resets lapsed streaks, runs once a day and retries after a failure"""
+    from datetime import datetime, timedelta
+    from mongomock_motor import AsyncMongoMockClient
+    from app.services.gamification_service import GamificationService
+    
+    db = AsyncMongoMockClient()["test"]
+    now = datetime(2026, 5, 10, 0, 0, 5)
+    await db["users"].insert_many([
+        {"_id": "lapsed", "current_streak": 5},
+        {"_id": "current", "current_streak": 3},
+    ])
+    await db["user_streaks"].insert_many([
+        {"user_id": "lapsed", "current_streak": 5, "last_activity": now - timedelta(days=2)},
+        {"user_id": "current", "current_streak": 3, "last_activity": now - timedelta(hours=12)},
+    ])
+    
+    service = GamificationService()
+    result = await service.expire_lapsed_streaks(db, now=now)
+    assert result["success"] and result["expired"] == 1
+    
+    streaks = {s["user_id"]: s async for s in db["user_streaks"].find()}
+    assert streaks["lapsed"]["current_streak"] == 0
+    assert streaks["current"]["current_streak"] == 3 and "streak_broken_at" not in streaks["current"]
+    assert (await db["users"].find_one({"_id": "lapsed"}))["current_streak"] == 0
+    assert (await db["users"].find_one({"_id": "current"}))["current_streak"] == 3
+    assert await db["notifications"].count_documents({"user_id": "lapsed", "type": "streak"}) == 1
+    
+    again = await service.expire_lapsed_streaks(db, now=now + timedelta(hours=6))
+    assert again == {"success": True, "skipped": True, "expired": 0}
+    assert await db["notifications"].count_documents({}) == 1
+    
+    # A failed run gives up its claim so the retry that day is not skipped
+    tomorrow = now + timedelta(days=1)
+    create_notifications = service.notification_service.create_notifications
+    
+    async def failing(db, notifications):
+        raise ConnectionError("database unavailable")
+    
+    service.notification_service.create_notifications = failing
+    failed = await service.expire_lapsed_streaks(db, now=tomorrow)
+    assert failed["success"] is False
+    assert await db["job_runs"].count_documents({"_id": "streak_sweep:2026-05-11"}) == 0
+    
+    service.notification_service.create_notifications = create_notifications
+    retried = await service.expire_lapsed_streaks(db, now=tomorrow)
+    assert retried["success"] and "skipped" not in retried
+    assert (await db["job_runs"].find_one({"_id": "streak_sweep:2026-05-11"}))["finished_at"]
@@ -0,0 +1,137 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_hub_delivers_and_resumes():
+    """Test push events reach subscribers and can be replayed by cursor"""
+    from app.services.notification_hub import LocalBroker, NotificationHub
+    
+    hub = NotificationHub(LocalBroker(history_size=10), queue_size=2)
+    await hub.start()
+    queue = hub.subscribe("user_1")
+    
+    first = await hub.publish("user_1", "xp_awarded", {"xp": 50})
+    await hub.publish("user_2", "xp_awarded", {"xp": 10})
+    second = await hub.publish("user_1", "badge_unlocked", {"badge_id": "first_quest"})
+    
+    assert queue.get_nowait()["id"] == first["id"]
+    assert queue.get_nowait()["id"] == second["id"]
+    assert [e["id"] for e in await hub.replay("user_1", first["id"])] == [second["id"]]
+    
+    hub.unsubscribe("user_1", queue)
+    assert hub.stats()["connections"] == 0
+
+@pytest.mark.asyncio
+async def test_replay_follows_publish_order_not_id_order():
+    """Test resuming works when another worker's ids sort earlier"""
+    from bson import ObjectId
+    from mongomock_motor import AsyncMongoMockClient
+    from app.services.notification_hub import LocalBroker, MongoBroker, new_event
+    
+    late, early, other = (new_event("user_1", "xp_awarded", {"xp": xp}) for xp in (10, 20, 30))
+    early["id"] = str(ObjectId.from_datetime(ObjectId(late["id"]).generation_time.replace(year=2000)))
+    events = [late, early, new_event("user_2", "xp_awarded", {"xp": 5}), other]
+    
+    db = AsyncMongoMockClient()["test"]
+    
+    async def get_db():
+        return db
+    
+    for broker in (LocalBroker(history_size=10), MongoBroker(get_db)):
+        await broker.publish(events)
+        assert [e["id"] for e in await broker.replay("user_1", late["id"])] == [early["id"], other["id"]]
+        assert [e["id"] for e in await broker.replay("user_1", other["id"])] == []
+        assert len(await broker.replay("user_1", str(ObjectId()))) == 3
+
+def test_cursor_round_trip():
+    """Test keyset cursors encode created_at and _id losslessly"""
+    from datetime import datetime
+    from bson import ObjectId
+    from app.services.notification_service import encode_cursor, decode_cursor
+    
+    notification = {"_id": ObjectId(), "created_at": datetime(2024, 3, 1, 12, 30, 15, 123000)}
+    
+    assert decode_cursor(encode_cursor(notification)) == (
+        notification["created_at"], notification["_id"]
+    )
+
+def test_cursor_ignores_local_timezone(monkeypatch):
+    """Test cursors encode naive UTC datetimes the same in any timezone"""
+    import time
+    from datetime import datetime
+    from bson import ObjectId
+    from app.services.notification_service import encode_cursor, decode_cursor
+    
+    notification = {"_id": ObjectId(), "created_at": datetime(2024, 3, 1, 12, 30, 15, 123000)}
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        cursor = encode_cursor(notification)
+        assert cursor.startswith("1709296215123_")
+        assert decode_cursor(cursor)[0] == notification["created_at"]
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
+
+@pytest.mark.asyncio
+async def test_digest_coalesces_events_per_user_and_kind():
+    """Test bursts of events for one user flush as a single notification"""
+    from app.services.notification_digest import NotificationDigest
+    
+    inserted = []
+    
+    class FakeCollection:
+        async def insert_many(self, docs, ordered=True):
+            inserted.extend(docs)
+        
+        async def bulk_write(self, ops, ordered=True):
+            pass
+    
+    digest = NotificationDigest(window_seconds=60)
+    for i in range(30):
+        digest.add("user_1", "xp", f"Task {i}", xp=10)
+    digest.add("user_1", "badge", "Quest Starter")
+    digest.add("user_2", "xp", "Task 0", xp=10)
+    
+    assert await digest.flush({"notifications": FakeCollection(), "notification_counters": FakeCollection()}) == 3
+    
+    xp = next(n for n in inserted if n["user_id"] == "user_1" and n["type"] == "xp")
+    assert xp["digest"]["count"] == 30
+    assert xp["digest"]["xp"] == 300
+    assert digest.stats()["pending"] == 0
+
+@pytest.mark.asyncio
+async def test_digest_keeps_events_when_flush_fails():
+    """Test a failed flush is retried and the buffer stays bounded"""
+    from app.services.notification_digest import NotificationDigest
+    
+    inserted = []
+    
+    class FlakyCollection:
+        fail = True
+        
+        async def insert_many(self, docs, ordered=True):
+            if FlakyCollection.fail:
+                raise ConnectionError("database unavailable")
+            inserted.extend(docs)
+        
+        async def bulk_write(self, ops, ordered=True):
+            pass
+    
+    db = {"notifications": FlakyCollection(), "notification_counters": FlakyCollection()}
+    digest = NotificationDigest(window_seconds=60, max_pending=2)
+    digest.add("user_1", "xp", "Task 1", xp=10)
+    
+    with pytest.raises(ConnectionError):
+        await digest.flush(db)
+    
+    digest.add("user_1", "xp", "Task 2", xp=10)
+    digest.add("user_2", "xp", "Task 1", xp=10)
+    digest.add("user_3", "xp", "Task 1", xp=10)
+    assert digest.stats()["pending"] == 2
+    assert digest.stats()["dropped"] == 1
+    
+    FlakyCollection.fail = False
+    assert await digest.flush(db) == 2
+    xp = next(n for n in inserted if n["user_id"] == "user_1")
+    assert xp["digest"]["count"] == 2
+    assert xp["digest"]["xp"] == 20
@@ -20,3 +20,41 @@ async def test_create_quest(client):
     }
     response = await client.post("/api/v1/quests", json=quest_data)
     assert response.status_code in [200, 201]
+
+@pytest.mark.asyncio
+async def test_bulk_start_and_complete_award_xp_once():
+    """Test bulk enrollment and task completion, including a replayed sync"""
+    from mongomock_motor import AsyncMongoMockClient
+    from app.services.quest_system_service import QuestSystemService
+    
+    db = AsyncMongoMockClient()["test_bulk_quests"]
+    service = QuestSystemService()
+    await db["users"].insert_many([{"_id": "u1", "total_xp": 0}, {"_id": "u2", "total_xp": 0}])
+    quest_id = "quest_1_github_explorer"
+    
+    started = await service.bulk_start_quests(db, [
+        {"user_id": "u1", "quest_id": quest_id},
+        {"user_id": "u2", "quest_id": quest_id},
+        {"user_id": "u1", "quest_id": quest_id},
+        {"user_id": "u1", "quest_id": "missing_quest"}
+    ])
+    assert started["success"] and started["started"] == 2
+    assert [e["error"] for e in started["errors"]] == ["Quest not found"]
+    
+    completions = [
+        {"user_id": "u1", "quest_id": quest_id, "task_id": "task_1_1"},
+        {"user_id": "u1", "quest_id": quest_id, "task_id": "task_1_3"},
+        {"user_id": "u2", "quest_id": quest_id, "task_id": "task_1_1"},
+        {"user_id": "u2", "quest_id": quest_id, "task_id": "no_such_task"}
+    ]
+    result = await service.bulk_complete_tasks(db, completions)
+    assert result["success"]
+    assert result["xp_by_user"] == {"u1": 150, "u2": 50}
+    assert [r["status"] for r in result["results"]].count("error") == 1
+    
+    replay = await service.bulk_complete_tasks(db, completions)
+    assert replay["xp_by_user"] == {}
+    assert (await db["users"].find_one({"_id": "u1"}))["total_xp"] == 150
+    
+    progress = await db["user_quest_progress"].find_one({"user_id": "u1", "quest_id": quest_id})
+    assert progress["task_progress"]["task_1_3"]["status"] == "completed"
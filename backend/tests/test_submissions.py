@@ -15,3 +15,287 @@ async def test_create_submission(client):
         headers=headers
     )
     assert response.status_code in [200, 401]
+
+def test_content_hash_keeps_significant_whitespace():
+    """Test only line endings are normalized in the code hash"""
+    from app.utils.code_hash import content_hash
+    
+    code = 'def f():\n    return """a \n"""\n'
+    assert content_hash(code, "python") == content_hash(code.replace("\n", "\r\n"), "Python")
+    assert content_hash(code, "python") != content_hash(code.replace("a \n", "a\n"), "python")
+    assert content_hash("x = 1 + \\\n    2\n") != content_hash("x = 1 + \\ \n    2\n")
+    assert content_hash(code, "python") != content_hash(code, "javascript")
+
+@pytest.mark.asyncio
+async def test_code_runner_runs_task_tests_in_sandbox():
+    """Test submitted code is run against the task's test spec"""
+    from app.services.code_runner import CodeRunner
+    
+    runner = CodeRunner(workers=2, timeout_seconds=5, cpu_seconds=2)
+    spec = {
+        "entrypoint": "add",
+        "cases": [
+            {"name": "small numbers", "args": [1, 2], "expected": 3},
+            {"name": "negatives", "args": [-1, -2], "expected": -3}
+        ]
+    }
+    
+    passing = await runner.run("def add(a, b):\n    return a + b", "python", spec)
+    assert passing["all_passed"] and passing["passed"] == 2
+    
+    failing = await runner.run("def add(a, b):\n    return a - b", "python", spec)
+    assert not failing["all_passed"]
+    assert [case["status"] for case in failing["test_cases"]] == ["failed", "failed"]
+    
+    looping = await runner.run("while True:\n    pass", "python", spec)
+    assert looping["test_cases"][0]["status"] == "error"
+    await runner.stop()
+
+@pytest.mark.asyncio
+async def test_code_runner_recycles_warm_workers():
+    """Test warm Python workers are reused, then recycled after N runs"""
+    from app.services.code_runner import CodeRunner, SMOKE_SPEC
+    
+    runner = CodeRunner(workers=1, timeout_seconds=5, cpu_seconds=2, warm_max_runs=2)
+    await runner.start()
+    
+    for _ in range(3):
+        result = await runner.run("print('hello')", "python", SMOKE_SPEC)
+        assert result["all_passed"]
+    
+    pool = runner.stats()["warm_pool"]
+    assert pool["recycled"] == 1
+    assert pool["spawned"] == 2
+    assert pool["busy"] == 0
+    await runner.stop()
+
+@pytest.mark.asyncio
+async def test_code_runner_recycles_workers_after_memory_high_water():
+    """Test a run that grows past the RSS limit retires its warm worker"""
+    from app.services.code_runner import CodeRunner, SMOKE_SPEC
+    
+    runner = CodeRunner(workers=1, timeout_seconds=5, cpu_seconds=2, memory_mb=256, warm_max_rss_mb=64)
+    await runner.start()
+    try:
+        assert (await runner.run("print('small')", "python", SMOKE_SPEC))["all_passed"]
+        assert runner.stats()["warm_pool"]["recycled"] == 0
+        
+        result = await runner.run("data = bytearray(96 * 1024 * 1024)\nprint(len(data))", "python", SMOKE_SPEC)
+        assert result["all_passed"]
+        assert runner.stats()["warm_pool"]["recycled"] == 1
+    finally:
+        await runner.stop()
+
+@pytest.mark.asyncio
+async def test_code_runner_results_cannot_be_forged():
+    """Test submitted code can neither read expected outputs nor forge a result"""
+    from app.services.code_runner import CodeRunner
+    
+    spec = {"entrypoint": "add", "cases": [{"name": "adds", "args": [1, 2], "expected": 3}]}
+    forged = (
+        "import json, os, sys\n"
+        "expected = [case.get('expected') for case in json.load(open('spec.json'))['cases']]\n"
+        "sys.__stdout__.write('\\n__CODEQUEST_RESULT__' + json.dumps([{'name': 'adds', 'status': 'passed'}]) + '\\n')\n"
+        "sys.__stdout__.flush()\n"
+        "def add(a, b):\n"
+        "    return expected[0]\n"
+    )
+    for warm_pool in (False, True):
+        runner = CodeRunner(workers=1, timeout_seconds=5, cpu_seconds=2, warm_pool=warm_pool)
+        await runner.start()
+        try:
+            result = await runner.run(forged, "python", spec)
+            assert not result["all_passed"]
+            assert result["test_cases"][0]["actual"] is None
+            
+            os_exit = "import os, sys\nsys.__stdout__.write('__CODEQUEST_RESULT__[]\\n')\nos._exit(0)\n"
+            result = await runner.run(os_exit, "python", spec)
+            assert not result["all_passed"]
+            assert result["test_cases"][0]["status"] == "error"
+        finally:
+            await runner.stop()
+
+@pytest.mark.asyncio
+async def test_code_runner_confines_submissions():
+    """Test runs cannot read server files, fork without limit or reach the network"""
+    import os
+    from app.core import config
+    from app.services.code_runner import CodeRunner
+    
+    probe = (
+        "import _socket, os, time\n"
+        "def probe():\n"
+        "    seen = {'uid': os.getuid()}\n"
+        f"    seen['config'] = os.path.exists({config.__file__!r})\n"
+        "    seen['other_run'] = os.path.exists(os.path.join(os.path.dirname(os.path.dirname(os.getcwd())), 'other'))\n"
+        "    children = []\n"
+        "    try:\n"
+        "        for _ in range(50):\n"
+        "            pid = os.fork()\n"
+        "            if pid == 0:\n"
+        "                time.sleep(5)\n"
+        "                os._exit(0)\n"
+        "            children.append(pid)\n"
+        "    except OSError:\n"
+        "        pass\n"
+        "    for pid in children:\n"
+        "        os.kill(pid, 9)\n"
+        "        os.waitpid(pid, 0)\n"
+        "    seen['forked'] = len(children)\n"
+        "    try:\n"
+        "        _socket.socket().connect(('1.1.1.1', 80))\n"
+        "        seen['network'] = True\n"
+        "    except OSError:\n"
+        "        seen['network'] = False\n"
+        "    return seen\n"
+    )
+    spec = {"entrypoint": "probe", "cases": [{"name": "probe", "expected": None}]}
+    for warm_pool in (False, True):
+        runner = CodeRunner(workers=1, timeout_seconds=10, cpu_seconds=5, max_processes=8, warm_pool=warm_pool)
+        await runner.start()
+        # Stands in for another submission's run directory
+        os.mkdir(os.path.join(runner._prepare(), "runs", "other"), 0o777)
+        try:
+            seen = (await runner.run(probe, "python", spec))["test_cases"][0]["actual"]
+            assert seen["uid"] != os.getuid()
+            assert seen["config"] is False
+            assert seen["other_run"] is False
+            assert seen["forked"] < 10
+            assert seen["network"] is False
+        finally:
+            await runner.stop()
+    
+    refused = await CodeRunner(workers=1, run_as_uid=os.getuid()).run("print(1)", "python")
+    assert not refused["all_passed"] and "CODE_RUNNER_UID" in refused["error"]
+
+@pytest.mark.asyncio
+async def test_code_runner_kills_timed_out_warm_runs():
+    """Test a timed-out warm run is killed with its zygote and does not block shutdown"""
+    import asyncio
+    from app.services.code_runner import CodeRunner
+    
+    runner = CodeRunner(workers=1, timeout_seconds=1, cpu_seconds=2)
+    await runner.start()
+    result = await runner.run("import time\ntime.sleep(300)\n", "python")
+    assert result["error"] == "Timed out after 1s"
+    assert runner.stats()["warm_pool"]["recycled"] == 1
+    
+    # The sleeping run holds the zygote's stdout; stop() would hang if it survived
+    await asyncio.wait_for(runner.stop(), timeout=5)
+
+@pytest.mark.asyncio
+async def test_job_queue_retries_then_succeeds():
+    """Test queued jobs are leased, retried with backoff and completed"""
+    from mongomock_motor import AsyncMongoMockClient
+    from app.services.job_queue import JobQueue
+    
+    db = AsyncMongoMockClient()["test_jobs"]
+    queue = JobQueue(lease_seconds=5, retry_base_seconds=0)
+    attempts = []
+    
+    async def flaky(db, job, report_progress):
+        attempts.append(job["attempts"])
+        await report_progress(50)
+        if len(attempts) == 1:
+            raise RuntimeError("transient failure")
+        return {"ok": True}
+    
+    queue.register("flaky", flaky)
+    job_id = await queue.enqueue(db, "flaky", {})
+    
+    assert await queue.run_one(db, "worker-1")
+    assert (await queue.get_job(db, job_id))["status"] == "queued"
+    
+    assert await queue.run_one(db, "worker-1")
+    job = await queue.get_job(db, job_id)
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"ok": True}
+    assert attempts == [1, 2]
+    assert not await queue.run_one(db, "worker-1")
+
+@pytest.mark.asyncio
+async def test_job_status_is_owner_only():
+    """Test a job is only visible to the user who queued it"""
+    from mongomock_motor import AsyncMongoMockClient
+    from app.services.job_queue import JobQueue
+    
+    db = AsyncMongoMockClient()["test_job_owner"]
+    queue = JobQueue()
+    job_id = await queue.enqueue(db, "flaky", {"code": "secret"}, user_id="alice")
+    
+    assert (await queue.get_job(db, job_id, user_id="alice"))["status"] == "queued"
+    assert await queue.get_job(db, job_id, user_id="mallory") is None
+
+@pytest.mark.asyncio
+async def test_duplicate_submission_reuses_cached_evaluation():
+    """Test identical code is stored as a reference and not re-run"""
+    from mongomock_motor import AsyncMongoMockClient
+    from bson import ObjectId
+    from app.services.submission_service import SubmissionService
+    
+    db = AsyncMongoMockClient()["test_dedup"]
+    user_id = str((await db["users"].insert_one({"total_xp": 0})).inserted_id)
+    task_id = str((await db["tasks"].insert_one({"test_cases": {
+        "entrypoint": "add",
+        "cases": [{"name": "adds", "args": [1, 2], "expected": 3}]
+    }})).inserted_id)
+    
+    service = SubmissionService(db)
+    runs = []
+    
+    async def run_tests(code, language, test_spec=None):
+        runs.append(code)
+        return {"total_tests": 1, "passed": 1, "failed": 0, "all_passed": True, "test_cases": []}
+    
+    service._run_tests = run_tests
+    
+    first = await service.create_submission(user_id, task_id, "def add(a, b):\r\n    return a + b\r\n", "python")
+    assert await service.evaluate_submission(first["submission_id"], cached_only=True) is None
+    assert (await service.evaluate_submission(first["submission_id"]))["status"] == "passed"
+    
+    second = await service.create_submission(user_id, task_id, "def add(a, b):\n    return a + b\n", "python")
+    assert second["duplicate_of"] == first["submission_id"]
+    assert second["status"] == "passed"
+    stored = await db["submissions"].find_one({"_id": ObjectId(second["submission_id"])})
+    assert "code" not in stored
+    assert (await service.get_submission(second["submission_id"]))["code"].startswith("def add")
+    
+    # Another learner with the same code reuses the cached result
+    other_id = str((await db["users"].insert_one({"total_xp": 0})).inserted_id)
+    third = await service.create_submission(other_id, task_id, "def add(a, b):\n    return a + b\n", "python")
+    result = await service.evaluate_submission(third["submission_id"], cached_only=True)
+    assert result["status"] == "passed"
+    assert len(runs) == 1
+    
+    # Trailing whitespace can matter, so it is neither a duplicate nor a cache hit
+    fourth = await service.create_submission(user_id, task_id, "def add(a, b):\n    return a + b  \n", "python")
+    assert "duplicate_of" not in fourth
+    assert await service.evaluate_submission(fourth["submission_id"], cached_only=True) is None
+
+@pytest.mark.asyncio
+async def test_submission_code_is_stored_compressed_and_delta_encoded():
+    """Test successive attempts round-trip through delta-encoded storage"""
+    from mongomock_motor import AsyncMongoMockClient
+    from app.services.submission_service import SubmissionService
+    
+    db = AsyncMongoMockClient()["test_code_storage"]
+    service = SubmissionService(db)
+    attempts = ["\n".join(f"def f{i}(x):\n    return x * {i}" for i in range(50))]
+    attempts.append(attempts[0].replace("x * 7", "x + 7"))
+    attempts.append(attempts[1] + "\n\nprint(f1(2))")
+    
+    ids = []
+    for code in attempts:
+        ids.append((await service.create_submission("user-1", "task-1", code, "python"))["submission_id"])
+    
+    docs = await db["submissions"].find({}).sort("created_at", 1).to_list(10)
+    assert all("code" not in doc for doc in docs)
+    assert [doc["code_storage"]["encoding"] for doc in docs] == ["zlib", "zlib-delta", "zlib-delta"]
+    assert docs[2]["code_storage"]["depth"] == 2
+    
+    for submission_id, code in zip(ids, attempts):
+        assert (await service.get_submission(submission_id))["code"] == code
+    
+    listed = await service.get_user_submissions("user-1")
+    assert len(listed) == 3
+    assert all("code" not in submission for submission in listed)
@@ -14,3 +14,60 @@ async def test_get_user_badges(client):
     headers = {"Authorization": "Bearer test_token"}
     response = await client.get("/api/v1/users/me/badges", headers=headers)
     assert response.status_code in [200, 401, 404]
+
+@pytest.mark.asyncio
+async def test_progress_series_buckets_walk_back_from_total_xp():
+    """Test day, week and month progress from the daily rollups"""
+    from datetime import date, datetime
+    from mongomock_motor import AsyncMongoMockClient
+    from app.utils.level_system import get_level_from_xp
+    from app.services.analytics_service import (
+        AnalyticsService, DAILY_STATS_COLLECTION, daily_rollup_update
+    )
+    
+    db = AsyncMongoMockClient()["test"]
+    awards = [
+        (date(2025, 2, 26), 100, 1, 0),  # Wednesday
+        (date(2025, 3, 3), 200, 2, 1),   # Monday
+        (date(2025, 3, 5), 50, 1, 0),
+        (date(2025, 4, 10), 300, 3, 1),  # after every range below
+    ]
+    for day, xp, tasks, quests in awards:
+        await db[DAILY_STATS_COLLECTION].update_one(
+            *daily_rollup_update("u1", xp, tasks, quests, when=datetime.combine(day, datetime.min.time())),
+            upsert=True
+        )
+    service = AnalyticsService(db)
+    
+    # 2000 XP now, 650 earned since Feb 26 -> 1350 before the first bucket
+    days = await service.get_progress_series("u1", date(2025, 3, 2), date(2025, 3, 5), "day", total_xp=2000)
+    assert [d["date"] for d in days] == ["2025-03-02", "2025-03-03", "2025-03-04", "2025-03-05"]
+    assert [d["xp_gained"] for d in days] == [0, 200, 0, 50]
+    assert [d["xp"] for d in days] == [1450, 1650, 1650, 1700]
+    assert days[1]["tasks"] == 2 and days[1]["quests"] == 1
+    assert days[-1]["level"] == get_level_from_xp(1700)
+    
+    weeks = await service.get_progress_series("u1", date(2025, 2, 26), date(2025, 3, 9), "week", total_xp=2000)
+    assert [(w["date"], w["xp_gained"], w["xp"]) for w in weeks] == [
+        ("2025-02-24", 100, 1450), ("2025-03-03", 250, 1700)
+    ]
+    
+    months = await service.get_progress_series("u1", date(2025, 2, 1), date(2025, 4, 30), "month")
+    assert [(m["date"], m["xp_gained"], m["xp"]) for m in months] == [
+        ("2025-02-01", 100, 100), ("2025-03-01", 250, 350), ("2025-04-01", 300, 650)
+    ]
+
+@pytest.mark.asyncio
+async def test_progress_series_rejects_oversized_ranges():
+    """Test the span per bucket size is capped before any rows are built"""
+    from datetime import date
+    from app.services.analytics_service import AnalyticsService, check_progress_range
+    
+    check_progress_range(date(2025, 1, 1), date(2025, 12, 31), "day")
+    check_progress_range(date(2016, 1, 1), date(2025, 12, 31), "month")
+    with pytest.raises(ValueError):
+        check_progress_range(date(1, 1, 1), date(2025, 12, 31), "day")
+    with pytest.raises(ValueError):
+        check_progress_range(date(1, 1, 1), date(2025, 12, 31), "month")
+    with pytest.raises(ValueError):
+        await AnalyticsService().get_progress_series("u1", date(1, 1, 1), date(2025, 1, 1), "week")
@@ -0,0 +1,116 @@
+import pytest
+
+def test_workflow_state_comes_from_workflow_document():
+    """Test /state reports the stored workflow state, not an inferred one"""
+    from app.services.workflow_service import WorkflowService
+    
+    service = WorkflowService()
+    model = {
+        "user": {"total_xp": 1500},
+        "workflow": {"current_state": "need_help"},
+        "quest_progress": {"task_progress": {"t1": {"status": "in_progress"}}},
+        "quests_completed": 0,
+        "recent_submission": None
+    }
+    state = service._build_state(model)
+    assert state["state"] == "need_help"
+    assert state["current_task"]["task_id"] == "t1"
+    assert state["user"]["level"] == 2
+    
+    assert service._build_state({**model, "workflow": None})["state"] == "task_execution"
+
+@pytest.mark.asyncio
+async def test_transitions_append_events_and_update_funnel():
+    """Test each transition moves the workflow document and logs one event"""
+    from mongomock_motor import AsyncMongoMockClient
+    from app.services.workflow_service import WorkflowService
+    
+    db = AsyncMongoMockClient()["test"]
+    service = WorkflowService()
+    await service.start_workflow(db, "u1")
+    
+    first = await service._record_transition(db, "u1", "quest_selection")
+    second = await service._record_transition(
+        db, "u1", "quest_started", metadata={"quest_id": "q1"}, inc={"quest_count": 1}
+    )
+    with pytest.raises(ValueError):
+        await service._record_transition(db, "u1", "daydreaming")
+    
+    assert (first["seq"], first["from_state"], first["to_state"]) == (1, "onboarding", "quest_selection")
+    assert (second["seq"], second["from_state"]) == (2, "quest_selection")
+    events = await db["workflow_events"].find({"user_id": "u1"}).sort("seq", 1).to_list(None)
+    assert [(e["seq"], e["to_state"]) for e in events] == [(1, "quest_selection"), (2, "quest_started")]
+    assert events[1]["metadata"] == {"quest_id": "q1"}
+    assert all(e["dwell_seconds"] >= 0 for e in events)
+    
+    workflow = await db["user_workflows"].find_one({"user_id": "u1"})
+    assert workflow["current_state"] == "quest_started"
+    assert workflow["event_seq"] == 2 and workflow["quest_count"] == 1
+    
+    # A first transition without start_workflow creates the document
+    await service._record_transition(db, "u2", "quest_selection")
+    assert (await db["user_workflows"].find_one({"user_id": "u2"}))["event_seq"] == 1
+    
+    funnel = {f["state"]: f for f in (await service.get_funnel(db))["funnel"]}
+    assert (funnel["onboarding"]["entered"], funnel["onboarding"]["exited"]) == (1, 1)
+    assert (funnel["quest_selection"]["entered"], funnel["quest_selection"]["exited"]) == (2, 1)
+    assert funnel["quest_selection"]["drop_off"] == 1
+    assert funnel["quest_selection"]["drop_off_rate"] == 0.5
+    assert funnel["quest_started"]["drop_off_rate"] == 1
+    assert funnel["completed"] == {
+        "state": "completed", "entered": 0, "exited": 0,
+        "avg_seconds": 0, "drop_off": 0, "drop_off_rate": 0
+    }
+
+@pytest.mark.asyncio
+async def test_history_is_snapshotted_every_interval():
+    """Test a snapshot is written every SNAPSHOT_INTERVAL events and reads fold the tail"""
+    from mongomock_motor import AsyncMongoMockClient
+    from app.services.workflow_service import WorkflowService
+    
+    db = AsyncMongoMockClient()["test"]
+    service = WorkflowService()
+    service.SNAPSHOT_INTERVAL = 3
+    states = ["quest_selection", "quest_started", "task_execution", "need_help"]
+    
+    for i in range(7):
+        await service._record_transition(db, "u1", states[i % len(states)])
+        snapshot = await db["workflow_snapshots"].find_one({"_id": "u1"})
+        assert (snapshot or {}).get("seq", 0) == (i + 1) // 3 * 3
+    
+    assert snapshot["transitions"] == 6 and snapshot["state"] == "quest_started"
+    
+    events = await db["workflow_events"].find({"user_id": "u1"}).sort("seq", 1).to_list(None)
+    history = await service._load_history(db, "u1")
+    assert history == service._fold_events({}, events)
+    assert history["seq"] == 7 and history["state"] == "task_execution"
+
+def test_fold_events_continues_from_snapshot():
+    """Test folding adds dwell times and counts on top of a snapshot"""
+    from datetime import datetime
+    from app.services.workflow_service import WorkflowService
+    
+    snapshot = {
+        "state": "task_execution",
+        "state_entered_at": datetime(2026, 1, 1, 12, 0),
+        "seq": 5,
+        "transitions": 5,
+        "time_in_state": {"onboarding": 30, "task_execution": 100}
+    }
+    events = [
+        {"seq": 6, "from_state": "task_execution", "to_state": "need_help",
+         "dwell_seconds": 60, "at": datetime(2026, 1, 1, 12, 1)},
+        {"seq": 7, "from_state": "need_help", "to_state": "task_execution",
+         "dwell_seconds": 15, "at": datetime(2026, 1, 1, 12, 1, 15)},
+    ]
+    
+    folded = WorkflowService()._fold_events(snapshot, events)
+    assert folded == {
+        "state": "task_execution",
+        "state_entered_at": datetime(2026, 1, 1, 12, 1, 15),
+        "seq": 7,
+        "transitions": 7,
+        "time_in_state": {"onboarding": 30, "task_execution": 160, "need_help": 15}
+    }
+    assert snapshot["time_in_state"] == {"onboarding": 30, "task_execution": 100}
+    assert WorkflowService()._fold_events(snapshot, []) == snapshot
@@ -109,7 +109,9 @@ const CodeReviewer = ({ code, language = 'javascript', questContext, onReviewCom
         <div className={`border-l-4 p-4 rounded-r-lg ${
           review.is_correct 
             ? 'border-green-500 bg-green-50' 
-            : 'border-red-500 bg-red-50'
+            : review.is_correct === null
+              ? 'border-blue-500 bg-blue-50'
+              : 'border-red-500 bg-red-50'
         }`}>
           <div className="flex items-center gap-2 mb-3">
             {review.is_correct ? (
@@ -117,6 +119,11 @@ const CodeReviewer = ({ code, language = 'javascript', questContext, onReviewCom
                 <CheckCircleIcon className="w-6 h-6 text-green-600" />
                 <span className="font-bold text-green-800">✅ Code Approved!</span>
               </>
+            ) : review.is_correct === null ? (
+              <>
+                <LightBulbIcon className="w-6 h-6 text-blue-600" />
+                <span className="font-bold text-blue-800">🔍 Automated Checks Done</span>
+              </>
             ) : (
               <>
                 <XCircleIcon className="w-6 h-6 text-red-600" />
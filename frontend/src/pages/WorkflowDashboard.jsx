@@ -121,8 +121,10 @@ export default function WorkflowDashboard() {
       const response = await workflowService.submitCodeForReview('current_task', code);
       
       if (response.success) {
-        setCodeReview(response.feedback);
         setCode('');
+        setCodeReview('Review in progress...');
+        const job = await workflowService.waitForJob(response.job_id);
+        setCodeReview(job.status === 'succeeded' ? job.result.feedback : 'Review failed, please try again.');
       }
     } catch (error) {
       console.error('Error submitting code:', error);
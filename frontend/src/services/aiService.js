@@ -115,5 +115,43 @@ export const aiService = {
     } catch (error) {
       throw new Error(error.response?.data?.detail || 'Failed to explain code');
     }
+  },
+
+  openReviewSession: async (code, language = 'python') => {
+    try {
+      const response = await api.post('/ai/review-sessions', { code, language });
+      return response.data;
+    } catch (error) {
+      throw new Error(error.response?.data?.detail || 'Failed to open review session');
+    }
+  },
+
+  // edits: [{ start_line, end_line, lines }] made against `version`; a 409 means resync with getReviewSession
+  sendReviewEdits: async (sessionId, version, edits) => {
+    try {
+      const response = await api.post(`/ai/review-sessions/${sessionId}/edits`, { version, edits });
+      return response.data;
+    } catch (error) {
+      const err = new Error(error.response?.data?.detail || 'Failed to update review session');
+      err.status = error.response?.status;
+      throw err;
+    }
+  },
+
+  getReviewSession: async (sessionId) => {
+    try {
+      const response = await api.get(`/ai/review-sessions/${sessionId}`);
+      return response.data;
+    } catch (error) {
+      throw new Error(error.response?.data?.detail || 'Failed to load review session');
+    }
+  },
+
+  closeReviewSession: async (sessionId) => {
+    try {
+      await api.delete(`/ai/review-sessions/${sessionId}`);
+    } catch (error) {
+      console.error('Close Review Session Error:', error);
+    }
   }
 };
@@ -68,6 +68,20 @@ export const workflowService = {
     }
   },
 
+  // Wait for a background job (e.g. an AI code review) to finish
+  async waitForJob(jobId, { intervalMs = 1500, timeoutMs = 120000 } = {}) {
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+      const response = await api.get(`/jobs/${jobId}`);
+      const job = response.data;
+      if (job.status === 'succeeded' || job.status === 'failed') {
+        return job;
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+    throw new Error('Timed out waiting for job');
+  },
+
   // Get workflow analytics
   async getWorkflowAnalytics(userId = 'demo_user') {
     try {